@@ -0,0 +1,105 @@
+"""Open-loop load generator for /api/generate_tattoo.
+
+Requests are started on a fixed schedule at the target rate, whether or not earlier ones
+have finished, so a slow server shows up as latency rather than as a lower request rate.
+
+    python -m benchmarks.load_test http://127.0.0.1:5000 --rps 5 --duration 30
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+FIRST_CHOICE_PROVIDERS = ("chatgpt", "dalle")
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def make_person():
+    # A fresh name per request so the reading cache never answers
+    return {
+        "first_name": f"Bench{uuid.uuid4().hex[:10]}",
+        "last_name": "Load",
+        "date_of_birth": "14/07/1991",
+        "age": 34,
+        "spirit_animal": "Heron",
+        "fresh": True,
+    }
+
+def is_fallback(ai_provider):
+    """Anything but the first-choice text and image providers, with no hedge, counts"""
+    text, _, image = (ai_provider or "").partition(",image:")
+    text = text[len("text:"):]
+    return "[hedge" in text or (text, image) != FIRST_CHOICE_PROVIDERS
+
+class LoadTest:
+
+    def __init__(self, base_url, rps, duration, timeout=120, path="/api/generate_tattoo"):
+        self.url = base_url.rstrip("/") + path
+        self.rps = rps
+        self.duration = duration
+        self.timeout = timeout
+        self.results = []
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=256)
+        self.session.mount("http://", adapter)
+
+    def send(self):
+        started = time.monotonic()
+        record = {"status": None, "fallback": False}
+        try:
+            response = self.session.post(self.url, json=make_person(), timeout=self.timeout)
+            record["status"] = response.status_code
+            if response.status_code == 200:
+                record["fallback"] = is_fallback(response.json().get("ai_provider"))
+        except requests.RequestException as e:
+            record["error"] = type(e).__name__
+        record["seconds"] = time.monotonic() - started
+        with self.lock:
+            self.results.append(record)
+
+    def run(self):
+        total = int(self.rps * self.duration)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(4, int(self.rps * self.timeout))) as pool:
+            for index in range(total):
+                delay = started + index / self.rps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send)
+        return self.report(time.monotonic() - started)
+
+    def report(self, elapsed):
+        ok = [record for record in self.results if record["status"] == 200]
+        latencies = [record["seconds"] for record in ok]
+        return {
+            "requests": len(self.results),
+            "succeeded": len(ok),
+            "error_rate": round(1 - len(ok) / len(self.results), 4) if self.results else None,
+            "throughput_rps": round(len(ok) / elapsed, 3),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "fallback_rate": round(sum(record["fallback"] for record in ok) / len(ok), 4) if ok else None,
+            "statuses": {str(status): sum(record["status"] == status for record in self.results)
+                         for status in sorted({record["status"] for record in self.results}, key=str)},
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url")
+    parser.add_argument("--rps", type=float, default=2)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep sending")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+    print(json.dumps(LoadTest(args.base_url, args.rps, args.duration, args.timeout).run(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark the app under gunicorn against the stub providers.
+
+For each workers x threads configuration, starts a gunicorn with a throwaway database,
+image store and metrics directory, then drives it at the target rate and prints one row
+per configuration:
+
+    python -m benchmarks.run_benchmark --configs 1x4,2x4,4x8 --rps 4 --duration 30 \\
+        --text-latency 1.5:0.4 --image-latency 3:0.3 --error-rate 0.02 --malformed-rate 0.05
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from benchmarks.load_test import LoadTest
+from benchmarks.stub_providers import StubProviders, add_config_arguments, config_from_arguments
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_configs(spec):
+    configs = []
+    for entry in spec.split(","):
+        workers, _, threads = entry.partition("x")
+        configs.append((int(workers), int(threads or 1)))
+    return configs
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+def run_configuration(stubs, workers, threads, args):
+    scratch = tempfile.mkdtemp(prefix="tattoo-bench-")
+    metrics_dir = os.path.join(scratch, "metrics")
+    os.makedirs(metrics_dir)
+    port = free_port()
+    env = dict(os.environ, **stubs.environment(),
+               DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+               PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+               # Compare pipeline configurations, not the cache
+               READING_CACHE_ENABLED="false",
+               # The load generator is a single client; keep the global cap only
+               ADMISSION_CLIENT_RATE="0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "--threads", str(threads),
+         "-b", f"127.0.0.1:{port}", "--timeout", "120"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(f"{base_url}/api/generate_tattoo/cache/stats", process)
+        report = LoadTest(base_url, args.rps, args.duration).run()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(scratch, ignore_errors=True)
+    return dict(report, workers=workers, threads=threads)
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.3f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default="1x4,2x4", help="comma-separated workers x threads")
+    parser.add_argument("--rps", type=float, default=2)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--json", action="store_true", help="print the raw reports as JSON")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    reports = []
+    with StubProviders(config_from_arguments(args)) as stubs:
+        for workers, threads in parse_configs(args.configs):
+            reports.append(run_configuration(stubs, workers, threads, args))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print(f"{'config':>8} {'ok/sent':>9} {'rps':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'errors':>7} {'fallback':>8}")
+    for report in reports:
+        print(f"{report['workers']}x{report['threads']:<6} {report['succeeded']:>4}/{report['requests']:<4} "
+              f"{report['throughput_rps']:>7.2f} {format_seconds(report['p50']):>7} {format_seconds(report['p95']):>7} "
+              f"{format_seconds(report['p99']):>7} {report['error_rate'] or 0:>7.2%} {report['fallback_rate'] or 0:>8.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure how long the app takes to start.
+
+Each run is a fresh interpreter with a throwaway database and image store, timing:
+
+- import: importing src.main
+- create_app: building the app (blueprints, database, asset manifest)
+- first_request: the first request through the test client
+- providers: importing the provider SDKs, which the app otherwise does on first use
+
+With --gunicorn, also times gunicorn -c gunicorn.conf.py from launch until it answers,
+which is what an autoscaled instance waits for on a cold start.
+
+    python -m benchmarks.startup_time --runs 7 --gunicorn
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.run_benchmark import BACKEND_DIR, free_port, wait_until_ready
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app()
+created = time.perf_counter()
+app.test_client().get('/api/generate_tattoo/cache/stats')
+served = time.perf_counter()
+from src.providers.registry import load_providers
+load_providers()
+loaded = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported,
+                  "first_request": served - created, "providers": loaded - served}))
+"""
+
+READY_PATH = "/api/generate_tattoo/cache/stats"
+
+def scratch_environment(scratch):
+    return dict(os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'startup.db')}",
+                IMAGE_STORE_GC_ENABLED="false")
+
+def probe_once():
+    scratch = tempfile.mkdtemp(prefix="tattoo-startup-")
+    try:
+        output = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=scratch_environment(scratch),
+                                capture_output=True, text=True, check=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def gunicorn_once(workers):
+    scratch = tempfile.mkdtemp(prefix="tattoo-startup-")
+    port = free_port()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "-b", f"127.0.0.1:{port}"],
+        cwd=BACKEND_DIR, env=scratch_environment(scratch), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}{READY_PATH}", process)
+        return time.monotonic() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def summarize(samples):
+    return {"median": statistics.median(samples), "max": max(samples)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--gunicorn", action="store_true", help="also time a gunicorn cold start")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    probes = [probe_once() for _ in range(args.runs)]
+    report = {stage: summarize([probe[stage] for probe in probes]) for stage in probes[0]}
+    if args.gunicorn:
+        report["gunicorn_ready"] = summarize([gunicorn_once(args.workers) for _ in range(args.runs)])
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'stage':>14} {'median':>8} {'max':>8}")
+    for stage, summary in report.items():
+        print(f"{stage:>14} {summary['median']:>8.3f} {summary['max']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Local stand-ins for the OpenAI, OpenRouter and Stability APIs.
+
+One threaded HTTP server answers all three, with configurable latency, error and
+malformed-reply rates, so the app can be load tested without spending API credits.
+
+    python -m benchmarks.stub_providers --port 8099 --text-latency 1.5:0.4 --error-rate 0.02
+
+then start the app with the environment printed by the server.
+"""
+import argparse
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+READING = {
+    "image_prompt": "A heron standing in still water beneath a crescent moon, fine line work",
+    "symbolic_analysis": "Your name carries the patience of still water and the vigilance of the heron.",
+    "core_tattoo_theme": "Stillness as strength; waiting for the right moment to strike.",
+    "visual_motif_description": "A heron in profile, one leg raised, ripples forming a mandala beneath it.",
+    "placement_suggestion": "Outer forearm, about 15cm tall, following the line of the arm.",
+    "mystical_insight": "What you are waiting for is already moving toward you.",
+}
+
+class LatencyProfile:
+    """Log-normal latency around a median; "1.5:0.4" means median 1.5s, sigma 0.4"""
+
+    def __init__(self, spec):
+        median, _, sigma = str(spec).partition(":")
+        self.median = float(median)
+        self.sigma = float(sigma or 0.3)
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+class StubConfig:
+
+    def __init__(self, text_latency="0.5:0.3", first_chunk_latency="0.2:0.3", image_latency="2:0.3",
+                 error_rate=0.0, malformed_rate=0.0, image_size=256, seed=None):
+        self.text_latency = LatencyProfile(text_latency)
+        self.first_chunk_latency = LatencyProfile(first_chunk_latency)
+        self.image_latency = LatencyProfile(image_latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.image_size = image_size
+        if seed is not None:
+            random.seed(seed)
+
+def make_png(size):
+    """A random greyscale PNG, so every generated image is a distinct file in the store"""
+    noise = random.randbytes(size)
+    raw = b"".join(b"\x00" + noise[row:] + noise[:row] for row in range(size))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+def malformed_reading():
+    """One of the ways real models break the JSON contract"""
+    text = json.dumps(READING, indent=2)
+    return random.choice([
+        f"```json\n{text}\n```",
+        text[:-2] + ",\n}",
+        text[:len(text) * 3 // 4],
+        "Here is your reading:\n" + text,
+    ])
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_png(self):
+        data = make_png(self.config.image_size)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def maybe_fail(self):
+        if random.random() < self.config.error_rate:
+            status = random.choice([429, 500, 503])
+            self.send_json(status, {"error": {"message": "stub failure", "type": "server_error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.startswith("/files/"):
+            return self.send_png()
+        if self.path == "/health":
+            return self.send_json(200, {"status": "ok"})
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.read_body()
+        if self.path.endswith("/chat/completions"):
+            return self.chat_completions(body)
+        if self.path.endswith("/images/generations"):
+            return self.image_generations()
+        if self.path.endswith("/text-to-image"):
+            return self.stability_text_to_image()
+        self.send_json(404, {"error": "not found"})
+
+    def chat_completions(self, body):
+        reply = malformed_reading() if random.random() < self.config.malformed_rate else json.dumps(READING)
+        usage = {"prompt_tokens": 500, "completion_tokens": len(reply) // 4}
+
+        if not body.get("stream"):
+            time.sleep(self.config.text_latency.sample())
+            if self.maybe_fail():
+                return
+            return self.send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": usage,
+            })
+
+        time.sleep(self.config.first_chunk_latency.sample())
+        if self.maybe_fail():
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pieces = [reply[start:start + 12] for start in range(0, len(reply), 12)]
+        # Spread the rest of the completion latency over the chunks
+        per_chunk = max(0.0, self.config.text_latency.sample() - self.config.first_chunk_latency.median) / len(pieces)
+        for piece in pieces:
+            event = {"object": "chat.completion.chunk", "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.write_chunk(f"data: {json.dumps(event)}\n\n")
+            time.sleep(per_chunk)
+        self.write_chunk("data: [DONE]\n\n")
+        self.write_chunk("")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def image_generations(self):
+        time.sleep(self.config.image_latency.sample())
+        if self.maybe_fail():
+            return
+        host = self.headers.get("Host")
+        self.send_json(200, {"created": int(time.time()),
+                             "data": [{"url": f"http://{host}/files/{uuid.uuid4().hex}.png"}]})
+
+    def stability_text_to_image(self):
+        time.sleep(self.config.image_latency.sample())
+        if self.maybe_fail():
+            return
+        self.send_png()
+
+class StubProviders:
+    """Run the stub server on a background thread; use as a context manager in tests"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.config = config or StubConfig()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        """Environment variables that point the app at this server"""
+        return {
+            "OPENAI_API_KEY": "sk-stub",
+            "OPENAI_API_BASE": f"{self.base_url}/v1",
+            "OPENROUTER_API_KEY": "stub",
+            "OPENROUTER_BASE_URL": f"{self.base_url}/openrouter/v1",
+            "STABILITY_API_KEY": "stub",
+            "STABILITY_API_URL": f"{self.base_url}/stability/v1/text-to-image",
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-providers", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_config_arguments(parser):
+    parser.add_argument("--text-latency", default="0.5:0.3", help="median[:sigma] seconds for a full completion")
+    parser.add_argument("--first-chunk-latency", default="0.2:0.3", help="median[:sigma] seconds to the first streamed chunk")
+    parser.add_argument("--image-latency", default="2:0.3", help="median[:sigma] seconds per image")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429/5xx")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of readings with broken JSON")
+    parser.add_argument("--image-size", type=int, default=256, help="edge of the generated PNGs in pixels")
+    parser.add_argument("--seed", type=int)
+
+def config_from_arguments(args):
+    return StubConfig(args.text_latency, args.first_chunk_latency, args.image_latency,
+                      args.error_rate, args.malformed_rate, args.image_size, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    stubs = StubProviders(config_from_arguments(args), args.host, args.port)
+    for name, value in stubs.environment().items():
+        print(f"export {name}={value}")
+    try:
+        stubs.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py
+
+The app is built once in the master (preload_app), and the provider SDKs are imported
+there too, so forked workers start serving at once and share those pages copy-on-write.
+Command-line flags (-w, --threads, -b) override the values below.
+"""
+import gc
+import os
+
+# Background threads are started per worker in post_fork: the master must not fork with threads running
+wsgi_app = "src.main:create_app({'START_BACKGROUND_THREADS': False})"
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = True
+
+def when_ready(server):
+    from src.providers.registry import load_providers
+    load_providers()
+    # Keep the collector from writing to every preloaded object, which would copy its page in each worker
+    gc.freeze()
+
+def post_fork(server, worker):
+    from src.database.config import dispose_inherited_connections
+    from src.models.user import db
+    from src.services.image_store import start_garbage_collector
+    dispose_inherited_connections(server.app.wsgi(), db)
+    start_garbage_collector()
+
+def child_exit(server, worker):
+    from src.services import metrics
+    metrics.mark_worker_dead(worker.pid)
@@ -0,0 +1,141 @@
+"""ASGI entry point: uvicorn src.asgi:application (or gunicorn -k uvicorn.workers.UvicornWorker).
+
+POST /api/generate_tattoo is served natively on the event loop, so one process can hold
+hundreds of generations that are waiting on providers. Every other route, including the
+streaming, batch and job endpoints, runs the Flask app in a thread pool.
+"""
+import os
+import json
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import asgiref
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from src.main import app
+from src.providers.async_http import close_client_session
+from src.routes.tattoo_designer import (TattooGenerationError, agenerate_tattoo_payload, run_in_app_context,
+                                        validate_tattoo_request)
+from src.services import admission, idempotency
+from src.services.admission import AdmissionRejected
+from src.services.idempotency import IdempotencyConflict, Replay
+
+# Threads for the Flask routes; the native route does not use them while it waits
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))
+
+def plain_run_wsgi_app():
+    """What asgiref wraps in sync_to_async(thread_sensitive=True) as WsgiToAsgiInstance.run_wsgi_app.
+
+    It has no public hook for this, hence the pinned asgiref; fail at startup rather than
+    quietly serving one request at a time if a new release moves it.
+    """
+    func = getattr(WsgiToAsgiInstance.__dict__.get('run_wsgi_app'), 'func', None)
+    if not callable(func):
+        raise RuntimeError(f"asgiref {asgiref.__version__} no longer wraps WsgiToAsgiInstance.run_wsgi_app "
+                           "in sync_to_async; update src/asgi.py")
+    return func
+
+class ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps thread-sensitively, i.e. one request at a time per process;
+    # Flask is thread-safe, so use the loop's thread pool instead
+    run_wsgi_app = sync_to_async(plain_run_wsgi_app(), thread_sensitive=False)
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+wsgi_application = ThreadPoolWsgiToAsgi(app)
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+def get_header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+async def send_json(scope, send, status, data, extra_headers=()):
+    body = json.dumps(data).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *extra_headers]
+    # Same answer flask-cors gives the WSGI routes
+    if get_header(scope, b"origin") is not None:
+        headers.append((b"access-control-allow-origin", b"*"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def generate_tattoo(scope, receive, send):
+    try:
+        data = json.loads(await read_body(receive) or b"null")
+    except ValueError:
+        return await send_json(scope, send, 400, {"error": "Invalid JSON body"})
+    inputs, error = validate_tattoo_request(data if isinstance(data, dict) else None)
+    if error:
+        return await send_json(scope, send, 400, {"error": error})
+
+    client = scope.get("client") or (None, None)
+    address = admission.client_address(client[0], get_header(scope, b"x-forwarded-for"))
+    client_keys = admission.client_keys(address, inputs["user_id"])
+    idempotency_key = get_header(scope, b"idempotency-key")
+    error = idempotency.validate_key(idempotency_key)
+    if error:
+        return await send_json(scope, send, 400, {"error": error})
+    client_identity = admission.client_identity(address, inputs["user_id"])
+    key = idempotency.record_key("generate_tattoo", client_identity, idempotency_key) if idempotency_key else None
+
+    try:
+        claim = await idempotency.abegin(key, idempotency.fingerprint(data), partial(run_in_app_context, app))
+    except IdempotencyConflict as e:
+        headers = [(b"retry-after", str(e.retry_after).encode())] if e.retry_after else []
+        return await send_json(scope, send, e.status_code, {"error": e.message}, headers)
+    if isinstance(claim, Replay):
+        return await send_json(scope, send, claim.status_code, claim.body, [(b"idempotent-replayed", b"true")])
+
+    try:
+        try:
+            ticket = await run_in_app_context(app, admission.admit, client_keys)
+        except AdmissionRejected as e:
+            return await send_json(scope, send, 429, {"error": e.message},
+                                   [(b"retry-after", str(e.retry_after).encode())])
+
+        try:
+            response_data = await agenerate_tattoo_payload(app, inputs)
+        except TattooGenerationError as e:
+            return await send_json(scope, send, e.status_code, {"error": e.message})
+        finally:
+            await run_in_app_context(app, admission.release, ticket)
+        await run_in_app_context(app, idempotency.complete, claim, 200, response_data)
+    finally:
+        if not claim.finished:
+            await run_in_app_context(app, idempotency.abandon, claim)
+    await send_json(scope, send, 200, response_data)
+
+NATIVE_ROUTES = {
+    ("POST", "/api/generate_tattoo"): generate_tattoo,
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="asgi-wsgi"))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_client_session()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    handler = NATIVE_ROUTES.get((scope.get("method"), scope.get("path")))
+    if handler is not None:
+        return await handler(scope, receive, send)
+    await wsgi_application(scope, receive, send)
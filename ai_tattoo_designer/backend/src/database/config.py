@@ -0,0 +1,86 @@
+import os
+import fcntl
+import tempfile
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), 'app.db')
+# Point at Postgres/MySQL (e.g. postgresql+psycopg2://...) to leave SQLite behind
+DATABASE_URL = os.getenv('DATABASE_URL', f"sqlite:///{DEFAULT_SQLITE_PATH}")
+
+# Per-process pool: request threads + job workers + image stage threads share it
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+
+# Turn off when the schema is managed by migrations instead
+DB_CREATE_SCHEMA = os.getenv('DB_CREATE_SCHEMA', 'true').lower() == 'true'
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def engine_options(url):
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+    }
+    if is_sqlite(url):
+        # Connections move between request, job and image threads
+        options['connect_args'] = {'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = DB_POOL_RECYCLE
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer; NORMAL is durable across app crashes in WAL mode
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    # Not a tuning knob: SQLite ignores REFERENCES clauses unless asked, other databases always enforce them
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def schema_lock_path(url):
+    if is_sqlite(url) and make_url(url).database:
+        return make_url(url).database + '.lock'
+    return os.path.join(tempfile.gettempdir(), 'ai_tattoo_designer_schema.lock')
+
+def create_schema(db, url):
+    """Create missing tables, one worker at a time; the rest find nothing to do"""
+    with open(schema_lock_path(url), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            existing = set(inspect(db.engine).get_table_names())
+            if set(db.metadata.tables) - existing:
+                db.create_all()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def configure_database(app, db, url=None):
+    """Bind db to the app with pool sizing, SQLite pragmas and one-time schema creation"""
+    url = url or DATABASE_URL
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    db.init_app(app)
+
+    with app.app_context():
+        if is_sqlite(url):
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+        if DB_CREATE_SCHEMA:
+            create_schema(db, url)
+
+def dispose_inherited_connections(app, db):
+    """In a forked worker: drop the pool the parent filled, without closing its connections under it"""
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -3,45 +3,110 @@ import sys
 # DON\'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import threading
+from flask import Flask, current_app, request, send_file
 from flask_cors import CORS
 from src.models.user import db
+from src.database.config import configure_database
 from src.routes.user import user_bp
 from src.routes.tattoo_designer import tattoo_bp
+from src.routes.jobs import jobs_bp
+from src.routes.admin import admin_bp
+from src.routes.images import images_bp
+from src.routes.readings import readings_bp
+from src.routes.metrics import metrics_bp
+from src.services.image_store import start_garbage_collector
+from src.services.asset_manifest import AssetManifest
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
 
-# Enable CORS for all routes
-CORS(app)
+# Fingerprinted bundles never change under the same name
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
 
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(tattoo_bp, url_prefix='/api')
+def create_app(config=None):
+    """Build the app; config overrides app.config, e.g. SQLALCHEMY_DATABASE_URI or TESTING.
 
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+    START_BACKGROUND_THREADS=False leaves the image store collector to the caller, for a
+    gunicorn master that preloads the app and must not fork with threads running.
+    """
+    app = Flask(__name__, static_folder=STATIC_FOLDER)
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['START_BACKGROUND_THREADS'] = True
+    app.config.update(config or {})
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+    # Enable CORS for all routes
+    CORS(app)
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(tattoo_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(readings_bp, url_prefix='/api')
+    app.register_blueprint(images_bp)
+    app.register_blueprint(metrics_bp)
+
+    # SQLite in WAL mode by default; set DATABASE_URL for a server database
+    configure_database(app, db, app.config.get('SQLALCHEMY_DATABASE_URI'))
+
+    # Keep generated images under their disk quota
+    if app.config['START_BACKGROUND_THREADS']:
+        start_garbage_collector()
+
+    # Index the static folder once at startup: ETags, sizes and precompressed siblings
+    app.extensions['asset_manifest'] = AssetManifest(app.static_folder).build()
+
+    app.add_url_rule('/', defaults={'path': ''}, view_func=serve)
+    app.add_url_rule('/<path:path>', view_func=serve)
+    return app
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
+_app = None
+_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # "from src.main import app" and "src.main:app" get one shared app, built on first use
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+def send_asset(asset):
+    encoding = None
+    for candidate in ('br', 'gzip'):
+        if candidate in asset.encodings and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+
+    path = asset.encodings[encoding] if encoding else asset.path
+    etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+    response = send_file(path, mimetype=asset.mimetype, conditional=True, etag=etag,
+                         max_age=IMMUTABLE_MAX_AGE if asset.fingerprinted else 0)
+    if asset.fingerprinted:
+        response.cache_control.immutable = True
     else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+        # Unversioned files (index.html) are revalidated with the ETag on every load
+        response.cache_control.no_cache = True
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.encodings:
+        response.vary.add('Accept-Encoding')
+    return response
 
+def serve(path):
+    asset_manifest = current_app.extensions['asset_manifest']
+    asset = asset_manifest.get(path) if path else None
+    if asset is None and path and current_app.debug:
+        # Pick up files added while the dev server is running
+        asset = asset_manifest.build().get(path)
+    if asset is None:
+        asset = asset_manifest.get('index.html')
+    if asset is None:
+        return "index.html not found", 404
+    return send_asset(asset)
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
 
+if __name__ == '__main__':
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,22 @@
+from src.models.user import db
+
+# Times are Unix seconds as floats: bucket refills need sub-second precision and
+# the arithmetic runs inside single UPDATE statements
+
+class AdmissionLease(db.Model):
+    """One generation in flight; leases of a crashed worker expire on their own"""
+    id = db.Column(db.String(32), primary_key=True)
+    started_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<AdmissionLease {self.id}>'
+
+class ClientBucket(db.Model):
+    """Token bucket for one client key, such as ip:203.0.113.7 or user:42"""
+    key = db.Column(db.String(128), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ClientBucket {self.key} {self.tokens:.2f}>'
@@ -0,0 +1,11 @@
+from datetime import datetime
+from src.models.user import db
+
+class CacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<CacheEntry {self.key}>'
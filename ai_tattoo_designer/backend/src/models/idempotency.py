@@ -0,0 +1,22 @@
+from src.models.user import db
+
+class IdempotencyRecord(db.Model):
+    """One Idempotency-Key: claimed while its generation runs, then the stored response.
+
+    Times are Unix seconds as floats, like the admission tables.
+    """
+    # sha256 of route, client and the header value
+    key = db.Column(db.String(64), primary_key=True)
+    # sha256 of the request body, so a key can't be reused for a different request
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False)  # in_flight, completed
+    # Changes with every claim, so a request only ever updates its own claim
+    owner = db.Column(db.String(32), nullable=False)
+    status_code = db.Column(db.Integer)
+    response = db.Column(db.Text)
+    # An in_flight claim past this belongs to a worker that died
+    locked_until = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyRecord {self.key[:12]} {self.status}>'
@@ -0,0 +1,42 @@
+from datetime import datetime
+from src.models.user import db
+
+class Reading(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # A deleted user's readings stay fetchable by id, just no longer attached to anyone
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), index=True)
+    input_hash = db.Column(db.String(64), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    image_prompt = db.Column(db.Text)
+    symbolic_analysis = db.Column(db.Text)
+    core_tattoo_theme = db.Column(db.Text)
+    visual_motif_description = db.Column(db.Text)
+    placement_suggestion = db.Column(db.Text)
+    mystical_insight = db.Column(db.Text)
+    image_path = db.Column(db.String(255))
+    text_provider = db.Column(db.String(100))
+    image_provider = db.Column(db.String(50))
+
+    # Keyset pagination of a user's history walks this index newest-first
+    __table_args__ = (
+        db.Index('ix_reading_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Reading {self.id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'input_hash': self.input_hash,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'image_prompt': self.image_prompt,
+            'symbolic_analysis': self.symbolic_analysis,
+            'core_tattoo_theme': self.core_tattoo_theme,
+            'visual_motif_description': self.visual_motif_description,
+            'placement_suggestion': self.placement_suggestion,
+            'mystical_insight': self.mystical_insight,
+            'image_url': self.image_path,
+            'ai_provider': f"text:{self.text_provider},image:{self.image_provider}"
+        }
@@ -0,0 +1,66 @@
+import os
+import asyncio
+import aiohttp
+from src.providers.http import (PROVIDER_CONNECT_TIMEOUT, PROVIDER_READ_TIMEOUT, PROVIDER_MAX_RETRIES,
+                                is_retryable_status, backoff_delay)
+from src.services import deadlines
+
+# One event loop holds every in-flight generation of the process, so its pool is much
+# larger than the per-thread sync one
+ASYNC_PROVIDER_POOL_SIZE = int(os.getenv('ASYNC_PROVIDER_POOL_SIZE', '200'))
+
+# aiohttp sessions belong to the loop that created them
+_sessions = {}
+
+def get_client_session():
+    """Return the keep-alive ClientSession for the running event loop"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_PROVIDER_POOL_SIZE, limit_per_host=ASYNC_PROVIDER_POOL_SIZE)
+        session = _sessions[loop] = aiohttp.ClientSession(connector=connector)
+    return session
+
+async def close_client_session():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+def make_timeout(read_timeout=None):
+    """Socket timeouts, and a total that ends the request (body included) at the request deadline"""
+    return aiohttp.ClientTimeout(total=deadlines.remaining(), sock_connect=deadlines.clamp(PROVIDER_CONNECT_TIMEOUT),
+                                 sock_read=deadlines.clamp(read_timeout or PROVIDER_READ_TIMEOUT))
+
+async def request(method, url, read_timeout=None, max_retries=PROVIDER_MAX_RETRIES, **kwargs):
+    """Async twin of http.request: same retry policy, caller releases the response"""
+    session = get_client_session()
+    timeout = kwargs.pop("timeout", None)
+
+    attempt = 0
+    while True:
+        response = await session.request(method, url, timeout=timeout or make_timeout(read_timeout), **kwargs)
+        if not is_retryable_status(response.status) or attempt >= max_retries:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        if not deadlines.can_wait(delay):
+            return response
+        print(f"Retrying {method} {url} after {response.status} in {delay:.2f}s")
+        response.release()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+async def call_with_retries(make_coro, get_status, max_retries=PROVIDER_MAX_RETRIES):
+    """Async twin of http.call_with_retries for SDK coroutines"""
+    attempt = 0
+    while True:
+        try:
+            return await make_coro()
+        except Exception as e:
+            if not is_retryable_status(get_status(e)) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            if not deadlines.can_wait(delay):
+                raise
+            print(f"Retrying provider call after {e} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
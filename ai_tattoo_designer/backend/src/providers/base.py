@@ -0,0 +1,49 @@
+import os
+import asyncio
+
+# Ask backends for JSON-only replies where the API supports it
+TEXT_JSON_MODE = os.getenv('TEXT_JSON_MODE', 'true').lower() == 'true'
+
+IMAGE_STYLE_SUFFIX = " - black and white tattoo design, detailed line art, mystical style"
+
+class ProviderError(Exception):
+    """Raised by streaming provider calls that fail before or during the stream"""
+
+class TextProvider:
+    """Common interface for the text backends that write the tattoo reading"""
+
+    name = None
+
+    def is_configured(self):
+        raise NotImplementedError
+
+    def complete(self, prompt):
+        """Return the model's raw reply for prompt, or None if the call failed"""
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yield the reply in chunks as tokens arrive; backends without streaming yield it whole"""
+        response = self.complete(prompt)
+        if not response:
+            raise ProviderError(f"{self.name} returned no response")
+        yield response
+
+    async def acomplete(self, prompt):
+        """complete() for the event loop; backends without a native async client use a thread"""
+        return await asyncio.to_thread(self.complete, prompt)
+
+class ImageProvider:
+    """Common interface for the image backends that render the tattoo design"""
+
+    name = None
+
+    def is_configured(self):
+        raise NotImplementedError
+
+    def generate(self, image_prompt):
+        """Render image_prompt into the image store and return its static URL, or None if the call failed"""
+        raise NotImplementedError
+
+    async def agenerate(self, image_prompt):
+        """generate() for the event loop; backends without a native async client use a thread"""
+        return await asyncio.to_thread(self.generate, image_prompt)
@@ -0,0 +1,298 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from src.providers.base import ProviderError, ImageProvider
+from src.providers.rate_limit import wait_for_rate_limit, await_rate_limit
+from src.services.hedging import LatencyTracker
+from src.services import deadlines, metrics
+
+# Circuit breaker tuning, shared by every text and image provider
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+BREAKER_MIN_REQUESTS = int(os.getenv('BREAKER_MIN_REQUESTS', '5'))
+BREAKER_ERROR_THRESHOLD = float(os.getenv('BREAKER_ERROR_THRESHOLD', '0.5'))
+BREAKER_CONSECUTIVE_FAILURES = int(os.getenv('BREAKER_CONSECUTIVE_FAILURES', '3'))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv('BREAKER_HALF_OPEN_PROBES', '1'))
+# Successful-call latencies kept for scoring and for the text hedge delay percentile
+HEALTH_LATENCY_WINDOW = int(os.getenv('HEALTH_LATENCY_WINDOW', '200'))
+# Expected latency assumed for a provider that has no successful calls yet
+HEALTH_DEFAULT_LATENCY = float(os.getenv('HEALTH_DEFAULT_LATENCY', '10'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class ProviderHealth:
+    """Rolling latency/error stats and a closed/open/half-open circuit breaker for one provider"""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at = None
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.latency = LatencyTracker(window=HEALTH_LATENCY_WINDOW)
+        # Time to first chunk of streaming calls, used for the streaming hedge delay
+        self.first_chunk_latency = LatencyTracker(window=HEALTH_LATENCY_WINDOW)
+        self.total_calls = 0
+        self.total_failures = 0
+        self._lock = threading.Lock()
+
+    def _cooldown_elapsed(self):
+        return time.monotonic() - self.opened_at >= BREAKER_OPEN_SECONDS
+
+    def available(self):
+        """Whether a call would currently be let through (does not reserve a probe)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self._cooldown_elapsed()
+            return self.probes_in_flight < BREAKER_HALF_OPEN_PROBES
+
+    def acquire(self):
+        """Reserve permission for one call; after the open period this lets probe requests through"""
+        with self._lock:
+            if self.state == OPEN and self._cooldown_elapsed():
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.probes_in_flight < BREAKER_HALF_OPEN_PROBES:
+                self.probes_in_flight += 1
+                return True
+            return False
+
+    def release(self):
+        """Give back a probe slot for a call that ended without a verdict"""
+        with self._lock:
+            if self.state == HALF_OPEN and self.probes_in_flight:
+                self.probes_in_flight -= 1
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.total_calls += 1
+            self.outcomes.append(True)
+            self.latency.record(seconds)
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                # A successful probe closes the breaker with a clean window
+                self.state = CLOSED
+                self.opened_at = None
+                self.probes_in_flight = 0
+                self.outcomes.clear()
+
+    def record_failure(self, seconds):
+        with self._lock:
+            self.total_calls += 1
+            self.total_failures += 1
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._trip()
+            elif self.state == CLOSED and self._should_trip():
+                self._trip()
+
+    def _should_trip(self):
+        if self.consecutive_failures >= BREAKER_CONSECUTIVE_FAILURES:
+            return True
+        if len(self.outcomes) < BREAKER_MIN_REQUESTS:
+            return False
+        return self._error_rate() >= BREAKER_ERROR_THRESHOLD
+
+    def _trip(self):
+        print(f"Circuit breaker for {self.name} opened")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+    def _error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def score(self):
+        """Expected seconds per successful call; lower is healthier"""
+        with self._lock:
+            success_rate = 1.0 - self._error_rate()
+        latency = self.latency.percentile(50)
+        if latency is None:
+            latency = HEALTH_DEFAULT_LATENCY
+        return latency / max(success_rate, 0.01)
+
+    def snapshot(self):
+        with self._lock:
+            error_rate = self._error_rate()
+            state = self.state
+            retry_in = None
+            if state == OPEN:
+                retry_in = max(0.0, BREAKER_OPEN_SECONDS - (time.monotonic() - self.opened_at))
+        return {
+            'name': self.name,
+            'state': state,
+            'score': round(self.score(), 3),
+            'error_rate': round(error_rate, 3),
+            'latency_p50': self.latency.percentile(50),
+            'latency_p95': self.latency.percentile(95),
+            'window_size': len(self.outcomes),
+            'consecutive_failures': self.consecutive_failures,
+            'total_calls': self.total_calls,
+            'total_failures': self.total_failures,
+            'retry_in_seconds': retry_in
+        }
+
+_health = {}
+_health_lock = threading.Lock()
+
+def get_health(name):
+    with _health_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth(name)
+        return _health[name]
+
+def rank_providers(providers):
+    """Order providers by live health score, dropping those whose breaker is open.
+
+    The sort is stable, so providers with equal scores (e.g. no traffic yet) keep the
+    registry order.
+    """
+    available = [provider for provider in providers if get_health(provider.name).available()]
+    return sorted(available, key=lambda provider: get_health(provider.name).score())
+
+def provider_kind(provider):
+    return "image" if isinstance(provider, ImageProvider) else "text"
+
+def record_outcome(provider, health, seconds, ok):
+    if ok:
+        health.record_success(seconds)
+    else:
+        health.record_failure(seconds)
+    metrics.record_provider_call(provider_kind(provider), provider.name, seconds, ok)
+
+def deadline_stage(provider):
+    return f"{provider_kind(provider)}:{provider.name}"
+
+def fits_deadline(provider, health, deadline):
+    """Whether a call to provider is expected to finish within deadline; records a skip if not"""
+    if deadline is None:
+        return True
+    expected = health.latency.percentile(50) or deadlines.DEADLINE_MIN_CALL_SECONDS
+    if deadline.allows(deadline_stage(provider), expected):
+        return True
+    print(f"Skipping {provider.name}: {deadline.remaining():.1f}s left of the request deadline")
+    return False
+
+def record_outcome_within(provider, health, deadline, seconds, ok):
+    """record_outcome, except that a call cut off by the request deadline says nothing about the provider"""
+    if not ok and deadline is not None and deadline.expired():
+        health.release()
+        deadline.cut(deadline_stage(provider), "timed_out")
+        return
+    record_outcome(provider, health, seconds, ok)
+
+def guarded_call(provider, fn, deadline=None):
+    """Run fn() through provider's breaker and record the outcome; None counts as a failure.
+
+    With a deadline, the call is skipped when it is not expected to finish in time, and
+    otherwise runs with the deadline current (see src/services/deadlines.py).
+    """
+    health = get_health(provider.name)
+    if not fits_deadline(provider, health, deadline):
+        return None
+    if not health.acquire():
+        print(f"Skipping {provider.name}: circuit breaker is {health.state}")
+        return None
+    wait_for_rate_limit(provider.name)
+
+    started = time.monotonic()
+    with metrics.PROVIDER_CALLS_IN_FLIGHT.labels(provider_kind(provider), provider.name).track_inprogress(), \
+            deadlines.activate(deadline):
+        try:
+            result = fn()
+        except Exception:
+            record_outcome_within(provider, health, deadline, time.monotonic() - started, False)
+            raise
+    record_outcome_within(provider, health, deadline, time.monotonic() - started, bool(result))
+    return result
+
+async def aguarded_call(provider, make_coro, deadline=None):
+    """guarded_call for coroutines: await make_coro() through provider's breaker, cancelled at the deadline"""
+    health = get_health(provider.name)
+    if not fits_deadline(provider, health, deadline):
+        return None
+    if not health.acquire():
+        print(f"Skipping {provider.name}: circuit breaker is {health.state}")
+        return None
+    try:
+        await await_rate_limit(provider.name)
+    except asyncio.CancelledError:
+        # Cancelled before the call went out: give the probe slot back, or the breaker never closes
+        health.release()
+        raise
+
+    started = time.monotonic()
+    with metrics.PROVIDER_CALLS_IN_FLIGHT.labels(provider_kind(provider), provider.name).track_inprogress(), \
+            deadlines.activate(deadline):
+        try:
+            result = await asyncio.wait_for(make_coro(), deadline.remaining() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            record_outcome_within(provider, health, deadline, time.monotonic() - started, False)
+            return None
+        except asyncio.CancelledError:
+            # Lost a hedge race; like an abandoned stream, this says nothing about the provider
+            health.release()
+            raise
+        except Exception:
+            record_outcome_within(provider, health, deadline, time.monotonic() - started, False)
+            raise
+    record_outcome_within(provider, health, deadline, time.monotonic() - started, bool(result))
+    return result
+
+def guarded_stream(provider, make_stream, deadline=None):
+    """Iterate make_stream() through provider's breaker, recording the outcome when the stream ends.
+
+    Raises ProviderError if the breaker or the deadline refuses the call, or if the deadline
+    passes mid-stream. A stream that yields nothing counts as a failure; one abandoned by
+    the consumer is not recorded.
+    """
+    health = get_health(provider.name)
+    if not fits_deadline(provider, health, deadline):
+        raise ProviderError(f"Skipping {provider.name}: not enough time left of the request deadline")
+    if not health.acquire():
+        raise ProviderError(f"Skipping {provider.name}: circuit breaker is {health.state}")
+    wait_for_rate_limit(provider.name)
+
+    started = time.monotonic()
+    received = False
+    in_flight = metrics.PROVIDER_CALLS_IN_FLIGHT.labels(provider_kind(provider), provider.name)
+    in_flight.inc()
+    try:
+        with deadlines.activate(deadline):
+            stream = make_stream()
+        while True:
+            # The stream runs its request lazily, so the deadline is made current for each step
+            with deadlines.activate(deadline):
+                chunk = next(stream, None)
+                if chunk is not None:
+                    deadlines.check()
+            if chunk is None:
+                break
+            if not received:
+                received = True
+                health.first_chunk_latency.record(time.monotonic() - started)
+            yield chunk
+    except GeneratorExit:
+        health.release()
+        raise
+    except deadlines.DeadlineExceeded as e:
+        record_outcome_within(provider, health, deadline, time.monotonic() - started, False)
+        raise ProviderError(f"{provider.name} stream cut off: {e}") from e
+    except Exception:
+        record_outcome_within(provider, health, deadline, time.monotonic() - started, False)
+        raise
+    finally:
+        in_flight.dec()
+    record_outcome_within(provider, health, deadline, time.monotonic() - started, received)
@@ -0,0 +1,86 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from src.services import deadlines
+
+# Shared connection settings for every provider backend
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv('PROVIDER_CONNECT_TIMEOUT', '5'))
+PROVIDER_READ_TIMEOUT = float(os.getenv('PROVIDER_READ_TIMEOUT', '60'))
+PROVIDER_POOL_SIZE = int(os.getenv('PROVIDER_POOL_SIZE', '20'))
+PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', '2'))
+PROVIDER_BACKOFF_BASE = float(os.getenv('PROVIDER_BACKOFF_BASE', '0.5'))
+PROVIDER_BACKOFF_MAX = float(os.getenv('PROVIDER_BACKOFF_MAX', '8'))
+
+# Only throttling and server-side failures are worth retrying; 4xx means the request itself is wrong
+RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(url):
+    """Return the pooled keep-alive Session for the scheme+host of url"""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PROVIDER_POOL_SIZE)
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[origin] = session
+        return session
+
+def make_timeout(read_timeout=None):
+    """(connect, read) timeouts, cut to what is left of the request deadline"""
+    return (deadlines.clamp(PROVIDER_CONNECT_TIMEOUT), deadlines.clamp(read_timeout or PROVIDER_READ_TIMEOUT))
+
+def is_retryable_status(status_code):
+    return status_code in RETRYABLE_STATUSES
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After when the server sends one"""
+    if retry_after:
+        try:
+            return min(float(retry_after), PROVIDER_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(PROVIDER_BACKOFF_MAX, PROVIDER_BACKOFF_BASE * (2 ** attempt)))
+
+def request(method, url, read_timeout=None, max_retries=PROVIDER_MAX_RETRIES, **kwargs):
+    """Send a request on the pooled session for url, retrying 429/5xx responses with jittered backoff"""
+    session = get_session(url)
+    timeout = kwargs.pop("timeout", None)
+
+    attempt = 0
+    while True:
+        # Recomputed per attempt: each retry has less of the deadline left
+        response = session.request(method, url, timeout=timeout or make_timeout(read_timeout), **kwargs)
+        if not is_retryable_status(response.status_code) or attempt >= max_retries:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        if not deadlines.can_wait(delay):
+            return response
+        print(f"Retrying {method} {url} after {response.status_code} in {delay:.2f}s")
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+
+def call_with_retries(fn, get_status, max_retries=PROVIDER_MAX_RETRIES):
+    """Retry an SDK call whose failures carry an HTTP status, using the same policy as request()"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if not is_retryable_status(get_status(e)) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            if not deadlines.can_wait(delay):
+                raise
+            print(f"Retrying provider call after {e} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,134 @@
+import os
+import openai
+from src.providers import http, async_http
+from src.providers.base import ProviderError, TextProvider, ImageProvider, IMAGE_STYLE_SUFFIX, TEXT_JSON_MODE
+from src.services import image_store
+from src.services.prompts import SYSTEM_PROMPT
+
+openai.api_key = os.getenv('OPENAI_API_KEY')
+# Route the SDK through the shared keep-alive pool instead of its per-thread sessions
+openai.requestssession = http.get_session(openai.api_base)
+
+OPENAI_TEXT_READ_TIMEOUT = float(os.getenv('OPENAI_TEXT_READ_TIMEOUT', '30'))
+OPENAI_IMAGE_READ_TIMEOUT = float(os.getenv('OPENAI_IMAGE_READ_TIMEOUT', '60'))
+IMAGE_DOWNLOAD_READ_TIMEOUT = float(os.getenv('IMAGE_DOWNLOAD_READ_TIMEOUT', '30'))
+
+def openai_error_status(error):
+    return getattr(error, 'http_status', None)
+
+class ChatGPTProvider(TextProvider):
+    """ChatGPT through the OpenAI SDK (primary)"""
+
+    name = "chatgpt"
+    model = "gpt-3.5-turbo"
+
+    def is_configured(self):
+        return bool(openai.api_key)
+
+    def _params(self, prompt, **kwargs):
+        if TEXT_JSON_MODE:
+            kwargs["response_format"] = {"type": "json_object"}
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1200,  # Increased for more detailed responses
+            temperature=0.8,
+            request_timeout=http.make_timeout(OPENAI_TEXT_READ_TIMEOUT),
+            **kwargs
+        )
+
+    def _create(self, prompt, **kwargs):
+        return http.call_with_retries(
+            lambda: openai.ChatCompletion.create(**self._params(prompt, **kwargs)),
+            openai_error_status
+        )
+
+    def complete(self, prompt):
+        try:
+            response = self._create(prompt)
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Error generating ChatGPT response: {e}")
+            return None
+
+    async def acomplete(self, prompt):
+        try:
+            openai.aiosession.set(async_http.get_client_session())
+            response = await async_http.call_with_retries(
+                lambda: openai.ChatCompletion.acreate(**self._params(prompt)),
+                openai_error_status
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Error generating ChatGPT response: {e}")
+            return None
+
+    def stream(self, prompt):
+        try:
+            for chunk in self._create(prompt, stream=True):
+                content = chunk.choices[0].delta.get("content")
+                if content:
+                    yield content
+        except Exception as e:
+            raise ProviderError(f"ChatGPT stream failed: {e}") from e
+
+class DalleImageProvider(ImageProvider):
+    """DALL-E through the OpenAI SDK, downloading the result over the pooled session"""
+
+    name = "dalle"
+
+    def is_configured(self):
+        return bool(openai.api_key)
+
+    def _params(self, image_prompt):
+        return dict(
+            prompt=f"{image_prompt}{IMAGE_STYLE_SUFFIX}",
+            n=1,
+            size="512x512",
+            request_timeout=http.make_timeout(OPENAI_IMAGE_READ_TIMEOUT)
+        )
+
+    def generate(self, image_prompt):
+        try:
+            response = http.call_with_retries(
+                lambda: openai.Image.create(**self._params(image_prompt)),
+                openai_error_status
+            )
+
+            image_url = response['data'][0]['url']
+
+            # Stream the download straight into the image store
+            with http.request("GET", image_url, read_timeout=IMAGE_DOWNLOAD_READ_TIMEOUT, stream=True) as image_response:
+                if image_response.status_code == 200:
+                    return image_store.store_stream(image_response.iter_content(image_store.IMAGE_STORE_CHUNK_SIZE))
+
+                print(f"DALL-E image download error: {image_response.status_code}")
+                return None
+        except Exception as e:
+            print(f"Error generating image with DALL-E: {e}")
+            return None
+
+    async def agenerate(self, image_prompt):
+        try:
+            openai.aiosession.set(async_http.get_client_session())
+            response = await async_http.call_with_retries(
+                lambda: openai.Image.acreate(**self._params(image_prompt)),
+                openai_error_status
+            )
+
+            image_url = response['data'][0]['url']
+
+            response = await async_http.request("GET", image_url, read_timeout=IMAGE_DOWNLOAD_READ_TIMEOUT)
+            async with response:
+                if response.status == 200:
+                    return await image_store.astore_stream(
+                        response.content.iter_chunked(image_store.IMAGE_STORE_CHUNK_SIZE))
+
+                print(f"DALL-E image download error: {response.status}")
+                return None
+        except Exception as e:
+            print(f"Error generating image with DALL-E: {e}")
+            return None
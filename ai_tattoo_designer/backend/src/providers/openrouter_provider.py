@@ -0,0 +1,110 @@
+import os
+import json
+from src.providers import http, async_http
+from src.providers.base import ProviderError, TextProvider, TEXT_JSON_MODE
+from src.services.prompts import SYSTEM_PROMPT
+
+# OpenRouter configuration
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1")
+OPENROUTER_READ_TIMEOUT = float(os.getenv('OPENROUTER_READ_TIMEOUT', '30'))
+
+class OpenRouterProvider(TextProvider):
+    """Claude through OpenRouter (backup)"""
+
+    name = "openrouter"
+    model = "anthropic/claude-3.5-sonnet"
+
+    def is_configured(self):
+        return bool(OPENROUTER_API_KEY)
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "HTTP-Referer": "https://ai-tat-oracle-frontend.onrender.com",
+            "X-Title": "AI Tattoo Oracle Designer",
+            "Content-Type": "application/json"
+        }
+
+    def _payload(self, prompt, stream=False):
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 1200,  # Increased for more detailed responses
+            "temperature": 0.8,
+            "stream": stream
+        }
+        if TEXT_JSON_MODE:
+            # Models without JSON mode ignore this; the reply is repaired on our side either way
+            data["response_format"] = {"type": "json_object"}
+        return data
+
+    def _post(self, prompt, stream=False):
+        return http.request(
+            "POST",
+            f"{OPENROUTER_BASE_URL}/chat/completions",
+            read_timeout=OPENROUTER_READ_TIMEOUT,
+            headers=self._headers(),
+            json=self._payload(prompt, stream),
+            stream=stream
+        )
+
+    def complete(self, prompt):
+        try:
+            response = self._post(prompt)
+
+            if response.status_code == 200:
+                result = response.json()
+                return result['choices'][0]['message']['content'].strip()
+
+            print(f"OpenRouter API error: {response.status_code} - {response.text}")
+            return None
+        except Exception as e:
+            print(f"Error generating OpenRouter response: {e}")
+            return None
+
+    async def acomplete(self, prompt):
+        try:
+            response = await async_http.request(
+                "POST",
+                f"{OPENROUTER_BASE_URL}/chat/completions",
+                read_timeout=OPENROUTER_READ_TIMEOUT,
+                headers=self._headers(),
+                json=self._payload(prompt)
+            )
+            async with response:
+                if response.status == 200:
+                    result = await response.json(content_type=None)
+                    return result['choices'][0]['message']['content'].strip()
+
+                print(f"OpenRouter API error: {response.status} - {await response.text()}")
+                return None
+        except Exception as e:
+            print(f"Error generating OpenRouter response: {e}")
+            return None
+
+    def stream(self, prompt):
+        try:
+            response = self._post(prompt, stream=True)
+        except Exception as e:
+            raise ProviderError(f"OpenRouter stream failed: {e}") from e
+
+        with response:
+            if response.status_code != 200:
+                raise ProviderError(f"OpenRouter API error: {response.status_code} - {response.text}")
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    # Server-sent events; lines starting with ":" are keep-alive comments
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    content = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+            except Exception as e:
+                raise ProviderError(f"OpenRouter stream failed: {e}") from e
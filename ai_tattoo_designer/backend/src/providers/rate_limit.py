@@ -0,0 +1,66 @@
+import os
+import time
+import asyncio
+import threading
+
+def parse_rate_limits(value):
+    """Parse "chatgpt=5,dalle=0.5" into {name: requests_per_second}"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            limits[name.strip()] = float(rate)
+    return limits
+
+# Per-provider request rates for this process, e.g. PROVIDER_RATE_LIMITS="chatgpt=5,dalle=0.5"
+PROVIDER_RATE_LIMITS = parse_rate_limits(os.getenv('PROVIDER_RATE_LIMITS'))
+
+class TokenBucket:
+    """Token bucket: acquire() blocks until a token is available; reserve() says how long to wait"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take the next token now and return the seconds until it may be used"""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name):
+    rate = PROVIDER_RATE_LIMITS.get(name)
+    if not rate:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = TokenBucket(rate)
+    return bucket
+
+def wait_for_rate_limit(name):
+    """Block until provider name may send another request; no-op for unlimited providers"""
+    bucket = get_bucket(name)
+    if bucket is not None:
+        bucket.acquire()
+
+async def await_rate_limit(name):
+    """wait_for_rate_limit for the event loop: sleeps without holding a thread"""
+    bucket = get_bucket(name)
+    if bucket is not None:
+        await asyncio.sleep(bucket.reserve())
@@ -0,0 +1,67 @@
+import importlib
+import threading
+from src.providers.base import TextProvider, ImageProvider
+
+class LazyProvider:
+    """Imports and builds its backend on first use.
+
+    The provider modules pull in openai, aiohttp and requests, and read their settings from
+    the environment when imported. Deferring that keeps app startup (and processes that
+    never call a provider) fast; load_providers() does it up front, e.g. in a gunicorn
+    master before it forks.
+    """
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self._provider = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._provider is None:
+            with self._lock:
+                if self._provider is None:
+                    module_name, _, class_name = self.target.partition(":")
+                    self._provider = getattr(importlib.import_module(module_name), class_name)()
+        return self._provider
+
+    def is_configured(self):
+        return self.load().is_configured()
+
+class LazyTextProvider(LazyProvider, TextProvider):
+
+    def complete(self, prompt):
+        return self.load().complete(prompt)
+
+    def stream(self, prompt):
+        return self.load().stream(prompt)
+
+    async def acomplete(self, prompt):
+        return await self.load().acomplete(prompt)
+
+class LazyImageProvider(LazyProvider, ImageProvider):
+
+    def generate(self, image_prompt):
+        return self.load().generate(image_prompt)
+
+    async def agenerate(self, image_prompt):
+        return await self.load().agenerate(image_prompt)
+
+# Fallback order: the first configured provider is tried first.
+# New backends only need to implement TextProvider/ImageProvider and be listed here.
+TEXT_PROVIDERS = [
+    LazyTextProvider("chatgpt", "src.providers.openai_provider:ChatGPTProvider"),
+    LazyTextProvider("openrouter", "src.providers.openrouter_provider:OpenRouterProvider"),
+]
+IMAGE_PROVIDERS = [
+    LazyImageProvider("dalle", "src.providers.openai_provider:DalleImageProvider"),
+    LazyImageProvider("stability", "src.providers.stability_provider:StabilityImageProvider"),
+]
+
+def configured(providers):
+    return [provider for provider in providers if provider.is_configured()]
+
+def load_providers():
+    """Import every provider backend now instead of on first use"""
+    for provider in TEXT_PROVIDERS + IMAGE_PROVIDERS:
+        provider.load()
@@ -0,0 +1,74 @@
+import os
+from src.providers import http, async_http
+from src.providers.base import ImageProvider, IMAGE_STYLE_SUFFIX
+from src.services import image_store
+
+STABILITY_API_KEY = os.getenv('STABILITY_API_KEY')
+STABILITY_API_URL = os.getenv(
+    'STABILITY_API_URL',
+    "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
+)
+STABILITY_READ_TIMEOUT = float(os.getenv('STABILITY_READ_TIMEOUT', '60'))
+
+class StabilityImageProvider(ImageProvider):
+    """Stable Diffusion XL through the Stability AI REST API"""
+
+    name = "stability"
+
+    def is_configured(self):
+        return bool(STABILITY_API_KEY)
+
+    def _headers(self):
+        # Ask for the raw PNG rather than base64 JSON so it can be streamed to disk
+        return {
+            "Accept": "image/png",
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {STABILITY_API_KEY}"
+        }
+
+    def _payload(self, image_prompt):
+        return {
+            "text_prompts": [
+                {
+                    "text": f"{image_prompt}{IMAGE_STYLE_SUFFIX}",
+                    "weight": 1
+                }
+            ],
+            "cfg_scale": 7,
+            "height": 512,
+            "width": 512,
+            "samples": 1,
+            "steps": 30,
+        }
+
+    def generate(self, image_prompt):
+        try:
+            with http.request(
+                "POST", STABILITY_API_URL, read_timeout=STABILITY_READ_TIMEOUT,
+                headers=self._headers(), json=self._payload(image_prompt), stream=True
+            ) as response:
+                if response.status_code == 200:
+                    return image_store.store_stream(response.iter_content(image_store.IMAGE_STORE_CHUNK_SIZE))
+
+                print(f"Stability AI error: {response.status_code} - {response.text}")
+                return None
+        except Exception as e:
+            print(f"Error generating image with Stability AI: {e}")
+            return None
+
+    async def agenerate(self, image_prompt):
+        try:
+            response = await async_http.request(
+                "POST", STABILITY_API_URL, read_timeout=STABILITY_READ_TIMEOUT,
+                headers=self._headers(), json=self._payload(image_prompt)
+            )
+            async with response:
+                if response.status == 200:
+                    return await image_store.astore_stream(
+                        response.content.iter_chunked(image_store.IMAGE_STORE_CHUNK_SIZE))
+
+                print(f"Stability AI error: {response.status} - {await response.text()}")
+                return None
+        except Exception as e:
+            print(f"Error generating image with Stability AI: {e}")
+            return None
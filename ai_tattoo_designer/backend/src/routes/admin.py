@@ -0,0 +1,37 @@
+import os
+from flask import Blueprint, current_app, jsonify, request
+from src.providers.registry import TEXT_PROVIDERS, IMAGE_PROVIDERS, configured
+from src.providers.health import get_health, rank_providers
+
+admin_bp = Blueprint('admin', __name__)
+
+# When set, admin endpoints require "Authorization: Bearer <ADMIN_TOKEN>"
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+@admin_bp.before_request
+def require_admin_token():
+    if ADMIN_TOKEN and request.headers.get('Authorization') != f'Bearer {ADMIN_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+def describe_providers(providers):
+    order = [provider.name for provider in rank_providers(configured(providers))]
+    return {
+        'routing_order': order,
+        'providers': [
+            dict(get_health(provider.name).snapshot(), configured=provider.is_configured())
+            for provider in providers
+        ]
+    }
+
+@admin_bp.route('/admin/providers', methods=['GET'])
+def get_provider_health():
+    """Circuit breaker state and health scores for this worker process"""
+    return jsonify({
+        'text': describe_providers(TEXT_PROVIDERS),
+        'image': describe_providers(IMAGE_PROVIDERS)
+    })
+
+@admin_bp.route('/admin/assets', methods=['GET'])
+def get_asset_manifest():
+    """Static asset manifest built at startup: sizes, ETags and precompressed encodings"""
+    return jsonify(current_app.extensions['asset_manifest'].to_dict())
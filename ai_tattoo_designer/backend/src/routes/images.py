@@ -0,0 +1,36 @@
+import re
+from flask import Blueprint, request, send_file, abort
+from werkzeug.utils import safe_join
+from src.services import image_store
+from src.services.image_variants import negotiate
+
+images_bp = Blueprint('images', __name__)
+
+# Stored images are content-addressed, so a rendered file never changes
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# A fallback is served while variants render; let clients re-ask soon
+FALLBACK_MAX_AGE = 60
+# The only files the store serves: shard/shard/digest with an image or variant extension,
+# and the flat PNGs older readings link to. Anything else (temp files, dotfiles) stays private.
+SERVABLE_PATTERN = re.compile(r'^(?:[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.thumb)?\.(?:png|webp|avif|svg)'
+                              r'|[A-Za-z0-9][\w-]*\.png)$')
+
+@images_bp.route('/static/generated_images/<path:filename>', methods=['GET'])
+def serve_generated_image(filename):
+    """Serve a generated image, negotiating WebP/AVIF from the Accept header"""
+    if not SERVABLE_PATTERN.match(filename):
+        abort(404)
+    path = safe_join(image_store.IMAGE_STORE_DIR, filename)
+    if path is None:
+        abort(404)
+
+    accepted = [mimetype for mimetype, quality in request.accept_mimetypes if quality > 0]
+    chosen, is_fallback = negotiate(path, accepted)
+    if chosen is None:
+        abort(404)
+
+    response = send_file(chosen, conditional=True, max_age=FALLBACK_MAX_AGE if is_fallback else IMMUTABLE_MAX_AGE)
+    if not is_fallback:
+        response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,27 @@
+import math
+from flask import Blueprint, jsonify, request
+from src.services.jobs import get_job, wait_for_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Upper bound for a single long-poll so a waiting client can't pin a worker indefinitely
+MAX_WAIT_SECONDS = 30
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/jobs/<job_id>/wait', methods=['GET'])
+def wait_job_status(job_id):
+    timeout = request.args.get('timeout', MAX_WAIT_SECONDS, type=float)
+    # min/max let NaN through, and a NaN wait would spin or fail
+    if not math.isfinite(timeout):
+        timeout = MAX_WAIT_SECONDS
+    timeout = min(max(timeout, 0), MAX_WAIT_SECONDS)
+    job = wait_for_job(job_id, timeout)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
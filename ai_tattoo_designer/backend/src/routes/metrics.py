@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from src.services import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus exposition for every worker of this deployment"""
+    body, content_type = metrics.render_latest()
+    return Response(body, content_type=content_type)
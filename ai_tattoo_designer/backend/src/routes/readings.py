@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from sqlalchemy import and_, or_
+from src.models.user import User, db
+from src.models.reading import Reading
+
+readings_bp = Blueprint('readings', __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(reading):
+    raw = f"{reading.created_at.isoformat()}|{reading.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, reading_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(reading_id)
+
+@readings_bp.route('/readings/<int:reading_id>', methods=['GET'])
+def get_reading(reading_id):
+    reading = db.get_or_404(Reading, reading_id)
+    return jsonify(reading.to_dict())
+
+@readings_bp.route('/users/<int:user_id>/readings', methods=['GET'])
+def get_user_readings(user_id):
+    """A user's readings, newest first, paginated by (created_at, id) cursor rather than offset"""
+    db.get_or_404(User, user_id)
+
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    query = Reading.query.filter(Reading.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, reading_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Reading.created_at < created_at,
+            and_(Reading.created_at == created_at, Reading.id < reading_id)
+        ))
+
+    # One extra row tells us whether there is a next page without a COUNT
+    readings = query.order_by(Reading.created_at.desc(), Reading.id.desc()).limit(limit + 1).all()
+    has_more = len(readings) > limit
+    readings = readings[:limit]
+
+    return jsonify({
+        'readings': [reading.to_dict() for reading in readings],
+        'next_cursor': encode_cursor(readings[-1]) if has_more else None
+    })
@@ -1,25 +1,49 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from datetime import datetime
 import os
-import openai
-import uuid
-import requests
-from io import BytesIO
-import base64
 import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from sqlalchemy.exc import SQLAlchemyError
+from src.providers.base import ProviderError
+from src.models.user import User, db
+from src.models.reading import Reading
+from src.providers.registry import TEXT_PROVIDERS, IMAGE_PROVIDERS, configured
+from src.providers.health import rank_providers, guarded_call, aguarded_call, guarded_stream, get_health
+from src.services.hedging import HedgedStream, hedged_call, ahedged_call
+from src.services import admission, deadlines, idempotency, image_index, image_store, image_variants, metrics, sigil
+from src.services.admission import AdmissionRejected
+from src.services.idempotency import IdempotencyConflict, Replay
+from src.services.reading_cache import reading_cache, make_cache_key, READING_CACHE_ENABLED
+from src.services.json_stream import IncrementalObjectParser
+from src.services.prompts import PROMPT_VERSION, build_user_prompt, build_missing_fields_prompt, log_token_usage
+from src.services.json_repair import repair_json_object, validate_fields
+from src.services.jobs import enqueue_job, JobQueueFull, JOB_RETRY_AFTER_SECONDS
 
 tattoo_bp = Blueprint("tattoo_bp", __name__)
 
-# Initialize OpenAI client
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Hedged text generation: if the primary provider hasn't answered within the
+# TEXT_HEDGE_PERCENTILE latency of its recent calls, race the secondary against it.
+TEXT_HEDGING_ENABLED = os.getenv('TEXT_HEDGING_ENABLED', 'true').lower() == 'true'
+TEXT_HEDGE_PERCENTILE = float(os.getenv('TEXT_HEDGE_PERCENTILE', '95'))
+TEXT_HEDGE_MIN_SAMPLES = int(os.getenv('TEXT_HEDGE_MIN_SAMPLES', '20'))
+TEXT_HEDGE_DEFAULT_DELAY = float(os.getenv('TEXT_HEDGE_DEFAULT_DELAY', '8'))
+TEXT_HEDGE_MIN_DELAY = float(os.getenv('TEXT_HEDGE_MIN_DELAY', '1'))
+TEXT_STREAM_HEDGE_DEFAULT_DELAY = float(os.getenv('TEXT_STREAM_HEDGE_DEFAULT_DELAY', '3'))
 
-# OpenRouter configuration
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# Stream the reading and start the image stage as soon as image_prompt is complete,
+# instead of waiting for the whole narrative. Disable to use the hedged non-streaming path.
+PIPELINE_OVERLAP_ENABLED = os.getenv('PIPELINE_OVERLAP_ENABLED', 'true').lower() == 'true'
+IMAGE_STAGE_WORKERS = int(os.getenv('IMAGE_STAGE_WORKERS', '8'))
 
-# Alternative image generation APIs
-STABILITY_API_KEY = os.getenv('STABILITY_API_KEY')
-REPLICATE_API_TOKEN = os.getenv('REPLICATE_API_TOKEN')
+_image_executor = ThreadPoolExecutor(max_workers=IMAGE_STAGE_WORKERS, thread_name_prefix='image-stage')
+
+# Batch generation: people per request, and how many of them run at once
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '200'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+# Well inside ADMISSION_LEASE_SECONDS, so a running batch's leases never expire
+BATCH_LEASE_RENEW_SECONDS = admission.ADMISSION_LEASE_SECONDS / 3
 
 def get_zodiac_sign(day, month):
     if (month == 1 and day >= 20) or (month == 2 and day <= 18):
@@ -53,372 +77,894 @@ def calculate_life_path_number(dob):
         dob_sum = sum(int(digit) for digit in str(dob_sum))
     return dob_sum
 
+# Cached readings are keyed on the prompt version, see src/services/prompts.py
+PROMPT_TEMPLATE_VERSION = PROMPT_VERSION
+
+@metrics.timed("prompt_build")
 def build_enhanced_prompt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number, 
                          birthplace=None, favorite_element=None, preferred_aesthetic=None, 
                          spirit_animal=None, life_theme=None, personal_story=None, cultural_affiliation=None):
-    """Build an enhanced prompt with additional personalization data"""
-    
-    base_info = f"""
-    You are a mystical AI tattoo oracle designer, inspired by tarot reading and symbolic divination. 
-    Your task is to create a unique, meaningful tattoo design concept based on the following information:
-    
-    CORE IDENTITY:
-    - First Name: {first_name}
-    - Last Name: {last_name}
-    - Date of Birth: {date_of_birth}
-    - Age: {age}
-    - Zodiac Sign: {zodiac_sign}
-    - Life Path Number: {life_path_number}
-    """
-    
-    # Add optional personalization fields
-    additional_info = "\n    DEEPER PERSONALIZATION:"
-    
-    if birthplace:
-        additional_info += f"\n    - Birthplace: {birthplace} (incorporate regional symbolism, geographic elements, or local mythology)"
-    
-    if favorite_element:
-        additional_info += f"\n    - Favorite Element: {favorite_element} (integrate elemental qualities - Fire: bold flames/energy, Water: flowing lines/depth, Earth: grounding/stability, Air: movement/freedom)"
-    
-    if preferred_aesthetic:
-        additional_info += f"\n    - Preferred Aesthetic: {preferred_aesthetic} (design should reflect this visual style and artistic approach)"
-    
-    if spirit_animal:
-        additional_info += f"\n    - Spirit Animal: {spirit_animal} (incorporate this creature's symbolic meaning and characteristics)"
-    
-    if life_theme:
-        additional_info += f"\n    - Life Theme/Value: {life_theme} (weave this concept throughout the design's symbolism)"
-    
-    if personal_story:
-        additional_info += f"\n    - Personal Journey: {personal_story} (honor this experience through symbolic representation)"
-    
-    if cultural_affiliation:
-        additional_info += f"\n    - Cultural/Spiritual Heritage: {cultural_affiliation} (incorporate relevant symbols, patterns, or motifs from this tradition)"
-    
-    # If no additional info was provided, don't add the section
-    if additional_info == "\n    DEEPER PERSONALIZATION:":
-        additional_info = ""
-    
-    format_instructions = """
-    
-    Please provide your response in the following JSON format:
-    {
-        "symbolic_analysis": "Interpret name numerology, zodiac sign, and any relevant symbolic meanings derived from all provided information. Weave together the personal elements into a cohesive narrative.",
-        "core_tattoo_theme": "Describe the emotional, spiritual, or archetypal essence the tattoo should express, incorporating the deeper personalization elements.",
-        "visual_motif_description": "Provide a vivid, imaginative description of the tattoo's visual elements (symbols, shapes, animals, patterns, etc.) that incorporates the specified aesthetic preferences, elements, and cultural influences.",
-        "placement_suggestion": "Recommend ideal body placement and size (e.g., upper forearm, chest, sleeve, ankle) considering the design's complexity and personal significance.",
-        "mystical_insight": "End with a brief fortune-style message tied to the design meaning and the person's journey.",
-        "image_prompt": "A detailed prompt for generating the tattoo image, describing the visual elements in a way suitable for AI image generation. Include specific style, cultural elements, and aesthetic preferences mentioned."
-    }
-    
-    DESIGN GUIDELINES:
-    - Create a mythic story that connects all the personal elements provided
-    - If birthplace is mentioned, incorporate geographic or regional symbolism
-    - If elemental preference is given, let it influence the design's texture and flow
-    - If aesthetic preference is specified, ensure the design reflects that artistic style
-    - If spirit animal is mentioned, make it central to the design's meaning
-    - If life theme is provided, let it guide the overall symbolic message
-    - If personal story is shared, honor it through metaphorical representation
-    - If cultural affiliation is mentioned, respectfully incorporate authentic elements
-    
-    Style & Tone:
-    - Mysterious yet poetic
-    - Tarot card reader meets visionary tattoo artist
-    - Use rich metaphors and artistic vocabulary
-    - Avoid generic or overused symbols—focus on originality and meaningful storytelling
-    - Each reading should be completely unique and deeply personalized
-    - Tell a short mythic story of this person's journey and destiny
-    
-    Make sure the response is valid JSON and each field contains meaningful, unique content based on ALL the person's provided information.
-    """
-    
-    return base_info + additional_info + format_instructions
+    """Build the per-person user message; the static instructions live in the system prompt"""
+    return build_user_prompt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
+                             birthplace=birthplace, favorite_element=favorite_element,
+                             preferred_aesthetic=preferred_aesthetic, spirit_animal=spirit_animal,
+                             life_theme=life_theme, personal_story=personal_story,
+                             cultural_affiliation=cultural_affiliation)
 
-def generate_tattoo_reading_with_openrouter(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-                                          birthplace=None, favorite_element=None, preferred_aesthetic=None, 
-                                          spirit_animal=None, life_theme=None, personal_story=None, cultural_affiliation=None):
-    """Generate a unique tattoo reading using OpenRouter as backup"""
-    
-    prompt = build_enhanced_prompt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-                                 birthplace, favorite_element, preferred_aesthetic, spirit_animal, 
-                                 life_theme, personal_story, cultural_affiliation)
-    
+def collect_hedged_reply(provider, prompt, deadline, cancelled):
+    """provider's whole reply, read as a stream so that losing a hedge stops it between chunks.
+
+    Closing the stream aborts the HTTP response and frees the thread, where a complete()
+    call would keep both until the reply had arrived.
+    """
+    chunks = []
+    stream = guarded_stream(provider, lambda: provider.stream(prompt), deadline)
     try:
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "https://ai-tat-oracle-frontend.onrender.com",
-            "X-Title": "AI Tattoo Oracle Designer",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "anthropic/claude-3.5-sonnet",
-            "messages": [
-                {"role": "system", "content": "You are a mystical AI tattoo oracle designer. Always respond with valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 1200,  # Increased for more detailed responses
-            "temperature": 0.8
-        }
-        
-        response = requests.post(
-            f"{OPENROUTER_BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            print(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return None
-            
-    except Exception as e:
-        print(f"Error generating OpenRouter response: {e}")
-        return None
+        for chunk in stream:
+            if cancelled.is_set():
+                return None
+            chunks.append(chunk)
+    finally:
+        stream.close()
+    return "".join(chunks) or None
 
-def generate_tattoo_reading_with_chatgpt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
+def generate_tattoo_reading_with_fallback(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
                                         birthplace=None, favorite_element=None, preferred_aesthetic=None, 
-                                        spirit_animal=None, life_theme=None, personal_story=None, cultural_affiliation=None):
-    """Generate a unique tattoo reading using ChatGPT (primary)"""
+                                        spirit_animal=None, life_theme=None, personal_story=None, cultural_affiliation=None,
+                                        deadline=None):
+    """Generate tattoo reading with ChatGPT primary and OpenRouter fallback, hedged when both are configured"""
     
     prompt = build_enhanced_prompt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
                                  birthplace, favorite_element, preferred_aesthetic, spirit_animal, 
                                  life_theme, personal_story, cultural_affiliation)
-    
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a mystical AI tattoo oracle designer. Always respond with valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1200,  # Increased for more detailed responses
-            temperature=0.8
-        )
-        
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error generating ChatGPT response: {e}")
-        return None
 
-def generate_tattoo_reading_with_fallback(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-                                        birthplace=None, favorite_element=None, preferred_aesthetic=None, 
-                                        spirit_animal=None, life_theme=None, personal_story=None, cultural_affiliation=None):
-    """Generate tattoo reading with ChatGPT primary and OpenRouter fallback"""
-    
-    # Try ChatGPT first
-    if openai.api_key:
-        chatgpt_response = generate_tattoo_reading_with_chatgpt(
-            first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-            birthplace, favorite_element, preferred_aesthetic, spirit_animal, 
-            life_theme, personal_story, cultural_affiliation
-        )
-        if chatgpt_response:
-            return chatgpt_response, "chatgpt"
-    
-    # Fallback to OpenRouter
-    if OPENROUTER_API_KEY:
-        openrouter_response = generate_tattoo_reading_with_openrouter(
-            first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-            birthplace, favorite_element, preferred_aesthetic, spirit_animal, 
-            life_theme, personal_story, cultural_affiliation
+    # Healthiest provider first; providers with an open circuit breaker are skipped
+    providers = rank_providers(configured(TEXT_PROVIDERS))
+
+    if TEXT_HEDGING_ENABLED and len(providers) > 1:
+        primary, secondary = providers[:2]
+        response, provider, hedged_after = hedged_call(
+            (primary.name, lambda cancelled: collect_hedged_reply(primary, prompt, deadline, cancelled)),
+            (secondary.name, lambda cancelled: collect_hedged_reply(secondary, prompt, deadline, cancelled)),
+            is_valid_reading_json,
+            get_text_hedge_delay(primary)
         )
-        if openrouter_response:
-            return openrouter_response, "openrouter"
+        if not response:
+            return None, "none"
+        log_token_usage(provider, prompt, response)
+        if provider != primary.name:
+            metrics.record_fallback("text", "hedge")
+        if hedged_after is not None:
+            provider = f"{provider}[hedge={hedged_after:.2f}s]"
+        return response, provider
+
+    # Sequential fallback in health order
+    for index, provider in enumerate(providers):
+        response = guarded_call(provider, lambda: provider.complete(prompt), deadline)
+        if response:
+            log_token_usage(provider.name, prompt, response)
+            if index:
+                metrics.record_fallback("text", "sequential")
+            return response, provider.name
     
     # If both fail, return None
     return None, "none"
 
-def generate_image_with_dalle(image_prompt, first_name, last_name):
-    """Generate image using DALL-E (OpenAI)"""
-    try:
-        response = openai.Image.create(
-            prompt=f"{image_prompt} - black and white tattoo design, detailed line art, mystical style",
-            n=1,
-            size="512x512"
+async def agenerate_tattoo_reading_with_fallback(*arguments, deadline=None):
+    """Async twin of generate_tattoo_reading_with_fallback, awaiting the providers' acomplete()"""
+    prompt = build_enhanced_prompt(*arguments)
+    providers = rank_providers(configured(TEXT_PROVIDERS))
+
+    if TEXT_HEDGING_ENABLED and len(providers) > 1:
+        primary, secondary = providers[:2]
+        response, provider, hedged_after = await ahedged_call(
+            (primary.name, lambda: aguarded_call(primary, lambda: primary.acomplete(prompt), deadline)),
+            (secondary.name, lambda: aguarded_call(secondary, lambda: secondary.acomplete(prompt), deadline)),
+            is_valid_reading_json,
+            get_text_hedge_delay(primary)
         )
-        
-        image_url = response['data'][0]['url']
-        
-        # Download and save the image
-        image_response = requests.get(image_url)
-        if image_response.status_code == 200:
-            # Create unique filename
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"tattoo_{first_name}_{last_name}_{unique_id}.png"
-            filepath = os.path.join("src/static/generated_images", filename)
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Save image
-            with open(filepath, 'wb') as f:
-                f.write(image_response.content)
-            
-            return f"/static/generated_images/{filename}"
-        
-    except Exception as e:
-        print(f"Error generating image with DALL-E: {e}")
-        return None
+        if not response:
+            return None, "none"
+        log_token_usage(provider, prompt, response)
+        if provider != primary.name:
+            metrics.record_fallback("text", "hedge")
+        if hedged_after is not None:
+            provider = f"{provider}[hedge={hedged_after:.2f}s]"
+        return response, provider
 
-def generate_image_with_stability(image_prompt, first_name, last_name):
-    """Generate image using Stability AI"""
-    
-    if not STABILITY_API_KEY:
-        return None
-    
-    url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
-    
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {STABILITY_API_KEY}"
-    }
-    
-    payload = {
-        "text_prompts": [
-            {
-                "text": f"{image_prompt} - black and white tattoo design, detailed line art, mystical style",
-                "weight": 1
-            }
-        ],
-        "cfg_scale": 7,
-        "height": 512,
-        "width": 512,
-        "samples": 1,
-        "steps": 30,
+    for index, provider in enumerate(providers):
+        response = await aguarded_call(provider, lambda: provider.acomplete(prompt), deadline)
+        if response:
+            log_token_usage(provider.name, prompt, response)
+            if index:
+                metrics.record_fallback("text", "sequential")
+            return response, provider.name
+
+    return None, "none"
+
+def get_text_hedge_delay(primary, streaming=False):
+    """Seconds to wait on the primary text provider before starting the secondary.
+
+    Streaming calls are hedged on their first chunk, so they use the time-to-first-chunk
+    distribution instead of the full completion latency.
+    """
+    health = get_health(primary.name)
+    latency = health.first_chunk_latency if streaming else health.latency
+    if len(latency) < TEXT_HEDGE_MIN_SAMPLES:
+        return TEXT_STREAM_HEDGE_DEFAULT_DELAY if streaming else TEXT_HEDGE_DEFAULT_DELAY
+    return max(TEXT_HEDGE_MIN_DELAY, latency.percentile(TEXT_HEDGE_PERCENTILE))
+
+def is_valid_reading_json(response):
+    try:
+        repair_json_object(response)
+        return True
+    except ValueError:
+        return False
+
+def complete_missing_fields(prompt, reading, provider_name, deadline=None):
+    """Validate a parsed reading and ask its provider again for just the fields it lacks.
+
+    Returns (reading, missing); missing is empty when the reading is complete.
+    """
+    reading, missing = validate_fields(reading, READING_FIELDS)
+    if not missing:
+        return reading, missing
+
+    # Prefer the provider that wrote the rest of the reading, for a consistent voice
+    providers = rank_providers(configured(TEXT_PROVIDERS))
+    providers.sort(key=lambda provider: provider.name != provider_name)
+    for provider in providers[:1]:
+        print(f"Reading from {provider_name} is missing {', '.join(missing)}; asking {provider.name} for them")
+        followup = build_missing_fields_prompt(prompt, reading, missing)
+        try:
+            extra = repair_json_object(guarded_call(provider, lambda: provider.complete(followup), deadline))
+        except ValueError:
+            extra = {}
+        reading, missing = validate_fields(dict(extra, **reading), READING_FIELDS)
+    return reading, missing
+
+def sigil_traits(inputs):
+    """What the local sigil renderer draws for a person, see src/services/sigil.py"""
+    day, month, _ = map(int, inputs["date_of_birth"].split("/"))
+    zodiac_sign = get_zodiac_sign(day, month)
+    return {
+        "zodiac_sign": zodiac_sign,
+        "life_path_number": calculate_life_path_number(inputs["date_of_birth"]),
+        "element": sigil.resolve_element(inputs.get("favorite_element"), zodiac_sign),
+        "name": inputs.get("spirit_animal") or f"{inputs['first_name']} {inputs['last_name']}",
     }
-    
+
+def generate_placeholder_image(first_name, last_name, traits=None):
+    """Render a sigil locally when all image services fail: no network, a few milliseconds.
+
+    Without traits the sigil carries only the name: no sign mark, the plainest star, no element.
+    """
+    if traits is None:
+        traits = {"zodiac_sign": None, "life_path_number": None, "element": None,
+                  "name": f"{first_name} {last_name}"}
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Save the image
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"tattoo_{first_name}_{last_name}_{unique_id}.png"
-            filepath = os.path.join("src/static/generated_images", filename)
-            
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Decode and save the base64 image
-            image_data = base64.b64decode(data["artifacts"][0]["base64"])
-            with open(filepath, 'wb') as f:
-                f.write(image_data)
-            
-            return f"/static/generated_images/{filename}"
-            
-    except Exception as e:
-        print(f"Error generating image with Stability AI: {e}")
+        image_path = sigil.store_sigil(**traits)
+    except OSError as e:
+        print(f"Failed to render placeholder sigil: {e}")
         return None
+    image_variants.schedule_variants(image_path)
+    return image_path
 
-def generate_placeholder_image(first_name, last_name):
-    """Generate a placeholder when all image services fail"""
-    # You could create a simple text-based image or use a default image
-    # For now, return None to indicate no image available
-    return None
+def find_reusable_image(image_prompt, reuse):
+    """(image_path, provider label) of a stored image with a near-identical prompt, or None"""
+    match = image_index.find_reusable(image_prompt) if reuse else None
+    if match is None:
+        return None
+    return match.url, f"reuse[{match.similarity:.2f}]"
 
-def generate_tattoo_image_with_complete_fallback(image_prompt, first_name, last_name):
+def generate_tattoo_image_with_complete_fallback(image_prompt, first_name, last_name, reuse=True, traits=None,
+                                                 deadline=None):
     """Try multiple image generation services in order"""
-    
-    # 1. Try DALL-E (OpenAI)
-    if openai.api_key:
-        image_path = generate_image_with_dalle(image_prompt, first_name, last_name)
+    reused = find_reusable_image(image_prompt, reuse)
+    if reused:
+        return reused
+
+    # DALL-E (OpenAI) and Stability AI, healthiest first
+    for index, provider in enumerate(rank_providers(configured(IMAGE_PROVIDERS))):
+        # Providers that can't finish before the deadline are skipped, leaving the sigil
+        image_path = guarded_call(provider, lambda: provider.generate(image_prompt), deadline)
         if image_path:
-            return image_path, "dalle"
-    
-    # 2. Try Stability AI
-    if STABILITY_API_KEY:
-        image_path = generate_image_with_stability(image_prompt, first_name, last_name)
+            if index:
+                metrics.record_fallback("image", "sequential")
+            # WebP/AVIF and thumbnails are rendered in a process pool; the image route
+            # serves the original PNG until they exist
+            image_variants.schedule_variants(image_path)
+            image_index.add(image_prompt, image_path)
+            return image_path, provider.name
+    
+    # Fallback to a locally rendered sigil
+    metrics.record_fallback("image", "placeholder")
+    return generate_placeholder_image(first_name, last_name, traits), "placeholder"
+
+async def agenerate_tattoo_image_with_complete_fallback(image_prompt, first_name, last_name, reuse=True,
+                                                       traits=None, deadline=None):
+    """Async twin of generate_tattoo_image_with_complete_fallback"""
+    reused = find_reusable_image(image_prompt, reuse)
+    if reused:
+        return reused
+
+    for index, provider in enumerate(rank_providers(configured(IMAGE_PROVIDERS))):
+        image_path = await aguarded_call(provider, lambda: provider.agenerate(image_prompt), deadline)
         if image_path:
-            return image_path, "stability"
-    
-    # 3. Fallback to placeholder or no image
-    return generate_placeholder_image(first_name, last_name), "placeholder"
+            if index:
+                metrics.record_fallback("image", "sequential")
+            image_variants.schedule_variants(image_path)
+            image_index.add(image_prompt, image_path)
+            return image_path, provider.name
 
-@tattoo_bp.route("/generate_tattoo", methods=["POST"])
-def generate_tattoo():
-    data = request.get_json()
-    
-    # Core required fields
-    first_name = data.get("first_name")
-    last_name = data.get("last_name")
-    date_of_birth = data.get("date_of_birth")
-    age = data.get("age")
-    
-    # Optional personalization fields
-    birthplace = data.get("birthplace")
-    favorite_element = data.get("favorite_element")
-    preferred_aesthetic = data.get("preferred_aesthetic")
-    spirit_animal = data.get("spirit_animal")
-    life_theme = data.get("life_theme")
-    personal_story = data.get("personal_story")
-    cultural_affiliation = data.get("cultural_affiliation")
+    metrics.record_fallback("image", "placeholder")
+    return generate_placeholder_image(first_name, last_name, traits), "placeholder"
+
+class TattooGenerationError(Exception):
+    """Raised when the reading pipeline cannot produce a result"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+@metrics.timed("validation")
+def validate_tattoo_request(data):
+    """Validate a generate_tattoo request body and return (inputs, error_message)"""
+    data = data or {}
+
+    inputs = {
+        # Core required fields
+        "first_name": data.get("first_name"),
+        "last_name": data.get("last_name"),
+        "date_of_birth": data.get("date_of_birth"),
+        "age": data.get("age"),
+        # Optional personalization fields
+        "birthplace": data.get("birthplace"),
+        "favorite_element": data.get("favorite_element"),
+        "preferred_aesthetic": data.get("preferred_aesthetic"),
+        "spirit_animal": data.get("spirit_animal"),
+        "life_theme": data.get("life_theme"),
+        "personal_story": data.get("personal_story"),
+        "cultural_affiliation": data.get("cultural_affiliation"),
+        # Skip the reading cache and always generate a new reading
+        "fresh": bool(data.get("fresh", False)),
+        # Optional owner of the reading, for the history API
+        "user_id": data.get("user_id"),
+        # Optional time budget for the whole generation, see src/services/deadlines.py
+        "deadline_seconds": data.get("deadline_seconds"),
+    }
 
     # Validation for required fields
-    if not isinstance(first_name, str) or not first_name.strip():
-        return jsonify({"error": "First name must be a non-empty string"}), 400
-    if not isinstance(last_name, str) or not last_name.strip():
-        return jsonify({"error": "Last name must be a non-empty string"}), 400
-    if not isinstance(age, int) or age <= 0:
-        return jsonify({"error": "Age must be a positive integer"}), 400
-    if not date_of_birth:
-        return jsonify({"error": "Missing input data"}), 400
+    if not isinstance(inputs["first_name"], str) or not inputs["first_name"].strip():
+        return None, "First name must be a non-empty string"
+    if not isinstance(inputs["last_name"], str) or not inputs["last_name"].strip():
+        return None, "Last name must be a non-empty string"
+    if not isinstance(inputs["age"], int) or inputs["age"] <= 0:
+        return None, "Age must be a positive integer"
+    if not inputs["date_of_birth"]:
+        return None, "Missing input data"
+    if inputs["user_id"] is not None and (not isinstance(inputs["user_id"], int) or inputs["user_id"] <= 0):
+        return None, "User id must be a positive integer"
+    deadline_seconds = inputs["deadline_seconds"]
+    if deadline_seconds is not None and (isinstance(deadline_seconds, bool) or
+                                         not isinstance(deadline_seconds, (int, float)) or deadline_seconds <= 0):
+        return None, "Deadline must be a positive number of seconds"
 
     try:
-        day, month, year = map(int, date_of_birth.split("/"))
-        dob_date = datetime(year, month, day)
-    except ValueError:
-        return jsonify({"error": "Invalid date of birth format. Use dd/mm/yyyy"}), 400
+        day, month, year = map(int, inputs["date_of_birth"].split("/"))
+        datetime(year, month, day)
+    except (ValueError, AttributeError):
+        return None, "Invalid date of birth format. Use dd/mm/yyyy"
+
+    return inputs, None
+
+READING_FIELDS = (
+    "image_prompt", "symbolic_analysis", "core_tattoo_theme", "visual_motif_description",
+    "placement_suggestion", "mystical_insight",
+)
+
+PERSONALIZATION_FIELDS = (
+    "birthplace", "favorite_element", "preferred_aesthetic", "spirit_animal",
+    "life_theme", "personal_story", "cultural_affiliation",
+)
+
+def reading_arguments(inputs):
+    """Positional arguments for build_enhanced_prompt / generate_tattoo_reading_with_fallback"""
+    date_of_birth = inputs["date_of_birth"]
 
     # Calculate astrological data
+    day, month, year = map(int, date_of_birth.split("/"))
     zodiac_sign = get_zodiac_sign(day, month)
     life_path_number = calculate_life_path_number(date_of_birth)
 
-    # Generate unique reading with enhanced personalization and fallback system
-    ai_response, text_provider = generate_tattoo_reading_with_fallback(
-        first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
-        birthplace, favorite_element, preferred_aesthetic, spirit_animal, 
-        life_theme, personal_story, cultural_affiliation
-    )
-    
-    if not ai_response:
-        return jsonify({"error": "Failed to generate tattoo reading - all AI services unavailable"}), 500
-    
-    try:
-        reading_data = json.loads(ai_response)
-    except json.JSONDecodeError:
-        return jsonify({"error": "Invalid response format from AI"}), 500
-    
-    # Generate image based on the AI's description with complete fallback
-    image_path, image_provider = generate_tattoo_image_with_complete_fallback(
-        reading_data.get("image_prompt", ""), first_name, last_name
-    )
-    
-    # Prepare response
-    response_data = {
-        "symbolic_analysis": reading_data.get("symbolic_analysis", ""),
-        "core_tattoo_theme": reading_data.get("core_tattoo_theme", ""),
-        "visual_motif_description": reading_data.get("visual_motif_description", ""),
-        "placement_suggestion": reading_data.get("placement_suggestion", ""),
-        "mystical_insight": reading_data.get("mystical_insight", ""),
-        "image_prompt": reading_data.get("image_prompt", ""),
+    return (inputs["first_name"], inputs["last_name"], date_of_birth, inputs["age"],
+            zodiac_sign, life_path_number) + tuple(inputs.get(field) for field in PERSONALIZATION_FIELDS)
+
+def lookup_cached_reading(inputs):
+    """Return (cache_key, cached_entry, cache_status) for validated inputs"""
+    cache_key = make_cache_key(inputs, PROMPT_TEMPLATE_VERSION)
+    if not READING_CACHE_ENABLED:
+        return cache_key, None, "disabled"
+    if inputs.get("fresh"):
+        reading_cache.record_bypass()
+        return cache_key, None, "bypass"
+    cached, cache_tier = reading_cache.get(cache_key)
+    return cache_key, cached, cache_tier or "miss"
+
+def store_cached_reading(cache_key, cached, reading_data, text_provider, image_path, image_provider,
+                         reading_id=None, user_id=None):
+    if image_provider == "placeholder":
+        # A degraded-mode sigil; try the image providers again next time
+        image_path = None
+    if READING_CACHE_ENABLED and (not cached or image_path != cached.get("image_path")):
+        reading_cache.set(cache_key, {
+            "reading": reading_data,
+            "text_provider": text_provider,
+            "image_path": image_path,
+            "image_provider": image_provider,
+            "reading_id": reading_id,
+            "user_id": user_id
+        })
+
+def cached_reading_id(inputs, cached, image_path):
+    """The saved reading a cache hit repeats, when it has the same image and belongs to the same user"""
+    if not cached or not cached.get("reading_id") or image_path != cached.get("image_path"):
+        return None
+    if cached.get("user_id") != inputs.get("user_id"):
+        # Another user's history gets its own row
+        return None
+    return cached["reading_id"]
+
+def build_tattoo_response(inputs, reading_data, image_path, text_provider, image_provider, cache_status):
+    response_data = {field: reading_data.get(field, "") for field in READING_FIELDS}
+    response_data.update({
         "image_url": image_path if image_path else None,
+        "image_variants": image_variants.variant_urls(image_path),
         "ai_provider": f"text:{text_provider},image:{image_provider}",  # For debugging/monitoring
-        "personalization_used": {
-            "birthplace": bool(birthplace),
-            "favorite_element": bool(favorite_element),
-            "preferred_aesthetic": bool(preferred_aesthetic),
-            "spirit_animal": bool(spirit_animal),
-            "life_theme": bool(life_theme),
-            "personal_story": bool(personal_story),
-            "cultural_affiliation": bool(cultural_affiliation)
-        }
+        "cache_status": cache_status,
+        "personalization_used": {field: bool(inputs.get(field)) for field in PERSONALIZATION_FIELDS}
+    })
+    return response_data
+
+def save_reading(inputs, cache_key, reading_data, text_provider, image_path, image_provider):
+    """Persist a served reading so it can be fetched again later; returns its id or None"""
+    try:
+        user_id = inputs.get("user_id")
+        if user_id is not None and db.session.get(User, user_id) is None:
+            # Still worth saving, but there is no history to file it under
+            print(f"Saving reading without a user: user {user_id} does not exist")
+            user_id = None
+        reading = Reading(
+            user_id=user_id,
+            input_hash=cache_key,
+            image_path=image_path,
+            text_provider=text_provider,
+            image_provider=image_provider,
+            **{field: str(reading_data.get(field, "")) for field in READING_FIELDS}
+        )
+        db.session.add(reading)
+        db.session.commit()
+        return reading.id
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Failed to save reading: {e}")
+        return None
+
+def reuse_cached_image(cached):
+    """The cached entry's image if it is still on disk, refreshed for the LRU; None if evicted"""
+    image_path = cached.get("image_path")
+    if image_store.exists(image_path):
+        image_store.touch(image_path)
+        return image_path
+    # Evicted by the image store quota; render it again
+    return None
+
+def reading_failed(deadline, message="Failed to generate tattoo reading - all AI services unavailable"):
+    """TattooGenerationError for a reading that could not be completed; a 504 when the deadline cut it short"""
+    if deadline is not None and deadline.was_cut("text"):
+        return TattooGenerationError("Request deadline exceeded before the reading was complete", 504)
+    return TattooGenerationError(message)
+
+def parse_reading(ai_response, text_provider, inputs, deadline=None):
+    """Repair and validate a complete reply, re-asking for missing fields. Raises TattooGenerationError."""
+    if not ai_response:
+        raise reading_failed(deadline)
+
+    try:
+        with metrics.timed("json_parse"):
+            reading_data = repair_json_object(ai_response)
+    except ValueError:
+        raise TattooGenerationError("Invalid response format from AI")
+
+    prompt = build_enhanced_prompt(*reading_arguments(inputs))
+    reading_data, missing = complete_missing_fields(prompt, reading_data, text_provider.split("[")[0], deadline)
+    if missing:
+        raise reading_failed(deadline, "Invalid response format from AI")
+    return reading_data
+
+def finish_tattoo_result(inputs, cache_key, cached, cache_status, reading_data, text_provider,
+                         image_path, image_provider, timings, deadline):
+    """Cache and save a finished generation and build its response payload"""
+    text_seconds, image_started, image_seconds, total_seconds = timings
+    metrics.observe_stage("text", text_seconds)
+    metrics.observe_stage("image", image_seconds)
+    metrics.observe_stage("total", total_seconds)
+
+    result = build_tattoo_response(inputs, reading_data, image_path, text_provider, image_provider, cache_status)
+    reading_id = cached_reading_id(inputs, cached, image_path)
+    if reading_id is None:
+        reading_id = save_reading(inputs, cache_key, reading_data, text_provider, image_path, image_provider)
+        store_cached_reading(cache_key, cached, reading_data, text_provider, image_path, image_provider,
+                             reading_id, inputs.get("user_id"))
+    result["reading_id"] = reading_id
+    result["timings"] = {
+        "text_seconds": round(text_seconds, 3),
+        "image_started_at": round(image_started, 3) if image_started is not None else None,
+        "image_seconds": round(image_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        # How much running the stages sequentially would have added
+        "overlap_saved_seconds": round(max(0.0, text_seconds + image_seconds - total_seconds), 3)
     }
+    result["deadline"] = deadline.to_dict()
+    return result
+
+def describe_hedged_provider(stream):
+    if stream.hedged_after is None:
+        return stream.winner
+    return f"{stream.winner}[hedge={stream.hedged_after:.2f}s]"
+
+class ReadingStream:
+    """Stream a reading from the text providers, yielding (name, value) fields as they complete.
+
+    The two healthiest providers are hedged on their first chunk; any others are tried in
+    order if those fail before producing a field. A reply that is cut off or malformed is
+    repaired, and fields it still lacks are asked for again. After iteration, fields holds the
+    parsed reading and provider names the provider that wrote it. Raises TattooGenerationError.
+    """
+
+    def __init__(self, prompt, deadline=None):
+        self.prompt = prompt
+        self.deadline = deadline
+        self.fields = {}
+        self.provider = "none"
+
+    def _open(self, provider):
+        return provider.name, lambda: guarded_stream(provider, lambda: provider.stream(self.prompt), self.deadline)
+
+    def __iter__(self):
+        # Healthiest provider first; providers with an open circuit breaker are skipped
+        providers = rank_providers(configured(TEXT_PROVIDERS))
+        first_choice = providers[0].name if providers else None
+        attempts = []
+        if TEXT_HEDGING_ENABLED and len(providers) > 1:
+            primary, secondary = providers[:2]
+            attempts.append(HedgedStream(self._open(primary), self._open(secondary),
+                                         get_text_hedge_delay(primary, streaming=True)))
+            providers = providers[2:]
+        attempts.extend(HedgedStream(self._open(provider)) for provider in providers)
+
+        for index, stream in enumerate(attempts):
+            parser = IncrementalObjectParser()
+            chunks = []
+            yielded = set()
+            try:
+                for chunk in stream:
+                    chunks.append(chunk)
+                    for name, value in parser.feed(chunk):
+                        # Empty or non-text values are left for complete_missing_fields to ask for again
+                        clean, _ = validate_fields({name: value}, READING_FIELDS)
+                        if name in clean and name not in yielded:
+                            yielded.add(name)
+                            yield name, clean[name]
+            except (ProviderError, json.JSONDecodeError) as e:
+                print(f"Streaming reading from {stream.winner or stream.primary[0]} failed: {e}")
+
+            text = "".join(chunks)
+            fields = dict(parser.fields)
+            if not parser.done:
+                # Cut off or malformed: salvage whatever the repair parser can recover
+                try:
+                    with metrics.timed("json_parse"):
+                        fields = dict(repair_json_object(text), **fields)
+                except ValueError:
+                    pass
+            if not fields:
+                continue
+
+            log_token_usage(stream.winner, self.prompt, text)
+            reading, missing = complete_missing_fields(self.prompt, fields, stream.winner, self.deadline)
+            for name in READING_FIELDS:
+                if name in reading and name not in yielded:
+                    yield name, reading[name]
+            if missing:
+                raise reading_failed(self.deadline, "Invalid response format from AI")
+
+            self.fields = reading
+            self.provider = describe_hedged_provider(stream)
+            if stream.winner != first_choice:
+                metrics.record_fallback("text", "sequential" if index else "hedge")
+            return
+
+        raise reading_failed(self.deadline)
+
+def timed_image_stage(image_prompt, first_name, last_name, reuse, traits=None, deadline=None):
+    started = time.monotonic()
+    image_path, image_provider = generate_tattoo_image_with_complete_fallback(image_prompt, first_name, last_name,
+                                                                              reuse, traits, deadline)
+    return image_path, image_provider, time.monotonic() - started
+
+class TattooPipeline:
+    """Reading + image pipeline for validated inputs.
+
+    Iterating yields (name, value) reading fields as they become available; with
+    PIPELINE_OVERLAP_ENABLED the image stage starts as soon as image_prompt is complete
+    and runs while the rest of the narrative streams in. With previews, ("preview", {...})
+    is yielded first with a locally rendered sigil, and again when a stored image is close
+    to the new prompt. Every provider call gets what is left of the request deadline.
+    Afterwards result holds the response payload, including per-stage timings and the
+    stages the deadline cut short. Raises TattooGenerationError.
+    """
+
+    def __init__(self, inputs, previews=False):
+        self.inputs = inputs
+        self.previews = previews
+        self.traits = sigil_traits(inputs)
+        self.deadline = None
+        self.result = None
+
+    def _generate_reading(self):
+        """Non-streaming path: hedged completion, parsed once it has fully arrived"""
+        ai_response, text_provider = generate_tattoo_reading_with_fallback(*reading_arguments(self.inputs),
+                                                                           deadline=self.deadline)
+        return parse_reading(ai_response, text_provider, self.inputs, self.deadline), text_provider
+
+    def _sigil_preview(self):
+        """The person's sigil as SVG: on screen before the first provider has answered"""
+        if not self.previews:
+            return
+        try:
+            image_url = sigil.store_sigil(**self.traits, fmt="svg")
+        except OSError as e:
+            print(f"Failed to render preview sigil: {e}")
+            return
+        yield "preview", {"image_url": image_url, "source": "sigil"}
+
+    def _preview(self, image_prompt):
+        """A stored look-alike to show while the image renders; skipped when it would be reused anyway"""
+        if not self.previews:
+            return
+        match = image_index.find_preview(image_prompt)
+        if match and (self.inputs.get("fresh") or match.similarity < image_index.IMAGE_REUSE_THRESHOLD):
+            yield "preview", {"image_url": match.url, "similarity": round(match.similarity, 3), "source": "similar"}
+
+    def __iter__(self):
+        with metrics.PIPELINES_IN_FLIGHT.track_inprogress():
+            yield from self._run()
+
+    def _run(self):
+        inputs = self.inputs
+        started = time.monotonic()
+        self.deadline = deadlines.for_request(inputs.get("deadline_seconds"))
+        cache_key, cached, cache_status = lookup_cached_reading(inputs)
+        image_future = None
+        image_started = None
+
+        def start_image(image_prompt):
+            return _image_executor.submit(timed_image_stage, image_prompt, inputs["first_name"], inputs["last_name"],
+                                          not inputs.get("fresh"), self.traits, self.deadline)
+
+        if cached:
+            reading_data = cached["reading"]
+            text_provider = cached["text_provider"]
+            image_path = reuse_cached_image(cached)
+            image_provider = cached.get("image_provider")
+            for field in READING_FIELDS:
+                yield field, reading_data.get(field, "")
+        elif PIPELINE_OVERLAP_ENABLED:
+            yield from self._sigil_preview()
+            reading = ReadingStream(build_enhanced_prompt(*reading_arguments(inputs)), self.deadline)
+            for name, value in reading:
+                if name == "image_prompt" and image_future is None:
+                    image_started = time.monotonic() - started
+                    image_future = start_image(value)
+                yield name, value
+                if name == "image_prompt":
+                    yield from self._preview(value)
+            reading_data, text_provider = reading.fields, reading.provider
+            image_path = None
+        else:
+            yield from self._sigil_preview()
+            reading_data, text_provider = self._generate_reading()
+            for field in READING_FIELDS:
+                yield field, reading_data.get(field, "")
+            image_path = None
+        text_seconds = time.monotonic() - started
+
+        image_seconds = 0.0
+        if not image_path:
+            if image_future is None:
+                image_started = time.monotonic() - started
+                image_future = start_image(reading_data.get("image_prompt", ""))
+                yield from self._preview(reading_data.get("image_prompt", ""))
+            # Generate image based on the AI's description with complete fallback
+            image_path, image_provider, image_seconds = image_future.result()
+        total_seconds = time.monotonic() - started
+
+        self.result = finish_tattoo_result(inputs, cache_key, cached, cache_status, reading_data, text_provider,
+                                           image_path, image_provider,
+                                           (text_seconds, image_started, image_seconds, total_seconds), self.deadline)
+
+def generate_tattoo_payload(inputs):
+    """Run the full reading + image pipeline for validated inputs and return the response payload"""
+    pipeline = TattooPipeline(inputs)
+    for _ in pipeline:
+        pass
+    return pipeline.result
+
+async def run_in_app_context(app, fn, *args):
+    """Run blocking database work for the async pipeline on a thread with its own app context"""
+    def call():
+        with app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(call)
+
+async def agenerate_tattoo_payload(app, inputs):
+    """Async twin of generate_tattoo_payload for the ASGI server.
+
+    Provider calls, including the image download, are awaited on the event loop, so a
+    waiting generation holds no thread. Cache and database work runs in short-lived threads.
+    """
+    with metrics.PIPELINES_IN_FLIGHT.track_inprogress():
+        started = time.monotonic()
+        deadline = deadlines.for_request(inputs.get("deadline_seconds"))
+        cache_key, cached, cache_status = await run_in_app_context(app, lookup_cached_reading, inputs)
+
+        if cached:
+            reading_data = cached["reading"]
+            text_provider = cached["text_provider"]
+            image_path = reuse_cached_image(cached)
+            image_provider = cached.get("image_provider")
+        else:
+            ai_response, text_provider = await agenerate_tattoo_reading_with_fallback(*reading_arguments(inputs),
+                                                                                      deadline=deadline)
+            # Only a damaged reply needs the (sync) re-ask path
+            reading_data = await asyncio.to_thread(parse_reading, ai_response, text_provider, inputs, deadline)
+            image_path = None
+        text_seconds = time.monotonic() - started
+
+        image_started = None
+        image_seconds = 0.0
+        if not image_path:
+            image_started = time.monotonic() - started
+            image_path, image_provider = await agenerate_tattoo_image_with_complete_fallback(
+                reading_data.get("image_prompt", ""), inputs["first_name"], inputs["last_name"], not inputs.get("fresh"),
+                sigil_traits(inputs), deadline)
+            image_seconds = time.monotonic() - started - image_started
+        total_seconds = time.monotonic() - started
+
+        return await run_in_app_context(app, finish_tattoo_result, inputs, cache_key, cached, cache_status,
+                                        reading_data, text_provider, image_path, image_provider,
+                                        (text_seconds, image_started, image_seconds, total_seconds), deadline)
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_tattoo_events(inputs):
+    """Yield SSE events: one "field" event per reading field as soon as it is complete, then "image".
+
+    "preview" events may come before "image": the person's sigil first, then a similar stored
+    image when there is one. A failure after some fields were sent is reported as an "error" event.
+    """
+    pipeline = TattooPipeline(inputs, previews=True)
+    try:
+        for name, value in pipeline:
+            if name == "preview":
+                yield format_sse("preview", value)
+            else:
+                yield format_sse("field", {"name": name, "value": value})
+    except TattooGenerationError as e:
+        yield format_sse("error", {"error": e.message})
+        return
+
+    yield format_sse("image", {
+        key: pipeline.result[key]
+        for key in ("image_url", "image_variants", "ai_provider", "cache_status",
+                    "personalization_used", "timings", "deadline", "reading_id")
+    })
+
+def request_client_address():
+    return admission.client_address(request.remote_addr, request.headers.get("X-Forwarded-For"))
+
+def request_client_keys(inputs):
+    """Admission control keys for the current request, see admission.client_keys"""
+    return admission.client_keys(request_client_address(), inputs.get("user_id"))
+
+def admission_rejected_response(e):
+    response = jsonify({"error": e.message})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+def release_when_done(ticket, chunks):
+    """Hold an admission ticket until a streamed response is finished or abandoned"""
+    try:
+        yield from chunks
+    finally:
+        admission.release(ticket)
+
+def request_idempotency_key(inputs):
+    """Record key for the request's Idempotency-Key header (None without one), or an error message"""
+    value = request.headers.get("Idempotency-Key")
+    error = idempotency.validate_key(value)
+    if value is None or error:
+        return None, error
+    client = admission.client_identity(request_client_address(), inputs.get("user_id"))
+    return idempotency.record_key("generate_tattoo", client, value), None
+
+def idempotency_conflict_response(e):
+    response = jsonify({"error": e.message})
+    if e.retry_after:
+        response.headers["Retry-After"] = str(e.retry_after)
+    return response, e.status_code
+
+def replay_response(replay):
+    response = jsonify(replay.body)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response, replay.status_code
+
+@tattoo_bp.route("/generate_tattoo", methods=["POST"])
+def generate_tattoo():
+    data = request.get_json()
+    inputs, error = validate_tattoo_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+    key, error = request_idempotency_key(inputs)
+    if error:
+        return jsonify({"error": error}), 400
+
+    # Before admission: a retry that only waits for or replays a generation costs nothing
+    try:
+        claim = idempotency.begin(key, idempotency.fingerprint(data))
+    except IdempotencyConflict as e:
+        return idempotency_conflict_response(e)
+    if isinstance(claim, Replay):
+        return replay_response(claim)
+
+    with idempotency.holding(claim):
+        try:
+            with admission.admitted(request_client_keys(inputs)):
+                response_data = generate_tattoo_payload(inputs)
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        except TattooGenerationError as e:
+            return jsonify({"error": e.message}), e.status_code
+        idempotency.complete(claim, 200, response_data)
 
     return jsonify(response_data)
 
+@tattoo_bp.route("/generate_tattoo/stream", methods=["POST"])
+def generate_tattoo_stream():
+    """Server-Sent Events variant of /generate_tattoo that pushes each reading field as it completes"""
+    inputs, error = validate_tattoo_request(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        ticket = admission.admit(request_client_keys(inputs))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    return Response(
+        stream_with_context(release_when_done(ticket, stream_tattoo_events(inputs))),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def generate_batch_item(app, index, inputs):
+    """Run one batch entry in a worker thread and return its NDJSON record"""
+    with app.app_context():
+        try:
+            return {"index": index, "status": "ok", "result": generate_tattoo_payload(inputs)}
+        except TattooGenerationError as e:
+            return {"index": index, "status": "error", "error": e.message}
+        except Exception as e:
+            print(f"Batch item {index} failed: {e}")
+            return {"index": index, "status": "error", "error": "Internal error"}
+        finally:
+            db.session.remove()
+
+def stream_batch_results(app, people, concurrency, ticket):
+    """Yield one NDJSON line per person in completion order, then a summary line.
+
+    A batch can run far longer than one generation, so its admission leases are renewed
+    while it streams instead of expiring under it.
+    """
+    succeeded = 0
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    try:
+        pending = {executor.submit(generate_batch_item, app, index, inputs) for index, inputs in enumerate(people)}
+        while pending:
+            done, pending = wait(pending, timeout=BATCH_LEASE_RENEW_SECONDS, return_when=FIRST_COMPLETED)
+            admission.renew(ticket)
+            for future in done:
+                record = future.result()
+                succeeded += record["status"] == "ok"
+                yield json.dumps(record) + "\n"
+    finally:
+        # If the client went away, people that haven't started yet are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    yield json.dumps({"summary": {"total": len(people), "succeeded": succeeded,
+                                  "failed": len(people) - succeeded}}) + "\n"
+
+@tattoo_bp.route("/generate_tattoo/batch", methods=["POST"])
+def generate_tattoo_batch():
+    """Generate readings for a group, streaming NDJSON results as each person completes"""
+    data = request.get_json(silent=True) or {}
+    people = data.get("people")
+    if not isinstance(people, list) or not people:
+        return jsonify({"error": "people must be a non-empty list"}), 400
+    if len(people) > BATCH_MAX_SIZE:
+        return jsonify({"error": f"A batch can contain at most {BATCH_MAX_SIZE} people"}), 400
+
+    # Validate everyone before spending anything on providers
+    validated, errors = [], []
+    for index, person in enumerate(people):
+        inputs, error = validate_tattoo_request(person if isinstance(person, dict) else None)
+        if error:
+            errors.append({"index": index, "error": error})
+        validated.append(inputs)
+    if errors:
+        return jsonify({"error": "Invalid people in batch", "errors": errors}), 400
+
+    concurrency = data.get("concurrency", BATCH_MAX_CONCURRENCY)
+    if not isinstance(concurrency, int) or concurrency <= 0:
+        return jsonify({"error": "concurrency must be a positive integer"}), 400
+    concurrency = min(concurrency, BATCH_MAX_CONCURRENCY, len(validated))
+
+    # One token per person, and a lease for each generation it runs at once
+    try:
+        ticket = admission.admit(request_client_keys({}), slots=concurrency, cost=len(validated))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    app = current_app._get_current_object()
+    return Response(
+        stream_with_context(release_when_done(ticket, stream_batch_results(app, validated, concurrency, ticket))),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+@tattoo_bp.route("/generate_tattoo/jobs", methods=["POST"])
+def create_tattoo_job():
+    """Queue a generation on the background worker pool and return its job id immediately"""
+    inputs, error = validate_tattoo_request(request.get_json())
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        # The job queue bounds how many run at once; only the client's rate applies here
+        admission.admit(request_client_keys(inputs), slots=0)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    try:
+        job = enqueue_job("generate_tattoo", inputs, generate_tattoo_payload)
+    except JobQueueFull:
+        response = jsonify({"error": "Generation queue is full, try again shortly"})
+        response.headers["Retry-After"] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 503
+
+    response = jsonify(job.to_dict())
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return response, 202
+
+@tattoo_bp.route("/generate_tattoo/cache/stats", methods=["GET"])
+def get_reading_cache_stats():
+    """Hit/miss counters for the reading cache in this worker process"""
+    return jsonify(reading_cache.get_stats())
+
+@tattoo_bp.route("/generate_tattoo/image_index/stats", methods=["GET"])
+def get_image_index_stats():
+    """Near-duplicate image reuse counters for this worker process"""
+    return jsonify(image_index.get_index().get_stats())
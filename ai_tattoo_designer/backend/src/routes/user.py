@@ -1,12 +1,116 @@
-from flask import Blueprint, jsonify, request
+import json
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from src.models.user import User, db
+from src.models.reading import Reading
 
 user_bp = Blueprint('user', __name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+BULK_MAX_SIZE = 10000
+# Stay under SQLite's bound-parameter limit when looking up existing rows
+LOOKUP_CHUNK_SIZE = 500
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    """One page of users ordered by id; the next page's cursor comes back in the Link header"""
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = request.args.get('cursor', 0, type=int)
+
+    users = User.query.filter(User.id > after).order_by(User.id).limit(limit + 1).all()
+    has_more = len(users) > limit
+    users = users[:limit]
+
+    response = jsonify([user.to_dict() for user in users])
+    if has_more:
+        next_cursor = users[-1].id
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url_for("user.get_users", limit=limit, cursor=next_cursor)}>; rel="next"'
+    return response
+
+@user_bp.route('/users/export', methods=['GET'])
+def export_users():
+    """Every user as NDJSON, fetched in batches from a server-side cursor"""
+    def generate():
+        rows = db.session.execute(
+            select(User.id, User.username, User.email).order_by(User.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for row in rows:
+            yield json.dumps(row._asdict()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def find_taken(column, values):
+    taken = set()
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        taken.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+    return taken
+
+def insert_one_by_one(rows):
+    """Slow path after a concurrent writer won a race: each row in its own savepoint"""
+    errors = []
+    for index, row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(User), [row])
+        except IntegrityError:
+            errors.append({'index': index, 'error': 'Username or email already exists'})
+    return errors
+
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    """Insert many users in one transaction, reporting conflicts per row instead of failing the batch"""
+    data = request.get_json(silent=True) or {}
+    entries = data.get('users')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'users must be a non-empty list'}), 400
+    if len(entries) > BULK_MAX_SIZE:
+        return jsonify({'error': f'At most {BULK_MAX_SIZE} users per request'}), 400
+
+    errors = []
+    candidates = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not all(
+                isinstance(entry.get(field), str) and entry[field].strip() for field in ('username', 'email')):
+            errors.append({'index': index, 'error': 'username and email must be non-empty strings'})
+            continue
+        candidates.append((index, {'username': entry['username'].strip(), 'email': entry['email'].strip()}))
+
+    taken_usernames = find_taken(User.username, {row['username'] for _, row in candidates})
+    taken_emails = find_taken(User.email, {row['email'] for _, row in candidates})
+
+    rows = []
+    for index, row in candidates:
+        if row['username'] in taken_usernames:
+            errors.append({'index': index, 'error': f"Username {row['username']!r} already exists"})
+        elif row['email'] in taken_emails:
+            errors.append({'index': index, 'error': f"Email {row['email']!r} already exists"})
+        else:
+            # Also catches duplicates within the batch itself
+            taken_usernames.add(row['username'])
+            taken_emails.add(row['email'])
+            rows.append((index, row))
+
+    created = len(rows)
+    if rows:
+        try:
+            db.session.execute(insert(User), [row for _, row in rows])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            race_errors = insert_one_by_one(rows)
+            db.session.commit()
+            errors.extend(race_errors)
+            created -= len(race_errors)
+
+    errors.sort(key=lambda error: error['index'])
+    return jsonify({'created': created, 'errors': errors}), 201 if created else 409
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -33,7 +137,9 @@ def update_user(user_id):
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
+    # Also done by ON DELETE SET NULL, but not in databases created before the constraint had it
+    db.session.execute(update(Reading).where(Reading.user_id == user_id).values(user_id=None))
     db.session.delete(user)
     db.session.commit()
     return '', 204
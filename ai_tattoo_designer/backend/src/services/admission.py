@@ -0,0 +1,239 @@
+"""Admission control for the generation endpoints.
+
+A generation needs two things before it starts:
+
+- a lease under the global in-flight cap, and
+- a token from the bucket of each client key: the user_id if the request has one, plus
+  the IP address when ADMISSION_PER_IP is on.
+
+Both are stored in the database, so every gunicorn worker sees the same counts. If either
+check fails, the request gets a 429 with a Retry-After right away instead of waiting in
+the backlog until the client times out.
+"""
+import os
+import math
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from src.models.user import db
+from src.models.admission import AdmissionLease, ClientBucket
+from src.services import metrics
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+# Generations in flight across all workers
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '32'))
+# Generations per second each client may sustain, and how many it may send in a burst
+ADMISSION_CLIENT_RATE = float(os.getenv('ADMISSION_CLIENT_RATE', '0.2'))
+ADMISSION_CLIENT_BURST = float(os.getenv('ADMISSION_CLIENT_BURST', '10'))
+# Only a worker that dies holding a lease ever reaches this: long holders call renew()
+ADMISSION_LEASE_SECONDS = float(os.getenv('ADMISSION_LEASE_SECONDS', '300'))
+# Generation time assumed for Retry-After until this worker has timed some of its own
+ADMISSION_DEFAULT_SERVICE_SECONDS = float(os.getenv('ADMISSION_DEFAULT_SERVICE_SECONDS', '10'))
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv('ADMISSION_MAX_RETRY_AFTER', '120'))
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 on Render). The
+# client address is the entry the outermost of them added; entries before it are the client's own.
+ADMISSION_PROXY_HOPS = int(os.getenv('ADMISSION_PROXY_HOPS', '0'))
+# Without the proxy hops every request behind a proxy comes from the proxy's address, and a
+# bucket per IP would throttle all clients together; so it is only on by default with them
+ADMISSION_PER_IP = os.getenv('ADMISSION_PER_IP', 'true' if ADMISSION_PROXY_HOPS else 'false').lower() == 'true'
+
+PURGE_INTERVAL_SECONDS = 60
+
+class AdmissionRejected(Exception):
+    """Raised when a generation may not start now; retry_after is in whole seconds"""
+
+    def __init__(self, message, retry_after, reason):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+        self.reason = reason
+
+class ServiceTime:
+    """Moving average of how long admitted generations take in this worker"""
+
+    def __init__(self, initial, weight=0.2):
+        self.value = initial
+        self.weight = weight
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.value += self.weight * (seconds - self.value)
+
+service_time = ServiceTime(ADMISSION_DEFAULT_SERVICE_SECONDS)
+_last_purge = 0.0
+
+class Ticket:
+    """Leases held by one admitted request, returned by admit() and given back to release()"""
+
+    def __init__(self, lease_ids, started_at):
+        self.lease_ids = lease_ids
+        self.started_at = started_at
+
+def client_address(remote_addr, forwarded_for=None):
+    """The client's address, read from X-Forwarded-For as werkzeug's ProxyFix does with ADMISSION_PROXY_HOPS"""
+    if ADMISSION_PROXY_HOPS and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(",")]
+        if len(addresses) >= ADMISSION_PROXY_HOPS:
+            return addresses[-ADMISSION_PROXY_HOPS]
+    return remote_addr or "unknown"
+
+def client_identity(address, user_id=None):
+    """Who sent the request: the user_id, or the address without one"""
+    return f"user:{user_id}" if user_id is not None else f"ip:{address}"
+
+def client_keys(address, user_id=None):
+    """Buckets a request spends tokens from; may be empty, leaving only the in-flight cap"""
+    keys = [f"ip:{address}"] if ADMISSION_PER_IP else []
+    if user_id is not None:
+        keys.append(f"user:{user_id}")
+    return keys
+
+def clamp_retry_after(seconds):
+    return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(seconds)))
+
+def in_flight_retry_after(in_flight, slots):
+    """Seconds until enough leases are free, with leases finishing at about cap / service time per second"""
+    excess = in_flight + slots - ADMISSION_MAX_IN_FLIGHT
+    return clamp_retry_after(service_time.value * excess / ADMISSION_MAX_IN_FLIGHT)
+
+def count_leases(now):
+    return select(func.count()).select_from(AdmissionLease).where(AdmissionLease.expires_at > now)
+
+def insert_lease(lease_id, now):
+    """Add a lease if the cap allows, in one statement.
+
+    On SQLite that is enough for two workers not to both take the last slot: writers are
+    serialized. Under READ COMMITTED on Postgres or MySQL, concurrent inserts can each miss
+    the other's lease and overshoot the cap by a few; it is a soft limit there.
+    """
+    result = db.session.execute(insert(AdmissionLease).from_select(
+        ["id", "started_at", "expires_at"],
+        select(literal(lease_id), literal(now), literal(now + ADMISSION_LEASE_SECONDS))
+        .where(count_leases(now).scalar_subquery() < ADMISSION_MAX_IN_FLIGHT)
+    ))
+    return result.rowcount == 1
+
+def spend_tokens(key, now, cost):
+    """Take cost tokens from key's bucket; returns 0, or the seconds until it could afford them.
+
+    A cost above the burst (a large batch) is let through once the bucket is full and
+    leaves it in debt, so the client waits for the whole cost to refill before its next request.
+    """
+    needed = min(cost, ADMISSION_CLIENT_BURST)
+    refilled = ClientBucket.tokens + (now - ClientBucket.updated_at) * ADMISSION_CLIENT_RATE
+    available = case((refilled > ADMISSION_CLIENT_BURST, ADMISSION_CLIENT_BURST), else_=refilled)
+    result = db.session.execute(
+        update(ClientBucket)
+        .where(ClientBucket.key == key, available >= needed)
+        .values(tokens=available - cost, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        return 0.0
+
+    bucket = db.session.get(ClientBucket, key, populate_existing=True)
+    if bucket is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ClientBucket(key=key, tokens=ADMISSION_CLIENT_BURST - cost, updated_at=now))
+            return 0.0
+        except IntegrityError:
+            # Another worker created it first
+            return spend_tokens(key, now, cost)
+
+    tokens = min(ADMISSION_CLIENT_BURST, bucket.tokens + (now - bucket.updated_at) * ADMISSION_CLIENT_RATE)
+    return (needed - tokens) / ADMISSION_CLIENT_RATE
+
+def admit(keys, slots=1, cost=1):
+    """Take slots leases and cost tokens from every key's bucket, or raise AdmissionRejected.
+
+    Everything happens in one transaction, so a rejected request spends nothing. If the
+    database itself fails, the request is let through rather than turned away.
+    """
+    now = time.time()
+    if not ADMISSION_ENABLED:
+        return Ticket([], now)
+    slots = min(slots, ADMISSION_MAX_IN_FLIGHT)
+
+    try:
+        lease_ids = []
+        for _ in range(slots):
+            lease_id = uuid.uuid4().hex
+            if not insert_lease(lease_id, now):
+                in_flight = db.session.execute(count_leases(now)).scalar() - len(lease_ids)
+                db.session.rollback()
+                metrics.record_rejection("in_flight")
+                raise AdmissionRejected("Too many generations in progress, try again shortly",
+                                        in_flight_retry_after(in_flight, slots), "in_flight")
+            lease_ids.append(lease_id)
+
+        if ADMISSION_CLIENT_RATE > 0:
+            for key in keys:
+                wait = spend_tokens(key, now, cost)
+                if wait > 0:
+                    db.session.rollback()
+                    metrics.record_rejection("client_rate")
+                    raise AdmissionRejected("Rate limit exceeded, slow down", clamp_retry_after(wait), "client_rate")
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Admission check failed, letting the request through: {e}")
+        return Ticket([], now)
+
+    return Ticket(lease_ids, now)
+
+def purge_expired(now):
+    """Drop the leases of dead workers and buckets that have refilled completely"""
+    global _last_purge
+    if now - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+    db.session.execute(delete(AdmissionLease).where(AdmissionLease.expires_at <= now))
+    if ADMISSION_CLIENT_RATE > 0:
+        # A full bucket and no bucket mean the same thing; one in debt has to be kept
+        refilled = ClientBucket.tokens + (now - ClientBucket.updated_at) * ADMISSION_CLIENT_RATE
+        db.session.execute(delete(ClientBucket).where(refilled >= ADMISSION_CLIENT_BURST))
+
+def release(ticket):
+    if not ticket.lease_ids:
+        return
+    now = time.time()
+    if len(ticket.lease_ids) == 1:
+        # Batches hold several leases for much longer than one generation
+        service_time.observe(now - ticket.started_at)
+
+    try:
+        db.session.execute(delete(AdmissionLease).where(AdmissionLease.id.in_(ticket.lease_ids)))
+        purge_expired(now)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Could not release admission leases, they expire in {ADMISSION_LEASE_SECONDS:.0f}s: {e}")
+
+def renew(ticket):
+    """Extend a ticket's leases, for holders that may outlive ADMISSION_LEASE_SECONDS such as batches"""
+    if not ticket.lease_ids:
+        return
+    try:
+        db.session.execute(
+            update(AdmissionLease)
+            .where(AdmissionLease.id.in_(ticket.lease_ids))
+            .values(expires_at=time.time() + ADMISSION_LEASE_SECONDS)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Could not renew admission leases: {e}")
+
+@contextmanager
+def admitted(keys, slots=1, cost=1):
+    ticket = admit(keys, slots, cost)
+    try:
+        yield ticket
+    finally:
+        release(ticket)
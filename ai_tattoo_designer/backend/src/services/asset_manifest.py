@@ -0,0 +1,112 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip siblings are still built
+    brotli = None
+
+# Vite writes its bundles as assets/<name>-<hash>.<ext>, e.g. assets/index-SOw6PHEY.js: the hash
+# makes them safe to cache forever. Its base64url hashes always have a digit or capital in
+# practice, which tells them apart from hyphenated names such as assets/touch-icon-original.png.
+FINGERPRINT_PATTERN = re.compile(r'^assets/(?:[^/]+/)*[^/]+-(?=[A-Za-z0-9_-]*[A-Z0-9])[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+MIN_COMPRESS_SIZE = 1024
+# Served by their own routes (generated_images) or build artefacts of this module
+EXCLUDED_DIRS = ('generated_images',)
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+class Asset:
+
+    def __init__(self, relative_path, path, size, etag, mimetype, fingerprinted):
+        self.relative_path = relative_path
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.mimetype = mimetype
+        self.fingerprinted = fingerprinted
+        # encoding -> path of the precompressed sibling
+        self.encodings = {}
+
+    def to_dict(self):
+        return {
+            'path': self.relative_path,
+            'size': self.size,
+            'etag': self.etag,
+            'mimetype': self.mimetype,
+            'fingerprinted': self.fingerprinted,
+            'encodings': {encoding: os.path.getsize(path) for encoding, path in self.encodings.items()}
+        }
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_compressible(mimetype):
+    return mimetype is not None and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def write_sibling(path, suffix, compress):
+    """Write a compressed sibling of path unless an up-to-date one already exists"""
+    sibling = path + suffix
+    if not os.path.exists(sibling) or os.path.getmtime(sibling) < os.path.getmtime(path):
+        with open(path, 'rb') as f:
+            data = compress(f.read())
+        temp = f"{sibling}.{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, sibling)
+    return sibling
+
+class AssetManifest:
+    """Startup-time index of the static folder with ETags and precompressed gzip/brotli siblings"""
+
+    def __init__(self, static_folder, precompress=True):
+        self.static_folder = static_folder
+        self.precompress = precompress
+        self.assets = {}
+
+    def build(self):
+        assets = {}
+        for root, dirs, files in os.walk(self.static_folder):
+            if root == self.static_folder:
+                dirs[:] = [name for name in dirs if name not in EXCLUDED_DIRS]
+            for name in files:
+                if name.endswith(COMPRESSED_SUFFIXES) or name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                relative_path = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                assets[relative_path] = self._describe(relative_path, path)
+        self.assets = assets
+        return self
+
+    def _describe(self, relative_path, path):
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = Asset(
+            relative_path=relative_path,
+            path=path,
+            size=os.path.getsize(path),
+            etag=file_digest(path)[:32],
+            mimetype=mimetype,
+            fingerprinted=bool(FINGERPRINT_PATTERN.match(relative_path))
+        )
+        if self.precompress and asset.size >= MIN_COMPRESS_SIZE and is_compressible(mimetype):
+            try:
+                asset.encodings['gzip'] = write_sibling(path, '.gz', lambda data: gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    asset.encodings['br'] = write_sibling(path, '.br', lambda data: brotli.compress(data, quality=11))
+            except OSError as e:
+                # Read-only deploys still work, just without precompressed responses
+                print(f"Could not precompress {relative_path}: {e}")
+        return asset
+
+    def get(self, relative_path):
+        return self.assets.get(relative_path)
+
+    def to_dict(self):
+        return {path: asset.to_dict() for path, asset in sorted(self.assets.items())}
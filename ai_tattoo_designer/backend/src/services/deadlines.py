@@ -0,0 +1,110 @@
+"""Per-request deadlines.
+
+A generation gets one time budget, from the request's deadline_seconds or from
+REQUEST_DEADLINE_SECONDS. The pipeline hands its Deadline to every provider call through
+guarded_call and friends (src/providers/health.py), which make it current for the call:
+connect and read timeouts, retry backoff and image downloads are then cut to what is
+left of the budget. A call that is not expected to finish in time is skipped, and every
+stage that was skipped or cut off is reported in the response.
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from src.services import metrics
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '60'))
+# Upper bound for deadline_seconds sent by clients
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv('REQUEST_DEADLINE_MAX_SECONDS', '300'))
+# Least budget worth starting a provider call with when its latency is not known yet
+DEADLINE_MIN_CALL_SECONDS = float(os.getenv('DEADLINE_MIN_CALL_SECONDS', '1'))
+
+# requests and aiohttp reject a zero timeout
+MIN_TIMEOUT = 0.01
+
+class DeadlineExceeded(Exception):
+    """Raised inside a provider call once the request deadline has passed"""
+
+class Deadline:
+    """Time budget of one generation, and the stages that did not fit in it"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cut_short = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, stage, expected_seconds):
+        """Whether stage can still finish; if not it is recorded as skipped"""
+        if self.remaining() >= expected_seconds:
+            return True
+        self.cut(stage, "skipped")
+        return False
+
+    def cut(self, stage, reason):
+        """Record stage as "skipped" (never started) or "timed_out" (stopped by the deadline)"""
+        with self._lock:
+            self.cut_short.append({"stage": stage, "reason": reason})
+        metrics.record_deadline_cut(stage, reason)
+
+    def was_cut(self, kind):
+        """Whether any stage of kind ("text" or "image") was skipped or cut off"""
+        with self._lock:
+            return any(entry["stage"].split(":")[0] == kind for entry in self.cut_short)
+
+    def to_dict(self):
+        with self._lock:
+            cut_short = list(self.cut_short)
+        return {
+            "budget_seconds": round(self.seconds, 3),
+            "remaining_seconds": round(self.remaining(), 3),
+            "cut_short": cut_short,
+        }
+
+def for_request(seconds=None):
+    """A Deadline starting now: seconds from the client, capped, or the configured default"""
+    if seconds is None:
+        seconds = REQUEST_DEADLINE_SECONDS
+    return Deadline(min(seconds, REQUEST_DEADLINE_MAX_SECONDS))
+
+# The deadline of the provider call running in this thread or task, see activate()
+_current = contextvars.ContextVar('deadline', default=None)
+
+@contextmanager
+def activate(deadline):
+    """Make deadline current for the provider call in the block; None leaves timeouts alone"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+def remaining():
+    """Seconds left of the current deadline, or None outside a deadline"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+def clamp(seconds):
+    """A timeout of seconds, cut to what is left of the current deadline"""
+    left = remaining()
+    if left is None:
+        return seconds
+    return max(MIN_TIMEOUT, min(seconds, left))
+
+def can_wait(seconds):
+    """Whether sleeping for seconds (e.g. a retry backoff) still leaves time for another attempt"""
+    left = remaining()
+    return left is None or seconds < left
+
+def check():
+    """Raise DeadlineExceeded once the current deadline has passed"""
+    deadline = _current.get()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded("Request deadline exceeded")
@@ -0,0 +1,260 @@
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+class LatencyTracker:
+    """Rolling window of call latencies used to derive the hedge delay"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+def run_in_thread(fn, *args):
+    """Run fn(*args) on a thread of its own and return its Future.
+
+    A fixed pool would cap how many generations a process runs at once, below what the
+    request threads, batch and job workers are configured for; these calls spend their
+    time waiting on providers, so a thread each is cheap.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='hedge', daemon=True).start()
+    return future
+
+def hedged_call(primary, secondary, is_valid, hedge_delay):
+    """Run primary, and start secondary if primary has no valid answer after hedge_delay seconds.
+
+    primary and secondary are (name, callable) pairs; each callable is passed a
+    threading.Event that is set when the other call has won, and should stop working and
+    return as soon as it sees it. Returns (result, name, hedged_after) where hedged_after is
+    None when the secondary was never started. When neither call produces a valid result,
+    the first non-empty result (if any) is returned so the caller can report it.
+    """
+    started = time.monotonic()
+    cancelled = {}
+
+    def call(name, fn):
+        try:
+            return fn(cancelled[name])
+        except Exception as e:
+            print(f"Hedged provider call failed: {e}")
+            return None
+
+    def submit(candidate):
+        cancelled[candidate[0]] = threading.Event()
+        return run_in_thread(call, *candidate)
+
+    futures = {submit(primary): primary[0]}
+    hedged_after = None
+    fallback = (None, None)
+
+    done, _ = wait(futures, timeout=hedge_delay)
+    if done:
+        result = next(iter(done)).result()
+        if is_valid(result):
+            return result, primary[0], None
+        if result:
+            fallback = (result, primary[0])
+        futures = {}
+
+    # Primary is slow (or already failed): race the secondary against it
+    hedged_after = time.monotonic() - started
+    futures[submit(secondary)] = secondary[0]
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if is_valid(result):
+                # The loser is told to stop
+                for loser in pending:
+                    cancelled[futures[loser]].set()
+                return result, futures[future], hedged_after
+            if result and fallback[0] is None:
+                fallback = (result, futures[future])
+
+    return fallback[0], fallback[1], hedged_after
+
+async def ahedged_call(primary, secondary, is_valid, hedge_delay):
+    """hedged_call for coroutines: primary and secondary are (name, coroutine factory) pairs.
+
+    Same contract as hedged_call, except that the factories take no argument: the loser's
+    task is cancelled outright.
+    """
+    started = time.monotonic()
+
+    async def run(make_coro):
+        try:
+            return await make_coro()
+        except Exception as e:
+            print(f"Hedged provider call failed: {e}")
+            return None
+
+    tasks = {asyncio.ensure_future(run(primary[1])): primary[0]}
+    fallback = (None, None)
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if done:
+            result = next(iter(done)).result()
+            if is_valid(result):
+                return result, primary[0], None
+            if result:
+                fallback = (result, primary[0])
+            tasks = {}
+
+        # Primary is slow (or already failed): race the secondary against it
+        hedged_after = time.monotonic() - started
+        tasks[asyncio.ensure_future(run(secondary[1]))] = secondary[0]
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if is_valid(result):
+                    return result, tasks[task], hedged_after
+                if result and fallback[0] is None:
+                    fallback = (result, tasks[task])
+    finally:
+        # The loser, or both calls if our caller was cancelled
+        for task in tasks:
+            task.cancel()
+
+    return fallback[0], fallback[1], hedged_after
+
+class HedgedStream:
+    """Hedge two streaming calls on their first chunk.
+
+    Without a secondary, the primary stream is simply relayed in the caller's thread.
+    Otherwise each stream is read by a thread of its own: the primary starts immediately,
+    and if it has produced no chunk after hedge_delay seconds (or fails before its first
+    chunk), the secondary is started too. The first stream to produce a chunk wins: its chunks are
+    yielded and the other stream is closed, which aborts its underlying HTTP response.
+    After iteration, winner and hedged_after describe what happened. Errors from the
+    winner after its first chunk are re-raised; if neither stream produces a chunk, the
+    last error is raised.
+    """
+
+    def __init__(self, primary, secondary=None, hedge_delay=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_delay = hedge_delay
+        self.winner = None
+        self.hedged_after = None
+        self._events = queue.Queue()
+        self._cancelled = {}
+
+    def _pump(self, name, make_stream):
+        cancelled = self._cancelled[name]
+        try:
+            stream = make_stream()
+            try:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        break
+                    self._events.put((name, "chunk", chunk))
+            finally:
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+            self._events.put((name, "end", None))
+        except Exception as e:
+            self._events.put((name, "error", e))
+
+    def _start(self, candidate):
+        self._cancelled[candidate[0]] = threading.Event()
+        threading.Thread(target=self._pump, args=candidate, name='hedge', daemon=True).start()
+
+    def cancel(self):
+        for cancelled in self._cancelled.values():
+            cancelled.set()
+
+    def _relay(self):
+        name, make_stream = self.primary
+        stream = make_stream()
+        try:
+            for chunk in stream:
+                self.winner = name
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    def __iter__(self):
+        if self.secondary is None:
+            yield from self._relay()
+            return
+        started = time.monotonic()
+        self._start(self.primary)
+        running = {self.primary[0]}
+        last_error = None
+
+        try:
+            while True:
+                timeout = None
+                if self.secondary is not None and self.hedged_after is None and self.winner is None:
+                    timeout = max(0.0, self.hedge_delay - (time.monotonic() - started))
+                try:
+                    name, kind, payload = self._events.get(timeout=timeout)
+                except queue.Empty:
+                    name, kind, payload = None, "hedge", None
+
+                if self.winner is None:
+                    if kind == "chunk":
+                        self.winner = name
+                        for other in running - {name}:
+                            self._cancelled[other].set()
+                        yield payload
+                        continue
+                    if kind in ("end", "error"):
+                        running.discard(name)
+                        last_error = payload if kind == "error" else last_error
+                    if self.secondary is not None and self.hedged_after is None:
+                        # Primary is slow or has already failed: race the secondary
+                        self.hedged_after = time.monotonic() - started
+                        self._start(self.secondary)
+                        running.add(self.secondary[0])
+                    elif not running:
+                        if last_error is not None:
+                            raise last_error
+                        return
+                    continue
+
+                if name != self.winner:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "error":
+                    raise payload
+                else:
+                    return
+        finally:
+            self.cancel()
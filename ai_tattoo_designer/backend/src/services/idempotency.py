@@ -0,0 +1,271 @@
+"""Idempotency-Key support for POST /api/generate_tattoo.
+
+Browsers and proxies retry a generation whose response is slow, and every retry used to
+pay for another reading and image. A request with an Idempotency-Key header claims the key
+in the database first, so every gunicorn worker sees it:
+
+- the first request claims the key, runs the generation and stores its response;
+- a retry while that is still running waits for it and gets the same response;
+- a retry after it finished gets the stored response straight away.
+
+Only successful responses are stored. A failed or rejected request gives its key up, so
+a retry runs the generation again. A claim whose worker died is taken over after
+IDEMPOTENCY_LOCK_SECONDS, and keys are forgotten after IDEMPOTENCY_TTL_SECONDS.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from src.models.user import db
+from src.models.idempotency import IdempotencyRecord
+from src.services import deadlines, metrics
+
+IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'true').lower() == 'true'
+# How long a completed response is replayed
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+# Longer than any generation may run, so only a dead worker's claim is ever taken over
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS',
+                                           str(deadlines.REQUEST_DEADLINE_MAX_SECONDS + 30)))
+# How long a retry waits for the original request before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '90'))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+POLL_INTERVAL_SECONDS = 0.5
+PURGE_INTERVAL_SECONDS = 60
+CONFLICT_RETRY_AFTER = 5
+
+# Set when a claim held by this process finishes, so waiting retries wake up early
+_local_events = {}
+_last_purge = 0.0
+
+class IdempotencyConflict(Exception):
+    """Raised when a key can't be used for this request now: 409 (still running) or 422 (other body)"""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class Claim:
+    """A key held by this request; a Claim without a key (no header) does nothing"""
+
+    def __init__(self, key, owner=None):
+        self.key = key
+        self.owner = owner
+        self.finished = False
+
+class Replay:
+    """The stored response of the request that used the key first"""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+def validate_key(value):
+    """Error message for a bad Idempotency-Key header, or None (also when there is none)"""
+    if value is not None and not 0 < len(value) <= IDEMPOTENCY_MAX_KEY_LENGTH:
+        return f"Idempotency-Key must be 1 to {IDEMPOTENCY_MAX_KEY_LENGTH} characters"
+    return None
+
+def record_key(route, client, value):
+    """Keys are scoped to the route and client, so one client can't replay another's response"""
+    return hashlib.sha256(f"{route}\n{client}\n{value}".encode()).hexdigest()
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def take_over(record, request_hash, owner, now):
+    """Claim an expired or abandoned record, unless another request just did"""
+    result = db.session.execute(
+        update(IdempotencyRecord)
+        .where(IdempotencyRecord.key == record.key, IdempotencyRecord.owner == record.owner)
+        .values(request_hash=request_hash, status=IN_FLIGHT, owner=owner, status_code=None, response=None,
+                locked_until=now + IDEMPOTENCY_LOCK_SECONDS, expires_at=now + IDEMPOTENCY_TTL_SECONDS)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def try_claim(key, request_hash, owner):
+    """One attempt at key: a Claim, the Replay of the earlier request, or None while it still runs.
+
+    If the database fails, the request runs without idempotency rather than being turned away.
+    """
+    now = time.time()
+    try:
+        try:
+            # A statement rather than session.add: the session may still hold the row from the last poll
+            with db.session.begin_nested():
+                db.session.execute(insert(IdempotencyRecord).values(
+                    key=key, request_hash=request_hash, status=IN_FLIGHT, owner=owner,
+                    locked_until=now + IDEMPOTENCY_LOCK_SECONDS, expires_at=now + IDEMPOTENCY_TTL_SECONDS))
+            db.session.commit()
+            _local_events[key] = threading.Event()
+            return Claim(key, owner)
+        except IntegrityError:
+            # Somebody used the key before
+            pass
+
+        record = db.session.get(IdempotencyRecord, key, populate_existing=True)
+        if record is None:
+            # Given up in the meantime
+            return try_claim(key, request_hash, owner)
+        abandoned = record.status == IN_FLIGHT and record.locked_until <= now
+        if record.expires_at <= now or (abandoned and record.request_hash == request_hash):
+            if take_over(record, request_hash, owner, now):
+                _local_events[key] = threading.Event()
+                return Claim(key, owner)
+            return None
+        if record.request_hash != request_hash:
+            db.session.rollback()
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request", 422)
+        if record.status == COMPLETED:
+            replay = Replay(record.status_code, json.loads(record.response))
+            db.session.rollback()
+            return replay
+        db.session.rollback()
+        return None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Idempotency check failed, running the request without it: {e}")
+        return Claim(None)
+
+def still_running():
+    return IdempotencyConflict("A request with this Idempotency-Key is still in progress", 409, CONFLICT_RETRY_AFTER)
+
+def count_outcome(outcome, waited):
+    if isinstance(outcome, Replay):
+        metrics.record_idempotency("attached" if waited else "replayed")
+    elif outcome.key is not None:
+        metrics.record_idempotency("claimed")
+
+def begin(key, request_hash):
+    """Claim key for this request, or wait for the request holding it and return its Replay.
+
+    Without a key (or with idempotency disabled) this returns an empty Claim. Raises
+    IdempotencyConflict when the key belongs to a different request, or when the request
+    holding it is still running after IDEMPOTENCY_WAIT_SECONDS.
+    """
+    if key is None or not IDEMPOTENCY_ENABLED:
+        return Claim(None)
+    owner = uuid.uuid4().hex
+    give_up_at = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+
+    while True:
+        try:
+            outcome = try_claim(key, request_hash, owner)
+        except IdempotencyConflict:
+            metrics.record_idempotency("mismatch")
+            raise
+        if outcome is not None:
+            count_outcome(outcome, waited)
+            return outcome
+
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            metrics.record_idempotency("in_progress")
+            raise still_running()
+        waited = True
+        # Requests running in this process signal directly; others are seen by re-reading the row
+        event = _local_events.get(key)
+        if event is not None:
+            event.wait(min(remaining, POLL_INTERVAL_SECONDS))
+        else:
+            time.sleep(min(remaining, POLL_INTERVAL_SECONDS))
+
+async def abegin(key, request_hash, run):
+    """Async twin of begin() for the ASGI server; run(fn, *args) does the database work on a thread"""
+    if key is None or not IDEMPOTENCY_ENABLED:
+        return Claim(None)
+    owner = uuid.uuid4().hex
+    give_up_at = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+
+    while True:
+        try:
+            outcome = await run(try_claim, key, request_hash, owner)
+        except IdempotencyConflict:
+            metrics.record_idempotency("mismatch")
+            raise
+        if outcome is not None:
+            count_outcome(outcome, waited)
+            return outcome
+
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            metrics.record_idempotency("in_progress")
+            raise still_running()
+        waited = True
+        await asyncio.sleep(min(remaining, POLL_INTERVAL_SECONDS))
+
+def wake_waiters(key):
+    event = _local_events.pop(key, None)
+    if event:
+        event.set()
+
+def purge_expired(now):
+    """Forget keys past their TTL"""
+    global _last_purge
+    if now - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+    db.session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now))
+
+def complete(claim, status_code, body):
+    """Store the response for claim's key, to be replayed to retries until the key expires"""
+    if claim.key is None:
+        return
+    claim.finished = True
+    now = time.time()
+    try:
+        db.session.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.key == claim.key, IdempotencyRecord.owner == claim.owner)
+            .values(status=COMPLETED, status_code=status_code, response=json.dumps(body), locked_until=now)
+            .execution_options(synchronize_session=False)
+        )
+        purge_expired(now)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Could not store the response of an idempotent request, retries will run it again: {e}")
+        abandon(claim)
+    finally:
+        wake_waiters(claim.key)
+
+def abandon(claim):
+    """Give claim's key up after a failed request, so a retry runs the generation again"""
+    if claim.key is None:
+        return
+    claim.finished = True
+    try:
+        db.session.execute(
+            delete(IdempotencyRecord)
+            .where(IdempotencyRecord.key == claim.key, IdempotencyRecord.owner == claim.owner)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Could not release an idempotency key, retries wait up to {IDEMPOTENCY_LOCK_SECONDS:.0f}s for it: {e}")
+    finally:
+        wake_waiters(claim.key)
+
+@contextmanager
+def holding(claim):
+    """Give claim up if the block ends, by returning or raising, without complete()"""
+    try:
+        yield claim
+    finally:
+        if not claim.finished:
+            abandon(claim)
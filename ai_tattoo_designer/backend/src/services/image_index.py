@@ -0,0 +1,294 @@
+"""Near-duplicate lookup over the prompts of stored images.
+
+Each prompt becomes a set of word shingles and a MinHash signature. LSH bands over the
+signatures find candidates without comparing against every stored prompt. Candidates
+are then scored by the exact Jaccard similarity of their shingle sets.
+
+The index is an append-only log in IMAGE_INDEX_DIR, one per image store. Every worker
+tails it, so an image rendered by one worker can be reused by the others. It holds every
+prompt, and prompts carry people's names and traits, so it must stay out of the public
+image store.
+"""
+import os
+import re
+import json
+import fcntl
+import random
+import hashlib
+import threading
+from src.services import image_store, metrics
+
+IMAGE_REUSE_ENABLED = os.getenv('IMAGE_REUSE_ENABLED', 'true').lower() == 'true'
+# Jaccard similarity of prompt shingles at which a stored image is served instead of a new one
+IMAGE_REUSE_THRESHOLD = float(os.getenv('IMAGE_REUSE_THRESHOLD', '0.85'))
+# Lower bar for showing a stored image as a preview while the new one renders
+IMAGE_PREVIEW_THRESHOLD = float(os.getenv('IMAGE_PREVIEW_THRESHOLD', '0.4'))
+# Appended lines after which a worker rewrites the log without evicted images
+IMAGE_INDEX_COMPACT_EVERY = int(os.getenv('IMAGE_INDEX_COMPACT_EVERY', '10000'))
+
+# Private to the app, next to the database
+IMAGE_INDEX_DIR = os.getenv('IMAGE_INDEX_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'image_index'))
+# Where the log used to live, inside the store; moved out on first use
+LEGACY_INDEX_FILENAME = '.prompt-index.jsonl'
+
+# 32 bands of 3 rows: pairs at 0.5 similarity share a band 98% of the time, pairs at 0.2 23%
+LSH_BANDS = 32
+LSH_ROWS = 3
+MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed: every worker must draw the same permutations
+_rng = random.Random(20240611)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+                for _ in range(LSH_BANDS * LSH_ROWS)]
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from in into is it its of on or over that the their this
+to under with within featuring style design tattoo image
+""".split())
+
+def normalize_words(prompt):
+    words = []
+    for word in re.findall(r"[a-z0-9]+", (prompt or "").lower()):
+        if word in STOPWORDS:
+            continue
+        # Cheap plural folding so "stars" and "star" match
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def shingles(prompt):
+    """Words and word pairs: pairs keep some order, single words survive rephrasing"""
+    words = normalize_words(prompt)
+    return frozenset(words) | frozenset(f"{first} {second}" for first, second in zip(words, words[1:]))
+
+def shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+
+def minhash(shingle_set):
+    hashes = [shingle_hash(shingle) for shingle in shingle_set]
+    return [min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in PERMUTATIONS]
+
+def band_keys(signature):
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).hexdigest()
+        keys.append(digest)
+    return keys
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+class Match:
+
+    def __init__(self, url, similarity):
+        self.url = url
+        self.similarity = similarity
+
+class PromptIndex:
+    """In-memory LSH index of one image store directory, kept in sync with its log"""
+
+    def __init__(self, directory):
+        name = hashlib.sha256(os.path.abspath(directory).encode()).hexdigest()[:16]
+        self.path = os.path.join(IMAGE_INDEX_DIR, f"prompts-{name}.jsonl")
+        self.lock_path = os.path.join(IMAGE_INDEX_DIR, f"prompts-{name}.lock")
+        self._move_legacy_log(directory)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"lookups": 0, "reused": 0, "previews": 0, "misses": 0}
+        self.similarity_total = 0.0
+        self._reset()
+
+    def _move_legacy_log(self, directory):
+        legacy_path = os.path.join(directory, LEGACY_INDEX_FILENAME)
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            os.makedirs(IMAGE_INDEX_DIR, exist_ok=True)
+            if os.path.exists(self.path):
+                os.remove(legacy_path)
+            else:
+                os.replace(legacy_path, self.path)
+        except OSError as e:
+            print(f"Could not move the prompt index out of the image store: {e}")
+
+    def _reset(self):
+        self.entries = {}
+        self.buckets = {}
+        self.offset = 0
+        self.inode = None
+        self.lines = 0
+        self.lines_at_load = None
+
+    def _load_line(self, line):
+        try:
+            record = json.loads(line)
+            url, prompt, bands = record["url"], record["prompt"], record["bands"]
+        except (ValueError, KeyError, TypeError):
+            return
+        if url in self.entries:
+            return
+        self.entries[url] = shingles(prompt)
+        for key in bands:
+            self.buckets.setdefault(key, set()).add(url)
+
+    def refresh(self):
+        """Read lines other workers appended since the last call; reload after a compaction"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self._reset()
+            self.inode = stat.st_ino
+        if stat.st_size == self.offset:
+            return
+
+        with open(self.path, 'rb') as log:
+            log.seek(self.offset)
+            data = log.read(stat.st_size - self.offset)
+        # A line still being appended is picked up next time
+        complete = data[:data.rfind(b"\n") + 1]
+        self.offset += len(complete)
+        lines = complete.decode("utf-8", errors="replace").splitlines()
+        for line in lines:
+            self._load_line(line)
+        self.lines += len(lines)
+        if self.lines_at_load is None:
+            self.lines_at_load = self.lines
+
+    def _forget(self, url):
+        self.entries.pop(url, None)
+        for urls in self.buckets.values():
+            urls.discard(url)
+
+    def find(self, prompt):
+        """Best stored image for prompt as a Match, or None when nothing shares a band"""
+        query = shingles(prompt)
+        if not query:
+            return None
+        keys = band_keys(minhash(query))
+        with self._lock:
+            self.refresh()
+            candidates = set()
+            for key in keys:
+                candidates.update(self.buckets.get(key, ()))
+            scored = sorted(((jaccard(query, self.entries[url]), url) for url in candidates), reverse=True)
+            for similarity, url in scored:
+                if image_store.exists(url):
+                    return Match(url, similarity)
+                # Evicted by the image store quota
+                self._forget(url)
+        return None
+
+    def add(self, prompt, url):
+        shingle_set = shingles(prompt)
+        if not shingle_set or not url:
+            return
+        line = json.dumps({"url": url, "prompt": prompt, "bands": band_keys(minhash(shingle_set))}) + "\n"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # One O_APPEND write per entry, so lines from different workers never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            self.refresh()
+            if self.lines - (self.lines_at_load or 0) >= IMAGE_INDEX_COMPACT_EVERY:
+                self.compact()
+
+    def compact(self):
+        """Rewrite the log without entries whose image is gone; one worker at a time"""
+        with open(self.lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                # A line appended by another worker during the rewrite is lost; it is only a cache
+                kept = []
+                with open(self.path, 'rb') as log:
+                    for line in log:
+                        try:
+                            url = json.loads(line)["url"]
+                        except (ValueError, KeyError, TypeError):
+                            continue
+                        if image_store.exists(url):
+                            kept.append(line)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as temp:
+                    temp.writelines(kept)
+                os.replace(temp_path, self.path)
+                print(f"Compacted image prompt index to {len(kept)} entries")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._reset()
+        self.refresh()
+
+    def record(self, outcome, match):
+        with self._stats_lock:
+            self.stats["lookups"] += 1
+            self.stats[outcome] += 1
+            self.similarity_total += match.similarity if match else 0.0
+        metrics.record_image_lookup(outcome, match.similarity if match else 0.0)
+
+    def record_preview(self):
+        with self._stats_lock:
+            self.stats["previews"] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+            lookups = stats["lookups"]
+            stats["reuse_rate"] = stats["reused"] / lookups if lookups else 0.0
+            stats["mean_best_similarity"] = round(self.similarity_total / lookups, 4) if lookups else 0.0
+        stats["entries"] = len(self.entries)
+        return stats
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index():
+    """The index of the current image store directory"""
+    directory = image_store.IMAGE_STORE_DIR
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = _indexes[directory] = PromptIndex(directory)
+    return index
+
+def find_reusable(prompt):
+    """A stored image similar enough to serve for prompt, or None. Counts the lookup."""
+    if not IMAGE_REUSE_ENABLED:
+        return None
+    index = get_index()
+    match = index.find(prompt)
+    if match and match.similarity >= IMAGE_REUSE_THRESHOLD:
+        image_store.touch(match.url)
+        index.record("reused", match)
+        return match
+    index.record("misses", match)
+    return None
+
+def find_preview(prompt):
+    """A stored image close enough to show while prompt's own image renders, or None"""
+    if not IMAGE_REUSE_ENABLED:
+        return None
+    index = get_index()
+    match = index.find(prompt)
+    if match and match.similarity >= IMAGE_PREVIEW_THRESHOLD:
+        index.record_preview()
+        return match
+    return None
+
+def add(prompt, url):
+    try:
+        get_index().add(prompt, url)
+    except OSError as e:
+        print(f"Could not index image prompt: {e}")
@@ -0,0 +1,203 @@
+import os
+import time
+import uuid
+import fcntl
+import hashlib
+import threading
+from src.services import deadlines, metrics
+
+# Absolute so the store doesn't depend on the worker's current directory
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+IMAGE_STORE_DIR = os.path.join(STATIC_DIR, 'generated_images')
+IMAGE_STORE_URL_PREFIX = '/static/generated_images'
+
+IMAGE_STORE_CHUNK_SIZE = int(os.getenv('IMAGE_STORE_CHUNK_SIZE', str(64 * 1024)))
+IMAGE_STORE_MAX_BYTES = int(os.getenv('IMAGE_STORE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Eviction stops once the store is back under this fraction of the quota
+IMAGE_STORE_LOW_WATER = float(os.getenv('IMAGE_STORE_LOW_WATER', '0.9'))
+IMAGE_STORE_GC_INTERVAL = int(os.getenv('IMAGE_STORE_GC_INTERVAL', '600'))
+IMAGE_STORE_GC_ENABLED = os.getenv('IMAGE_STORE_GC_ENABLED', 'true').lower() == 'true'
+
+def shard_path(digest, extension):
+    """Relative path of a stored image: two levels of sharding by hash prefix"""
+    return os.path.join(digest[:2], digest[2:4], f"{digest}{extension}")
+
+def to_url(relative_path):
+    return f"{IMAGE_STORE_URL_PREFIX}/{relative_path.replace(os.sep, '/')}"
+
+def url_to_path(url):
+    """Filesystem path for a URL returned by the store, or None if it isn't a store URL"""
+    if not url or not url.startswith(IMAGE_STORE_URL_PREFIX + '/'):
+        return None
+    relative = url[len(IMAGE_STORE_URL_PREFIX) + 1:]
+    path = os.path.normpath(os.path.join(IMAGE_STORE_DIR, relative))
+    if not path.startswith(IMAGE_STORE_DIR + os.sep):
+        return None
+    return path
+
+def exists(url):
+    path = url_to_path(url)
+    return path is not None and os.path.isfile(path)
+
+class IncomingImage:
+    """A temporary file that hashes what is written to it and moves into the store on commit"""
+
+    def __init__(self, extension='.png'):
+        os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
+        self.extension = extension
+        self.temp_path = os.path.join(IMAGE_STORE_DIR, f".incoming-{uuid.uuid4().hex}")
+        self.digest = hashlib.sha256()
+        self.file = open(self.temp_path, 'wb')
+        self.write_seconds = 0.0
+
+    def write(self, chunk):
+        if chunk:
+            started = time.monotonic()
+            self.digest.update(chunk)
+            self.file.write(chunk)
+            self.write_seconds += time.monotonic() - started
+
+    def commit(self):
+        self.file.close()
+        relative_path = shard_path(self.digest.hexdigest(), self.extension)
+        final_path = os.path.join(IMAGE_STORE_DIR, relative_path)
+        if os.path.exists(final_path):
+            os.remove(self.temp_path)
+            os.utime(final_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self.temp_path, final_path)
+        metrics.observe_stage('image_write', self.write_seconds)
+        return to_url(relative_path)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+def store_stream(chunks, extension='.png'):
+    """Write an iterable of byte chunks into the store and return the image's static URL.
+
+    Chunks are hashed while they are written to a temporary file, which is then moved to
+    its content-addressed location. If the same image is already stored, the temporary
+    file is discarded and the existing copy's timestamp is refreshed for the LRU.
+    """
+    incoming = IncomingImage(extension)
+    download_seconds = 0.0
+    try:
+        chunks = iter(chunks)
+        while True:
+            # Waiting on the next chunk is download time; hashing and writing it is disk time
+            started = time.monotonic()
+            chunk = next(chunks, None)
+            download_seconds += time.monotonic() - started
+            if chunk is None:
+                break
+            incoming.write(chunk)
+            # Read timeouts bound each chunk, not a download that trickles in
+            deadlines.check()
+        url = incoming.commit()
+    except BaseException:
+        incoming.discard()
+        raise
+
+    metrics.observe_stage('image_download', download_seconds)
+    return url
+
+async def astore_stream(chunks, extension='.png'):
+    """store_stream for an async iterable of chunks, e.g. an aiohttp response body.
+
+    The 64KB local writes stay on the event loop; only the download is awaited.
+    """
+    incoming = IncomingImage(extension)
+    started = time.monotonic()
+    try:
+        async for chunk in chunks:
+            incoming.write(chunk)
+        url = incoming.commit()
+    except BaseException:
+        incoming.discard()
+        raise
+
+    metrics.observe_stage('image_download', time.monotonic() - started - incoming.write_seconds)
+    return url
+
+def store_bytes(data, extension='.png'):
+    return store_stream([data], extension)
+
+def touch(url):
+    """Mark a stored image as recently used so the collector keeps it"""
+    path = url_to_path(url)
+    if path:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+def stored_images():
+    """(path, size, last_used) for every content-addressed image; legacy flat files are left alone"""
+    images = []
+    for root, dirs, files in os.walk(IMAGE_STORE_DIR):
+        if root == IMAGE_STORE_DIR:
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            images.append((path, stat.st_size, stat.st_mtime))
+    return images
+
+def collect_garbage(max_bytes=None):
+    """Evict least recently used images until the store is under its quota; returns bytes freed"""
+    max_bytes = IMAGE_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    images = stored_images()
+    total = sum(size for _, size, _ in images)
+    if total <= max_bytes:
+        return 0
+
+    target = max_bytes * IMAGE_STORE_LOW_WATER
+    freed = 0
+    for path, size, _ in sorted(images, key=lambda image: image[2]):
+        if total - freed <= target:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    print(f"Image store GC freed {freed} bytes")
+    return freed
+
+def _collect_once_across_workers():
+    # Only one gunicorn worker collects at a time; the others skip this round
+    os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
+    with open(os.path.join(IMAGE_STORE_DIR, '.gc.lock'), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            collect_garbage()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+_gc_thread = None
+
+def start_garbage_collector():
+    """Start the background quota collector for this process (idempotent)"""
+    global _gc_thread
+    if not IMAGE_STORE_GC_ENABLED or _gc_thread is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(IMAGE_STORE_GC_INTERVAL)
+            try:
+                _collect_once_across_workers()
+            except Exception as e:
+                print(f"Image store GC failed: {e}")
+
+    _gc_thread = threading.Thread(target=run, name='image-store-gc', daemon=True)
+    _gc_thread.start()
@@ -0,0 +1,132 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.services import image_store
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it only the original PNG is served
+    Image = None
+    features = None
+
+IMAGE_VARIANTS_ENABLED = os.getenv('IMAGE_VARIANTS_ENABLED', 'true').lower() == 'true'
+IMAGE_VARIANTS_AVIF = os.getenv('IMAGE_VARIANTS_AVIF', 'false').lower() == 'true'
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '256'))
+
+# Negotiable formats in order of preference, as (mimetype, extension)
+NEGOTIABLE_FORMATS = (('image/avif', '.avif'), ('image/webp', '.webp'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def variants_available():
+    return IMAGE_VARIANTS_ENABLED and Image is not None
+
+def avif_available():
+    return IMAGE_VARIANTS_AVIF and features is not None and features.check('avif')
+
+def sibling(path, suffix):
+    return os.path.splitext(path)[0] + suffix
+
+def render_variants(source_path, avif):
+    """Write the WebP/AVIF siblings and thumbnails for a stored PNG (runs in a pool process)"""
+    with Image.open(source_path) as image:
+        image.load()
+        image.save(sibling(source_path, '.webp'), 'WEBP', lossless=True, method=4)
+        if avif:
+            image.save(sibling(source_path, '.avif'), 'AVIF', quality=80)
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        thumbnail.save(sibling(source_path, '.thumb.png'), 'PNG', optimize=True)
+        thumbnail.save(sibling(source_path, '.thumb.webp'), 'WEBP', quality=80)
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a multi-threaded gunicorn worker is not safe
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def schedule_variants(image_url):
+    """Queue variant rendering for a stored image without waiting for it"""
+    source_path = image_store.url_to_path(image_url)
+    if not variants_available() or source_path is None:
+        return None
+    try:
+        future = get_executor().submit(render_variants, source_path, avif_available())
+    except BrokenProcessPool:
+        # A pool process died; start a fresh pool for the next image
+        reset_executor()
+        print("Image variant pool was broken and has been reset")
+        return None
+    future.add_done_callback(_report_failure)
+    return future
+
+def _report_failure(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Image variant rendering failed: {error}")
+
+def variant_urls(image_url):
+    """URLs for the variants of an image. Until they are rendered, the image route serves the original."""
+    if not image_url:
+        return None
+    stem = os.path.splitext(image_url)[0]
+    variants = {'png': image_url}
+    if variants_available():
+        variants['webp'] = f"{stem}.webp"
+        if avif_available():
+            variants['avif'] = f"{stem}.avif"
+    variants['thumbnail'] = f"{stem}.thumb.png"
+    return variants
+
+def will_render(variant_path):
+    """Whether schedule_variants writes this WebP/AVIF sibling; there are no AVIF thumbnails"""
+    base, extension = os.path.splitext(variant_path)
+    if extension == '.avif':
+        return avif_available() and not base.endswith('.thumb')
+    return variants_available()
+
+def negotiate(path, accepted_mimetypes):
+    """Pick the best existing file for a requested image path given the client's accepted types.
+
+    Returns (path, is_fallback). Requests for a .png are upgraded to an AVIF/WebP sibling
+    the client accepts; requests for a variant that hasn't been rendered yet fall back to
+    the original PNG. A .png served while a sibling the client accepts is still being
+    rendered is a fallback too, so it isn't cached in place of the sibling. Returns
+    (None, False) when nothing suitable exists.
+    """
+    base, extension = os.path.splitext(path)
+    candidates = []
+    if extension == '.png':
+        candidates.extend(base + variant_extension for mimetype, variant_extension in NEGOTIABLE_FORMATS
+                          if mimetype in accepted_mimetypes)
+    candidates.append(path)
+
+    # Not rendered yet: a thumbnail falls back to the full-size image, a WebP/AVIF to its PNG
+    if base.endswith('.thumb'):
+        fallback = base[:-len('.thumb')] + '.png'
+    else:
+        fallback = base + '.png'
+
+    pending = False
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate, pending
+        pending = pending or (candidate != path and will_render(candidate))
+    if fallback != path and os.path.isfile(fallback):
+        return fallback, True
+    return None, False
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from src.models.user import db
+from src.models.job import Job
+
+# Worker pool sizing. Generations are I/O bound (provider calls), so threads are enough.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+# Maximum number of queued + running jobs per process before new submissions are rejected
+JOB_QUEUE_LIMIT = int(os.getenv('JOB_QUEUE_LIMIT', '64'))
+JOB_RETRY_AFTER_SECONDS = int(os.getenv('JOB_RETRY_AFTER_SECONDS', '5'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(JOB_QUEUE_LIMIT)
+# Completion events for jobs owned by this process, so long-polls can wake up early
+_local_events = {}
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool already has JOB_QUEUE_LIMIT jobs pending"""
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job-worker')
+        return _executor
+
+def enqueue_job(kind, payload, handler):
+    """Persist a new job and schedule handler(payload) on the worker pool"""
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFull()
+
+    try:
+        job = Job(id=uuid.uuid4().hex, kind=kind, status='queued', payload=json.dumps(payload))
+        db.session.add(job)
+        db.session.commit()
+
+        _local_events[job.id] = threading.Event()
+        app = current_app._get_current_object()
+        get_executor().submit(_run_job, app, job.id, handler, payload)
+    except Exception:
+        _slots.release()
+        raise
+
+    return job
+
+def _run_job(app, job_id, handler, payload):
+    try:
+        with app.app_context():
+            _update_job(job_id, status='running', started_at=datetime.utcnow())
+            try:
+                result = handler(payload)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                _update_job(job_id, status='failed', error=getattr(e, 'message', str(e)),
+                            finished_at=datetime.utcnow())
+            else:
+                _update_job(job_id, status='succeeded', result=json.dumps(result),
+                            finished_at=datetime.utcnow())
+            finally:
+                db.session.remove()
+    finally:
+        _slots.release()
+        event = _local_events.pop(job_id, None)
+        if event:
+            event.set()
+
+def _update_job(job_id, **fields):
+    job = db.session.get(Job, job_id)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+
+def get_job(job_id):
+    return db.session.get(Job, job_id)
+
+def wait_for_job(job_id, timeout, poll_interval=0.5):
+    """Block until the job finishes or timeout seconds pass, then return the latest row"""
+    deadline = time.monotonic() + timeout
+    event = _local_events.get(job_id)
+
+    while True:
+        db.session.expire_all()
+        job = get_job(job_id)
+        remaining = deadline - time.monotonic()
+        if job is None or job.is_finished or remaining <= 0:
+            return job
+
+        # Jobs running in this process signal completion directly; jobs owned
+        # by another worker are picked up by re-reading the row.
+        if event is not None:
+            event.wait(min(remaining, poll_interval))
+        else:
+            time.sleep(min(remaining, poll_interval))
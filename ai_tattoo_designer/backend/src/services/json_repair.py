@@ -0,0 +1,84 @@
+import json
+import re
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+
+def strip_fences(text):
+    """Return the inside of the first markdown code fence, or text unchanged if there is none"""
+    match = FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+def balance(text):
+    """Close an unterminated string and any brackets left open by a truncated reply.
+
+    Returns (text, cut_string); cut_string says the last value was cut off mid-string.
+    """
+    closers = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if in_string:
+        text += '"'
+    return text + "".join(reversed(closers)), in_string
+
+def repair_json_object(text):
+    """Parse the JSON object in a model reply, repairing the usual damage on the way.
+
+    Handles markdown fences, prose around the object, trailing commas and replies cut off
+    mid-object. Raises ValueError if no object can be recovered.
+    """
+    if not text:
+        raise ValueError("Empty response")
+
+    candidate = strip_fences(text)
+    start = candidate.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in response")
+    candidate = candidate[start:]
+    end = candidate.rfind("}")
+
+    attempts = []
+    if end != -1:
+        attempts.append((candidate[:end + 1], False))
+    attempts.append(balance(candidate.rstrip().rstrip(",")))
+
+    for attempt, cut_string in attempts:
+        for variant in (attempt, TRAILING_COMMA_PATTERN.sub(r"\1", attempt)):
+            try:
+                value = json.loads(variant)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                if cut_string and value:
+                    # Half a field is worse than none; let the caller ask for it again
+                    value.pop(list(value)[-1])
+                return value
+    raise ValueError("Could not repair JSON object in response")
+
+def validate_fields(data, fields):
+    """Keep the expected fields that hold usable text; returns (clean, missing)"""
+    clean = {}
+    missing = []
+    for field in fields:
+        value = data.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if isinstance(value, str) and value.strip():
+            clean[field] = value.strip()
+        else:
+            missing.append(field)
+    return clean, missing
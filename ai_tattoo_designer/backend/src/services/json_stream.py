@@ -0,0 +1,83 @@
+import json
+
+class IncrementalObjectParser:
+    """Incremental parser for a single JSON object arriving in arbitrary text chunks.
+
+    feed() returns the top-level (key, value) pairs that became complete with the new
+    chunk, so callers can act on each field as soon as its closing quote/bracket arrives.
+    Any text before the opening brace (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = "start"  # start -> key -> colon -> value -> key ... -> done
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    def feed(self, chunk):
+        completed = []
+        self.text += chunk
+
+        while self.pos < len(self.text) and self.state != "done":
+            char = self.text[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key":
+                        self.key = json.loads(self.text[self.key_start:self.pos + 1])
+                        self.state = "colon"
+                self.pos += 1
+                continue
+
+            if self.state == "start":
+                if char == "{":
+                    self.depth = 1
+                    self.state = "key"
+            elif self.depth == 1 and self.state == "key":
+                if char == '"':
+                    self.in_string = True
+                    self.key_start = self.pos
+                elif char == "}":
+                    self.depth = 0
+                    self.state = "done"
+            elif self.depth == 1 and self.state == "colon":
+                if char == ":":
+                    self.state = "value"
+                    self.value_start = None
+            elif self.depth == 1 and self.state == "value" and char in ",}":
+                if self.value_start is not None:
+                    value = json.loads(self.text[self.value_start:self.pos])
+                    self.fields[self.key] = value
+                    completed.append((self.key, value))
+                self.state = "key"
+                if char == "}":
+                    self.depth = 0
+                    self.state = "done"
+            else:
+                if self.state == "value" and self.value_start is None and not char.isspace():
+                    self.value_start = self.pos
+                if char == '"':
+                    self.in_string = True
+                elif char in "{[":
+                    self.depth += 1
+                elif char in "}]":
+                    self.depth -= 1
+
+            self.pos += 1
+
+        return completed
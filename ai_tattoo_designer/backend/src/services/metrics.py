@@ -0,0 +1,114 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+
+# Under gunicorn, point this at an empty directory shared by all workers (and wipe it on
+# deploy); prometheus_client then keeps every metric in per-process files that /metrics merges.
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# USD per 1k prompt and completion tokens: "provider=prompt:completion,..."
+DEFAULT_TOKEN_PRICES = "chatgpt=0.0005:0.0015,openrouter=0.003:0.015"
+
+def parse_token_prices(spec):
+    prices = {}
+    for entry in (spec or "").split(","):
+        if "=" not in entry:
+            continue
+        name, _, rates = entry.partition("=")
+        try:
+            prompt_rate, completion_rate = (float(rate) for rate in rates.split(":"))
+        except ValueError:
+            print(f"Ignoring malformed token price {entry!r}")
+            continue
+        prices[name.strip()] = (prompt_rate, completion_rate)
+    return prices
+
+TOKEN_PRICES = parse_token_prices(os.getenv('PROVIDER_TOKEN_PRICES', DEFAULT_TOKEN_PRICES))
+
+# Provider calls run from tens of milliseconds (cache-warm text) to a minute (images)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    'tattoo_stage_seconds', 'Time spent in each pipeline stage', ['stage'], buckets=LATENCY_BUCKETS)
+PROVIDER_SECONDS = Histogram(
+    'tattoo_provider_seconds', 'Provider call latency', ['kind', 'provider', 'outcome'], buckets=LATENCY_BUCKETS)
+PROVIDER_ERRORS = Counter(
+    'tattoo_provider_errors_total', 'Failed provider calls', ['kind', 'provider'])
+FALLBACKS = Counter(
+    'tattoo_fallbacks_total', 'Readings or images not served by the first-choice provider', ['kind', 'reason'])
+TOKENS = Counter(
+    'tattoo_tokens_total', 'Tokens sent to and received from text providers', ['provider', 'direction'])
+ESTIMATED_COST = Counter(
+    'tattoo_estimated_cost_dollars_total', 'Estimated text provider spend', ['provider'])
+IMAGE_LOOKUPS = Counter(
+    'tattoo_image_lookups_total', 'Near-duplicate image lookups before rendering', ['outcome'])
+IMAGE_SIMILARITY = Histogram(
+    'tattoo_image_similarity', 'Similarity of the closest stored image prompt per lookup',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0))
+ADMISSION_REJECTIONS = Counter(
+    'tattoo_admission_rejections_total', 'Generations turned away with a 429', ['reason'])
+DEADLINE_CUTS = Counter(
+    'tattoo_deadline_cuts_total', 'Provider calls skipped or cut off by the request deadline', ['stage', 'reason'])
+IDEMPOTENT_REQUESTS = Counter(
+    'tattoo_idempotent_requests_total', 'Generation requests sent with an Idempotency-Key', ['outcome'])
+PIPELINES_IN_FLIGHT = Gauge(
+    'tattoo_pipelines_in_flight', 'Tattoo generations currently running', multiprocess_mode='livesum')
+PROVIDER_CALLS_IN_FLIGHT = Gauge(
+    'tattoo_provider_calls_in_flight', 'Provider calls currently running', ['kind', 'provider'],
+    multiprocess_mode='livesum')
+
+@contextmanager
+def timed(stage):
+    """Observe the wrapped block (or decorated function) as a pipeline stage"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.monotonic() - started)
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+def record_provider_call(kind, provider, seconds, ok):
+    PROVIDER_SECONDS.labels(kind, provider, 'success' if ok else 'error').observe(seconds)
+    if not ok:
+        PROVIDER_ERRORS.labels(kind, provider).inc()
+
+def record_fallback(kind, reason):
+    FALLBACKS.labels(kind, reason).inc()
+
+def record_image_lookup(outcome, similarity):
+    IMAGE_LOOKUPS.labels(outcome).inc()
+    IMAGE_SIMILARITY.observe(similarity)
+
+def record_rejection(reason):
+    ADMISSION_REJECTIONS.labels(reason).inc()
+
+def record_deadline_cut(stage, reason):
+    DEADLINE_CUTS.labels(stage, reason).inc()
+
+def record_idempotency(outcome):
+    IDEMPOTENT_REQUESTS.labels(outcome).inc()
+
+def record_tokens(provider, prompt_tokens, completion_tokens):
+    TOKENS.labels(provider, 'prompt').inc(prompt_tokens)
+    TOKENS.labels(provider, 'completion').inc(completion_tokens)
+    if provider in TOKEN_PRICES:
+        prompt_rate, completion_rate = TOKEN_PRICES[provider]
+        ESTIMATED_COST.labels(provider).inc((prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1000)
+
+def render_latest():
+    """Exposition text for /metrics, merged across workers in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_dead(pid):
+    """gunicorn child_exit hook: drop a dead worker's live gauges"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,141 @@
+import os
+import json
+from src.services import metrics
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a characters-per-token estimate
+    tiktoken = None
+
+# Bump whenever the system prefix or the user template changes in a way that affects the
+# generated reading, so cached readings produced by the old prompt are not served.
+# v2: image_prompt comes first so image generation can start while the narrative streams.
+# v3: static guidance moved into the system prefix; personal_story is token-budgeted.
+PROMPT_VERSION = "3"
+
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '600'))
+PERSONAL_STORY_MIN_TOKENS = int(os.getenv('PERSONAL_STORY_MIN_TOKENS', '50'))
+TOKEN_ENCODING = os.getenv('TOKEN_ENCODING', 'cl100k_base')
+
+# Identical on every request: the per-person user message stays small, and the prefix is
+# ready for provider prompt caching. At about 500 tokens it is below the 1024-token minimum
+# of OpenAI's and Anthropic's caches, so nothing is cached yet. Nothing per-person may go in here.
+SYSTEM_PROMPT = """You are a mystical AI tattoo oracle designer, inspired by tarot reading and symbolic divination. From the person described by the user, create a unique, meaningful tattoo design concept.
+
+Respond with valid JSON only, with these fields in this order:
+{
+  "image_prompt": "A detailed prompt for an AI image generator describing the tattoo's visual elements, including style, cultural elements and aesthetic preferences.",
+  "symbolic_analysis": "Interpret name numerology, zodiac sign and the other symbolic meanings in the provided information, woven into one narrative.",
+  "core_tattoo_theme": "The emotional, spiritual or archetypal essence the tattoo should express.",
+  "visual_motif_description": "A vivid description of the tattoo's symbols, shapes, animals and patterns, reflecting the given aesthetic, element and cultural influences.",
+  "placement_suggestion": "Ideal body placement and size (e.g. upper forearm, chest, sleeve, ankle) for the design's complexity and significance.",
+  "mystical_insight": "A brief fortune-style message tied to the design and the person's journey."
+}
+
+Design guidelines:
+- Tell a short mythic story that connects all the personal elements provided
+- Birthplace: draw on regional symbolism, geography or local mythology
+- Favorite element: let it shape texture and flow (Fire: bold flames/energy, Water: flowing lines/depth, Earth: grounding/stability, Air: movement/freedom)
+- Preferred aesthetic: the design must reflect that artistic style
+- Spirit animal: make it central, with its symbolic meaning
+- Life theme: let it guide the overall symbolic message
+- Personal journey: honor it through metaphor
+- Cultural or spiritual heritage: respectfully use authentic symbols, patterns or motifs
+
+Style and tone: mysterious yet poetic; tarot reader meets visionary tattoo artist; rich metaphors and artistic vocabulary; no generic or overused symbols. Every reading must be unique and grounded in ALL the information provided."""
+
+USER_TEMPLATE = """Core identity:
+- First Name: {first_name}
+- Last Name: {last_name}
+- Date of Birth: {date_of_birth}
+- Age: {age}
+- Zodiac Sign: {zodiac_sign}
+- Life Path Number: {life_path_number}"""
+
+# Optional personalization lines, in prompt order
+PERSONALIZATION_LINES = (
+    ("birthplace", "- Birthplace: {}"),
+    ("favorite_element", "- Favorite Element: {}"),
+    ("preferred_aesthetic", "- Preferred Aesthetic: {}"),
+    ("spirit_animal", "- Spirit Animal: {}"),
+    ("life_theme", "- Life Theme/Value: {}"),
+    ("personal_story", "- Personal Journey: {}"),
+    ("cultural_affiliation", "- Cultural/Spiritual Heritage: {}"),
+)
+
+_encoding = None
+_encoding_failed = False
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            print(f"Token encoding {TOKEN_ENCODING} unavailable, estimating token counts: {e}")
+            _encoding_failed = True
+    return _encoding
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly four characters per token for English prose
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        truncated = encoding.decode(encoding.encode(text)[:max_tokens])
+    else:
+        truncated = text[:max_tokens * 4]
+    # Cut back to a word boundary so the model doesn't see half a word
+    return truncated.rsplit(' ', 1)[0].rstrip() + '…'
+
+def render_user_prompt(core, personalization):
+    lines = [template.format(personalization[field]) for field, template in PERSONALIZATION_LINES
+             if personalization.get(field)]
+    if not lines:
+        return core
+    return "\n".join([core, "", "Deeper personalization:", *lines])
+
+def build_user_prompt(first_name, last_name, date_of_birth, age, zodiac_sign, life_path_number,
+                      token_budget=None, **personalization):
+    """Render the per-person part of the prompt, truncating personal_story to stay within token_budget"""
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    core = USER_TEMPLATE.format(first_name=first_name, last_name=last_name, date_of_birth=date_of_birth,
+                                age=age, zodiac_sign=zodiac_sign, life_path_number=life_path_number)
+
+    story = personalization.get("personal_story")
+    if story:
+        without_story = render_user_prompt(core, dict(personalization, personal_story=None))
+        story_budget = max(PERSONAL_STORY_MIN_TOKENS, token_budget - count_tokens(without_story) - 10)
+        truncated = truncate_to_tokens(story, story_budget)
+        if truncated != story:
+            print(f"Truncated personal_story from {count_tokens(story)} to {story_budget} tokens")
+            personalization = dict(personalization, personal_story=truncated)
+
+    return render_user_prompt(core, personalization)
+
+def build_missing_fields_prompt(prompt, reading, missing):
+    """Ask for just the fields a reply left out, keeping them consistent with the ones it gave"""
+    return "\n".join([
+        prompt,
+        "",
+        "Part of this reading was already written:",
+        json.dumps(reading, indent=2),
+        "",
+        f"Respond with a JSON object containing only these fields: {', '.join(missing)}.",
+    ])
+
+def log_token_usage(provider, prompt, completion):
+    """Log prompt/completion token counts for one reading"""
+    prompt_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt)
+    completion_tokens = count_tokens(completion)
+    print(f"Reading tokens ({provider}): prompt={prompt_tokens} completion={completion_tokens}")
+    metrics.record_tokens(provider, prompt_tokens, completion_tokens)
+    return prompt_tokens, completion_tokens
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db
+from src.models.cache_entry import CacheEntry
+
+READING_CACHE_ENABLED = os.getenv('READING_CACHE_ENABLED', 'true').lower() == 'true'
+READING_CACHE_TTL = int(os.getenv('READING_CACHE_TTL', str(7 * 24 * 3600)))
+READING_CACHE_SIZE = int(os.getenv('READING_CACHE_SIZE', '1024'))
+
+# Expired rows of the shared tier are deleted at most this often, by whichever worker stores next
+PURGE_INTERVAL_SECONDS = 3600
+
+# Inputs that shape the generated reading; anything else in the request body is ignored
+KEY_FIELDS = (
+    "first_name", "last_name", "date_of_birth", "age",
+    "birthplace", "favorite_element", "preferred_aesthetic", "spirit_animal",
+    "life_theme", "personal_story", "cultural_affiliation",
+)
+
+def normalize_value(value):
+    if isinstance(value, str):
+        value = " ".join(value.split()).lower()
+        return value or None
+    return value
+
+def normalize_date_of_birth(date_of_birth):
+    day, month, year = map(int, date_of_birth.split("/"))
+    return f"{day:02d}/{month:02d}/{year:04d}"
+
+def make_cache_key(inputs, template_version):
+    """Content address for a reading: hash of the normalized inputs and the prompt template version"""
+    normalized = {field: normalize_value(inputs.get(field)) for field in KEY_FIELDS}
+    normalized["date_of_birth"] = normalize_date_of_birth(inputs["date_of_birth"])
+    normalized["template_version"] = template_version
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """Thread-safe in-memory LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TwoTierCache:
+    """Per-process LRU in front of the CacheEntry table shared by all workers"""
+
+    def __init__(self, maxsize, ttl):
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize, ttl)
+        self._stats_lock = threading.Lock()
+        self._last_purge = 0.0
+        self.stats = {"memory_hits": 0, "database_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        """Return (value, tier) where tier is 'memory', 'database' or None on a miss"""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value, "memory"
+
+        try:
+            entry = db.session.get(CacheEntry, key)
+            if entry is not None and entry.expires_at > datetime.utcnow():
+                value = json.loads(entry.value)
+                remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+                self.memory.set(key, value, ttl=remaining)
+                self._count("database_hits")
+                return value, "database"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Reading cache lookup failed: {e}")
+
+        self._count("misses")
+        return None, None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        try:
+            now = datetime.utcnow()
+            db.session.merge(CacheEntry(
+                key=key,
+                value=json.dumps(value),
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            db.session.commit()
+            self._count("stores")
+            if time.time() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.time()
+                self.purge_expired()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Reading cache store failed: {e}")
+
+    def record_bypass(self):
+        self._count("bypassed")
+
+    def purge_expired(self):
+        """Delete expired rows from the shared tier and return how many were removed"""
+        removed = CacheEntry.query.filter(CacheEntry.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        return removed
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["database_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["database_hits"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+reading_cache = TwoTierCache(READING_CACHE_SIZE, READING_CACHE_TTL)
@@ -0,0 +1,181 @@
+"""Local line-art sigils: the image of last resort, and an instant preview.
+
+A sigil is built from the same inputs as the reading, so a person always gets the same
+one back:
+
+- the zodiac sign picks a mark on the outer ring;
+- the life path number sets the star polygon;
+- the element sets the alchemical triangle at the centre;
+- the letters of the spirit animal (or the name) are traced over a ring of nine
+  numerology points.
+
+The sigil is rendered as SVG, and as PNG when Pillow is installed. Both need no network
+and take a few milliseconds.
+"""
+import os
+import io
+import math
+from src.services import image_store
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is optional; without it sigils are stored as SVG only
+    Image = None
+    ImageDraw = None
+
+SIGIL_SIZE = int(os.getenv('SIGIL_SIZE', '512'))
+
+INK = "#1b1b1b"
+PAPER = "#f4f4f4"
+# Greyscale PNGs: a third of the pixels to draw and compress
+INK_GREY = 27
+PAPER_GREY = 244
+STROKE = 0.012
+# Drawn at this multiple of the output size and scaled down, for smooth PNG lines
+SUPERSAMPLE = 2
+
+ZODIAC_SIGNS = ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+                "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces")
+ZODIAC_ELEMENTS = ("fire", "earth", "air", "water")
+ELEMENT_WORDS = {
+    "fire": ("fire", "flame", "sun"),
+    "water": ("water", "ocean", "sea", "river", "rain"),
+    "air": ("air", "wind", "sky", "breath"),
+    "earth": ("earth", "stone", "soil", "mountain", "forest", "wood"),
+}
+
+def zodiac_element(zodiac_sign):
+    if zodiac_sign not in ZODIAC_SIGNS:
+        return None
+    return ZODIAC_ELEMENTS[ZODIAC_SIGNS.index(zodiac_sign) % 4]
+
+def resolve_element(favorite_element, zodiac_sign):
+    """The user's element if it names one of the four, otherwise their sign's"""
+    text = (favorite_element or "").lower()
+    for element, words in ELEMENT_WORDS.items():
+        if any(word in text for word in words):
+            return element
+    return zodiac_element(zodiac_sign)
+
+def polar(radius, angle):
+    # Angle 0 is at the top, increasing clockwise; y grows downwards as in SVG
+    return (radius * math.sin(angle), -radius * math.cos(angle))
+
+def element_glyph(element):
+    """Alchemical triangle: fire and air point up, water and earth down; air and earth are barred"""
+    if element is None:
+        return []
+    up = element in ("fire", "air")
+    corners = [polar(0.28, math.radians(angle + (0 if up else 180))) for angle in (0, 120, 240)]
+    shapes = [("polyline", corners, True)]
+    if element in ("air", "earth"):
+        # Through the centre and a little past both sides, as in the alchemical symbols
+        shapes.append(("polyline", [(-0.2, 0.0), (0.2, 0.0)], False))
+    return shapes
+
+def star_polygon(points, step, radius):
+    """{points/step} star, drawn as as many closed loops as gcd(points, step)"""
+    shapes = []
+    loops = math.gcd(points, step)
+    for start in range(loops):
+        vertices = []
+        index = start
+        for _ in range(points // loops):
+            vertices.append(polar(radius, 2 * math.pi * index / points))
+            index = (index + step) % points
+        shapes.append(("polyline", vertices, True))
+    return shapes
+
+def letter_digits(text):
+    """Pythagorean numerology: a=1 ... i=9, j=1 ...; repeated digits collapse"""
+    digits = []
+    for char in (text or "").lower():
+        if "a" <= char <= "z":
+            digit = (ord(char) - ord("a")) % 9 + 1
+            if not digits or digits[-1] != digit:
+                digits.append(digit)
+    return digits
+
+def sigil_geometry(zodiac_sign, life_path_number, element=None, name=""):
+    """Primitives in a [-1, 1] square: ("circle", x, y, r, filled) and ("polyline", points, closed)"""
+    shapes = [("circle", 0.0, 0.0, 0.95, False), ("circle", 0.0, 0.0, 0.88, False)]
+
+    # Twelve marks between the rings; the sign's own mark is long and carries a dot
+    sign_index = ZODIAC_SIGNS.index(zodiac_sign) if zodiac_sign in ZODIAC_SIGNS else None
+    for index in range(12):
+        angle = 2 * math.pi * index / 12
+        inner = 0.76 if index == sign_index else 0.88
+        shapes.append(("polyline", [polar(inner, angle), polar(0.95, angle)], False))
+        if index == sign_index:
+            x, y = polar(0.72, angle)
+            shapes.append(("circle", x, y, 0.03, True))
+
+    number = life_path_number if isinstance(life_path_number, int) and life_path_number > 0 else 1
+    points = number + 4
+    shapes.extend(star_polygon(points, 2 if points < 9 else 3, 0.68))
+
+    # The name traced over nine points, from a small circle to a closing bar
+    nine = [polar(0.46, 2 * math.pi * digit / 9) for digit in range(1, 10)]
+    path = [nine[digit - 1] for digit in letter_digits(name)]
+    if len(path) >= 2:
+        shapes.append(("polyline", path, False))
+        shapes.append(("circle", path[0][0], path[0][1], 0.035, False))
+        (x1, y1), (x2, y2) = path[-2], path[-1]
+        length = math.hypot(x2 - x1, y2 - y1) or 1.0
+        nx, ny = -(y2 - y1) / length * 0.05, (x2 - x1) / length * 0.05
+        shapes.append(("polyline", [(x2 - nx, y2 - ny), (x2 + nx, y2 + ny)], False))
+
+    shapes.extend(element_glyph(element))
+    return shapes
+
+def render_svg(shapes, size=SIGIL_SIZE):
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="-1 -1 2 2">',
+        f'<rect x="-1" y="-1" width="2" height="2" fill="{PAPER}"/>',
+        f'<g fill="none" stroke="{INK}" stroke-width="{STROKE}" stroke-linecap="round" stroke-linejoin="round">',
+    ]
+    for shape in shapes:
+        if shape[0] == "circle":
+            _, x, y, radius, filled = shape
+            fill = f' fill="{INK}"' if filled else ""
+            parts.append(f'<circle cx="{x:.4f}" cy="{y:.4f}" r="{radius:.4f}"{fill}/>')
+        else:
+            _, points, closed = shape
+            coordinates = " ".join(f"{x:.4f},{y:.4f}" for x, y in points)
+            parts.append(f'<{"polygon" if closed else "polyline"} points="{coordinates}"/>')
+    parts.append("</g></svg>")
+    return "\n".join(parts)
+
+def render_png(shapes, size=SIGIL_SIZE):
+    scale = size * SUPERSAMPLE / 2
+    width = max(1, round(STROKE * scale))
+
+    def to_pixels(x, y):
+        return ((x + 1) * scale, (y + 1) * scale)
+
+    image = Image.new("L", (size * SUPERSAMPLE, size * SUPERSAMPLE), PAPER_GREY)
+    draw = ImageDraw.Draw(image)
+    for shape in shapes:
+        if shape[0] == "circle":
+            _, x, y, radius, filled = shape
+            left, top = to_pixels(x - radius, y - radius)
+            right, bottom = to_pixels(x + radius, y + radius)
+            draw.ellipse((left, top, right, bottom), outline=INK_GREY, width=width, fill=INK_GREY if filled else None)
+        else:
+            _, points, closed = shape
+            pixels = [to_pixels(x, y) for x, y in points]
+            if closed:
+                pixels.append(pixels[0])
+            draw.line(pixels, fill=INK_GREY, width=width, joint="curve")
+    image = image.resize((size, size), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=6)
+    return buffer.getvalue()
+
+def store_sigil(zodiac_sign, life_path_number, element=None, name="", fmt="png"):
+    """Render a sigil into the image store and return its URL; PNG falls back to SVG without Pillow"""
+    shapes = sigil_geometry(zodiac_sign, life_path_number, element, name)
+    if fmt == "png" and Image is not None:
+        return image_store.store_bytes(render_png(shapes), '.png')
+    return image_store.store_bytes(render_svg(shapes).encode("utf-8"), '.svg')
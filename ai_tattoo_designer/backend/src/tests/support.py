@@ -0,0 +1,36 @@
+"""Shared setup for the test modules.
+
+Tests run against `app`, built on a temporary SQLite database, with the image store and
+prompt index in temporary directories, so a test run never touches src/database/app.db or
+src/static/generated_images. Import it from here rather than from src.main.
+"""
+import os
+import atexit
+import shutil
+import tempfile
+from unittest.mock import patch
+import src.main
+from src.main import create_app
+from src.services import image_index, image_store
+
+_directory = tempfile.mkdtemp(prefix='tattoo-tests-')
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+
+image_store.IMAGE_STORE_DIR = os.path.join(_directory, 'generated_images')
+image_index.IMAGE_INDEX_DIR = os.path.join(_directory, 'image_index')
+
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_directory, 'test.db')}",
+    'START_BACKGROUND_THREADS': False,
+    'TESTING': True,
+})
+# src.asgi serves the shared app of src.main; make it this one
+src.main._app = app
+
+def disable_admission(test_case):
+    """Turn admission control off for the rest of test_case.
+
+    Tests that generate send more requests than one client's burst allows. Admission
+    control itself is covered in test_admission.
+    """
+    test_case.enterContext(patch('src.services.admission.ADMISSION_ENABLED', False))
@@ -0,0 +1,174 @@
+import unittest
+import json
+import time
+import uuid
+import threading
+from unittest.mock import patch
+from src.models.user import db
+from src.models.admission import AdmissionLease, ClientBucket
+from src.services import admission
+from src.services.admission import AdmissionRejected
+from src.tests.support import app
+
+class AdmissionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.enterContext(patch.object(admission, 'ADMISSION_ENABLED', True))
+        self.enterContext(patch.object(admission, 'ADMISSION_MAX_IN_FLIGHT', 2))
+        self.enterContext(patch.object(admission, 'ADMISSION_CLIENT_RATE', 0.5))
+        self.enterContext(patch.object(admission, 'ADMISSION_CLIENT_BURST', 3))
+        self.enterContext(patch.object(admission, 'ADMISSION_PER_IP', True))
+        self.enterContext(app.app_context())
+        db.session.query(AdmissionLease).delete()
+        db.session.commit()
+        self.addCleanup(self.clear_leases)
+        self.key = f"ip:test-{uuid.uuid4().hex[:8]}"
+
+    def clear_leases(self):
+        db.session.query(AdmissionLease).delete()
+        db.session.commit()
+
+    def test_bucket_allows_burst_then_rejects(self):
+        for _ in range(3):
+            admission.admit([self.key], slots=0)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            admission.admit([self.key], slots=0)
+        self.assertEqual(rejected.exception.reason, "client_rate")
+        # One token at 0.5 per second
+        self.assertEqual(rejected.exception.retry_after, 2)
+
+    def test_bucket_refills_over_time(self):
+        now = time.time()
+        with patch('src.services.admission.time.time', return_value=now):
+            for _ in range(3):
+                admission.admit([self.key], slots=0)
+        with patch('src.services.admission.time.time', return_value=now + 2.1):
+            admission.admit([self.key], slots=0)
+            with self.assertRaises(AdmissionRejected):
+                admission.admit([self.key], slots=0)
+
+    def test_in_flight_cap(self):
+        first = admission.admit([self.key])
+        admission.admit([self.key])
+        with self.assertRaises(AdmissionRejected) as rejected:
+            admission.admit([self.key])
+        self.assertEqual(rejected.exception.reason, "in_flight")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+        admission.release(first)
+        admission.admit([self.key])
+
+    def test_rejected_request_spends_no_tokens(self):
+        admission.admit([f"ip:other-{uuid.uuid4().hex[:8]}"], slots=2)
+        with self.assertRaises(AdmissionRejected):
+            admission.admit([self.key])
+        self.assertIsNone(db.session.get(ClientBucket, self.key))
+
+    def test_expired_leases_do_not_count(self):
+        db.session.add(AdmissionLease(id=uuid.uuid4().hex, started_at=0, expires_at=time.time() - 1))
+        db.session.add(AdmissionLease(id=uuid.uuid4().hex, started_at=0, expires_at=time.time() - 1))
+        db.session.commit()
+        admission.admit([self.key])
+
+    def test_retry_after_grows_with_queue_depth(self):
+        with patch.object(admission.service_time, 'value', 10.0):
+            self.assertEqual(admission.in_flight_retry_after(2, 1), 5)
+            self.assertEqual(admission.in_flight_retry_after(5, 1), 20)
+
+    def test_concurrent_admissions_respect_cap(self):
+        admitted, rejected = [], []
+
+        def attempt(index):
+            with app.app_context():
+                try:
+                    admitted.append(admission.admit([f"ip:racer-{uuid.uuid4().hex[:8]}"]))
+                except AdmissionRejected:
+                    rejected.append(index)
+
+        threads = [threading.Thread(target=attempt, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 2)
+        self.assertEqual(len(rejected), 6)
+
+    def test_generate_tattoo_returns_429_with_retry_after(self):
+        admission.admit([f"ip:other-{uuid.uuid4().hex[:8]}"], slots=2)
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload') as generate:
+            response = self.app.post('/api/generate_tattoo', data=json.dumps({
+                'first_name': 'Busy', 'last_name': 'Server', 'date_of_birth': '01/01/1990', 'age': 35
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertIn('error', response.get_json())
+        generate.assert_not_called()
+
+    def test_lease_is_released_after_generation(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', return_value={'ok': True}):
+            response = self.app.post('/api/generate_tattoo', data=json.dumps({
+                'first_name': 'Quick', 'last_name': 'Return', 'date_of_birth': '01/01/1990', 'age': 35
+            }), content_type='application/json', environ_base={'REMOTE_ADDR': f'10.{uuid.uuid4().int % 250}.0.1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.query(AdmissionLease).count(), 0)
+
+    def test_renewed_lease_outlives_its_original_expiry(self):
+        ticket = admission.admit([self.key])
+        later = time.time() + admission.ADMISSION_LEASE_SECONDS - 1
+        with patch('src.services.admission.time.time', return_value=later):
+            admission.renew(ticket)
+        db.session.expire_all()
+        with patch('src.services.admission.time.time', return_value=later + 2):
+            admission.admit([f"ip:other-{uuid.uuid4().hex[:8]}"])
+            with self.assertRaises(AdmissionRejected):
+                admission.admit([f"ip:other-{uuid.uuid4().hex[:8]}"])
+
+    def test_cost_above_the_burst_leaves_the_bucket_in_debt(self):
+        now = time.time()
+        with patch('src.services.admission.time.time', return_value=now):
+            admission.admit([self.key], slots=0, cost=5)
+        self.assertEqual(db.session.get(ClientBucket, self.key, populate_existing=True).tokens, -2)
+
+        with patch('src.services.admission.time.time', return_value=now + 4):
+            with self.assertRaises(AdmissionRejected) as rejected:
+                admission.admit([self.key], slots=0)
+        # Back to 0 after 4s at 0.5 per second, one more token takes 2s
+        self.assertEqual(rejected.exception.retry_after, 2)
+
+        # Long after a burst-sized bucket would have been full, this one still isn't
+        with patch.object(admission, '_last_purge', 0.0):
+            admission.purge_expired(now + 7)
+        db.session.commit()
+        self.assertIsNotNone(db.session.get(ClientBucket, self.key, populate_existing=True))
+
+    def test_batch_spends_a_token_per_person(self):
+        address = f'10.{uuid.uuid4().int % 250}.0.2'
+        people = [{'first_name': name, 'last_name': 'Doe', 'date_of_birth': '01/01/1990', 'age': 35}
+                  for name in ('A', 'B', 'C')]
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', return_value={'ok': True}):
+            response = self.app.post('/api/generate_tattoo/batch', data=json.dumps({'people': people, 'concurrency': 1}),
+                                     content_type='application/json', environ_base={'REMOTE_ADDR': address})
+            response.get_data()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(ClientBucket, f'ip:{address}', populate_existing=True).tokens, 0)
+
+    def test_ip_bucket_is_off_without_a_proxy_setting(self):
+        with patch.object(admission, 'ADMISSION_PER_IP', False):
+            self.assertEqual(admission.client_keys('10.0.0.1'), [])
+            self.assertEqual(admission.client_keys('10.0.0.1', 7), ['user:7'])
+            for _ in range(5):
+                admission.admit(admission.client_keys('10.0.0.1'), slots=0)
+
+    def test_client_address_is_the_one_the_proxy_added(self):
+        self.assertEqual(admission.client_address('10.0.0.1', '1.2.3.4'), '10.0.0.1')
+        with patch.object(admission, 'ADMISSION_PROXY_HOPS', 1):
+            # The first entry is whatever the client sent; the proxy appended the last
+            self.assertEqual(admission.client_address('10.0.0.1', 'spoofed, 1.2.3.4'), '1.2.3.4')
+            self.assertEqual(admission.client_address('10.0.0.1', None), '10.0.0.1')
+        with patch.object(admission, 'ADMISSION_PROXY_HOPS', 2):
+            self.assertEqual(admission.client_address('10.0.0.1', 'spoofed, 1.2.3.4, 10.0.0.9'), '1.2.3.4')
+            self.assertEqual(admission.client_address('10.0.0.1', '1.2.3.4'), '10.0.0.1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from src.main import create_app
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class AppFactoryTestCase(unittest.TestCase):
+
+    def test_factory_builds_an_app_on_its_own_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        database = os.path.join(directory, 'factory.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'START_BACKGROUND_THREADS': False})
+
+        response = app.test_client().get('/api/users')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [])
+        self.assertTrue(os.path.exists(database))
+
+    def test_provider_sdks_are_not_imported_at_startup(self):
+        script = ("import sys, src.main; "
+                  "print(sorted(m for m in ('openai', 'aiohttp', 'requests') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+if __name__ == '__main__':
+    unittest.main()
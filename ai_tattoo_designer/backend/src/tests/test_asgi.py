@@ -0,0 +1,122 @@
+import unittest
+import json
+import time
+import uuid
+import asyncio
+import tempfile
+from unittest.mock import patch
+from src.tests.support import app, disable_admission
+from src.asgi import application
+from src.services import admission, image_store
+from src.providers.async_http import close_client_session
+from src.providers.registry import load_providers
+from benchmarks.stub_providers import StubProviders, StubConfig
+
+async def call(method, path, body=b"", headers=()):
+    """Drive the ASGI app once and return (status, headers, body)"""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+             "headers": [(b"content-type", b"application/json"), *headers]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), content
+
+class AsgiTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        disable_admission(self)
+
+    async def asyncTearDown(self):
+        await close_client_session()
+
+    def use_stub_providers(self):
+        stubs = self.enterContext(StubProviders(StubConfig(text_latency=0, first_chunk_latency=0, image_latency=0)))
+        # Provider modules read their keys when imported; import them before patching
+        load_providers()
+        self.enterContext(patch('openai.api_key', 'sk-stub'))
+        self.enterContext(patch('openai.api_base', f'{stubs.base_url}/v1'))
+        self.enterContext(patch('src.providers.openrouter_provider.OPENROUTER_API_KEY', None))
+        self.enterContext(patch('src.providers.stability_provider.STABILITY_API_KEY', None))
+        self.enterContext(patch.object(image_store, 'IMAGE_STORE_DIR', self.enterContext(tempfile.TemporaryDirectory())))
+
+    async def test_native_generate_tattoo(self):
+        self.use_stub_providers()
+        body = json.dumps({'first_name': 'Asgi', 'last_name': 'Native', 'date_of_birth': '02/03/1991',
+                           'age': 34, 'fresh': True}).encode()
+        status, headers, content = await call("POST", "/api/generate_tattoo", body, [(b"origin", b"http://example.com")])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"access-control-allow-origin"], b"*")
+        data = json.loads(content)
+        self.assertEqual(data['ai_provider'], 'text:chatgpt,image:dalle')
+        self.assertTrue(data['image_url'].startswith('/static/generated_images/'))
+
+    async def test_native_route_validates_input(self):
+        status, _, content = await call("POST", "/api/generate_tattoo", json.dumps({'age': 3}).encode())
+        self.assertEqual(status, 400)
+        self.assertIn('error', json.loads(content))
+
+        status, _, content = await call("POST", "/api/generate_tattoo", b"{not json")
+        self.assertEqual(status, 400)
+
+    async def test_native_route_applies_admission_control(self):
+        self.enterContext(patch('src.services.admission.ADMISSION_ENABLED', True))
+        self.enterContext(patch('src.services.admission.ADMISSION_MAX_IN_FLIGHT', 1))
+        with app.app_context():
+            held = admission.admit(['ip:asgi-holder'])
+        try:
+            body = json.dumps({'first_name': 'Asgi', 'last_name': 'Busy', 'date_of_birth': '02/03/1991', 'age': 34}).encode()
+            status, headers, _ = await call("POST", "/api/generate_tattoo", body)
+        finally:
+            with app.app_context():
+                admission.release(held)
+        self.assertEqual(status, 429)
+        self.assertIn(b"retry-after", headers)
+
+    async def test_native_route_replays_idempotent_retries(self):
+        self.enterContext(patch('src.services.idempotency.IDEMPOTENCY_ENABLED', True))
+        generations = []
+
+        async def generate(app, inputs):
+            generations.append(inputs)
+            return {'reading_id': len(generations)}
+
+        self.enterContext(patch('src.asgi.agenerate_tattoo_payload', generate))
+        body = json.dumps({'first_name': 'Asgi', 'last_name': 'Retry', 'date_of_birth': '02/03/1991', 'age': 34}).encode()
+        key = [(b"idempotency-key", uuid.uuid4().hex.encode())]
+        first = await call("POST", "/api/generate_tattoo", body, key)
+        retry = await call("POST", "/api/generate_tattoo", body, key)
+
+        self.assertEqual(len(generations), 1)
+        self.assertEqual((retry[0], retry[2]), (first[0], first[2]))
+        self.assertEqual(retry[1][b"idempotent-replayed"], b"true")
+
+    async def test_other_routes_go_through_flask(self):
+        status, headers, content = await call("GET", "/api/generate_tattoo/cache/stats")
+        self.assertEqual(status, 200)
+        self.assertIn('hit_rate', json.loads(content))
+
+    async def test_flask_routes_run_concurrently(self):
+        # Fails if asgiref changes what ThreadPoolWsgiInstance patches and requests run one at a time
+        def slow_stats():
+            time.sleep(0.3)
+            return {'hit_rate': 0.0}
+
+        self.enterContext(patch('src.routes.tattoo_designer.reading_cache.get_stats', slow_stats))
+        started = time.monotonic()
+        responses = await asyncio.gather(*(call("GET", "/api/generate_tattoo/cache/stats") for _ in range(3)))
+        self.assertEqual([status for status, _, _ in responses], [200, 200, 200])
+        self.assertLess(time.monotonic() - started, 0.6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import json
+import time
+from unittest.mock import patch
+from src.providers.rate_limit import TokenBucket, parse_rate_limits
+from src.tests.support import app, disable_admission
+
+def person(first_name, **overrides):
+    return dict({'first_name': first_name, 'last_name': 'Doe', 'date_of_birth': '01/01/1990', 'age': 35}, **overrides)
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+
+    def post(self, body):
+        return self.app.post('/api/generate_tattoo/batch', data=json.dumps(body), content_type='application/json')
+
+    def test_results_stream_as_ndjson_and_failures_are_isolated(self):
+        from src.routes.tattoo_designer import TattooGenerationError
+
+        def fake_payload(inputs):
+            if inputs['first_name'] == 'Broken':
+                raise TattooGenerationError('Invalid response format from AI')
+            time.sleep(0.05 if inputs['first_name'] == 'Slow' else 0)
+            return {'mystical_insight': inputs['first_name']}
+
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', side_effect=fake_payload):
+            response = self.post({'people': [person('Slow'), person('Broken'), person('Fast')], 'concurrency': 3})
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = {record['index']: record for record in lines[:-1]}
+        self.assertEqual(records[1], {'index': 1, 'status': 'error', 'error': 'Invalid response format from AI'})
+        self.assertEqual(records[2]['result'], {'mystical_insight': 'Fast'})
+        # Completion order, not submission order
+        self.assertEqual(lines[-2]['index'], 0)
+        self.assertEqual(lines[-1], {'summary': {'total': 3, 'succeeded': 2, 'failed': 1}})
+
+    def test_everyone_is_validated_before_generation(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload') as payload_mock:
+            response = self.post({'people': [person('Ok'), person('Bad', age=-1), 'nope']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['errors'], [
+            {'index': 1, 'error': 'Age must be a positive integer'},
+            {'index': 2, 'error': 'First name must be a non-empty string'}
+        ])
+        payload_mock.assert_not_called()
+
+    def test_batch_size_is_capped(self):
+        with patch('src.routes.tattoo_designer.BATCH_MAX_SIZE', 2):
+            response = self.post({'people': [person('A'), person('B'), person('C')]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_token_bucket_paces_requests(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.14)
+
+    def test_parse_rate_limits(self):
+        self.assertEqual(parse_rate_limits('chatgpt=5, dalle=0.5'), {'chatgpt': 5.0, 'dalle': 0.5})
+        self.assertEqual(parse_rate_limits(None), {})
+
+if __name__ == '__main__':
+    unittest.main()
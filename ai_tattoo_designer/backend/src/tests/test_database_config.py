@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from src.database.config import configure_database, engine_options
+
+class DatabaseConfigTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.url = f"sqlite:///{os.path.join(self.tmp_dir, 'test.db')}"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_sqlite_connections_get_wal_and_busy_timeout(self):
+        app = Flask(__name__)
+        db = SQLAlchemy()
+
+        class Thing(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+
+        configure_database(app, db, self.url)
+        with app.app_context():
+            self.assertEqual(db.session.execute(text("PRAGMA journal_mode")).scalar(), 'wal')
+            self.assertEqual(db.session.execute(text("PRAGMA synchronous")).scalar(), 1)
+            self.assertGreater(db.session.execute(text("PRAGMA busy_timeout")).scalar(), 0)
+            self.assertEqual(Thing.query.count(), 0)
+            db.engine.dispose()
+
+    def test_server_databases_get_pre_ping_instead_of_sqlite_args(self):
+        options = engine_options('postgresql://user:pass@db/app')
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertNotIn('connect_args', options)
+        self.assertFalse(engine_options(self.url).get('pool_pre_ping'))
+
+if __name__ == '__main__':
+    unittest.main()
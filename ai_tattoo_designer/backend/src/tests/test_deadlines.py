@@ -0,0 +1,124 @@
+import unittest
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from unittest.mock import patch
+from src.providers import http
+from src.providers.base import ImageProvider
+from src.providers.health import get_health, guarded_call
+from src.services import deadlines, image_store
+from src.services.deadlines import Deadline
+from src.tests.test_streaming import READING, ChunkedProvider
+from src.tests.support import app, disable_admission
+
+class SlowImageProvider(ImageProvider):
+
+    def __init__(self):
+        self.name = f'slow-image-{uuid.uuid4().hex[:6]}'
+        self.calls = 0
+
+    def is_configured(self):
+        return True
+
+    def generate(self, image_prompt):
+        self.calls += 1
+        return None
+
+class DeadlineTestCase(unittest.TestCase):
+
+    def test_timeouts_are_cut_to_the_remaining_budget(self):
+        self.assertEqual(http.make_timeout(30), (http.PROVIDER_CONNECT_TIMEOUT, 30))
+        with deadlines.activate(Deadline(2)):
+            connect, read = http.make_timeout(30)
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+        self.assertGreater(read, 1.5)
+
+    def test_client_deadline_is_capped(self):
+        with patch.object(deadlines, 'REQUEST_DEADLINE_MAX_SECONDS', 10):
+            self.assertEqual(deadlines.for_request(600).seconds, 10)
+            self.assertEqual(deadlines.for_request(3).seconds, 3)
+            self.assertEqual(deadlines.for_request().seconds, min(10, deadlines.REQUEST_DEADLINE_SECONDS))
+
+    def test_call_that_cannot_finish_is_skipped(self):
+        provider = SlowImageProvider()
+        for _ in range(3):
+            get_health(provider.name).record_success(20.0)
+        deadline = Deadline(5)
+
+        self.assertIsNone(guarded_call(provider, lambda: provider.generate('a fox'), deadline))
+        self.assertEqual(provider.calls, 0)
+        self.assertEqual(deadline.cut_short, [{'stage': f'image:{provider.name}', 'reason': 'skipped'}])
+
+    def test_call_cut_off_by_the_deadline_is_not_held_against_the_provider(self):
+        provider = SlowImageProvider()
+        deadline = Deadline(0.05)
+
+        def outlast_deadline():
+            time.sleep(0.1)
+            return None
+
+        with patch.object(deadlines, 'DEADLINE_MIN_CALL_SECONDS', 0.01):
+            self.assertIsNone(guarded_call(provider, outlast_deadline, deadline))
+        self.assertEqual(deadline.cut_short, [{'stage': f'image:{provider.name}', 'reason': 'timed_out'}])
+        self.assertEqual(get_health(provider.name).snapshot()['total_failures'], 0)
+
+class DeadlineEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.directory = tempfile.mkdtemp()
+        self.enterContext(patch.object(image_store, 'IMAGE_STORE_DIR', self.directory))
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.enterContext(patch('src.routes.tattoo_designer.image_variants.schedule_variants'))
+        self.app = app.test_client()
+        self.person = {
+            'first_name': f'Deadline{uuid.uuid4().hex[:8]}',
+            'last_name': 'Doe',
+            'date_of_birth': '01/01/1990',
+            'age': 35,
+            'fresh': True
+        }
+
+    def post(self):
+        return self.app.post('/api/generate_tattoo', data=json.dumps(self.person), content_type='application/json')
+
+    def test_slow_image_provider_is_skipped_for_the_sigil(self):
+        provider = SlowImageProvider()
+        for _ in range(3):
+            get_health(provider.name).record_success(45.0)
+        self.person['deadline_seconds'] = 10
+
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [ChunkedProvider(READING)]), \
+                patch('src.routes.tattoo_designer.IMAGE_PROVIDERS', [provider]):
+            response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['ai_provider'].endswith('image:placeholder'))
+        self.assertEqual(data['deadline']['budget_seconds'], 10)
+        self.assertEqual(data['deadline']['cut_short'], [{'stage': f'image:{provider.name}', 'reason': 'skipped'}])
+        self.assertEqual(provider.calls, 0)
+
+    def test_reading_cut_off_by_the_deadline_is_a_504(self):
+        self.person['deadline_seconds'] = 0.1
+        # ~30 chunks at 20ms each: far longer than the budget
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [ChunkedProvider(READING, delay=0.02)]), \
+                patch.object(deadlines, 'DEADLINE_MIN_CALL_SECONDS', 0.01):
+            started = time.monotonic()
+            response = self.post()
+
+        self.assertEqual(response.status_code, 504)
+        self.assertIn('deadline', json.loads(response.data)['error'])
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_deadline_must_be_positive(self):
+        self.person['deadline_seconds'] = -1
+        response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], 'Deadline must be a positive number of seconds')
+
+if __name__ == '__main__':
+    unittest.main()
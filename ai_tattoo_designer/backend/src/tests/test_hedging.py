@@ -0,0 +1,110 @@
+import unittest
+import time
+import threading
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from src.services.hedging import HedgedStream, LatencyTracker, hedged_call
+from src.routes.tattoo_designer import generate_tattoo_reading_with_fallback
+from src.tests.test_streaming import ChunkedProvider, READING
+
+def is_valid(result):
+    return result is not None and result.startswith('{')
+
+def slow(result, seconds):
+    def call(cancelled):
+        time.sleep(seconds)
+        return result
+    return call
+
+class HedgingTestCase(unittest.TestCase):
+
+    def test_fast_primary_is_not_hedged(self):
+        result, name, hedged_after = hedged_call(
+            ('primary', slow('{"a": 1}', 0)), ('secondary', slow('{"b": 2}', 0)), is_valid, 1
+        )
+        self.assertEqual((result, name, hedged_after), ('{"a": 1}', 'primary', None))
+
+    def test_slow_primary_loses_to_secondary(self):
+        result, name, hedged_after = hedged_call(
+            ('primary', slow('{"a": 1}', 1)), ('secondary', slow('{"b": 2}', 0)), is_valid, 0.05
+        )
+        self.assertEqual((result, name), ('{"b": 2}', 'secondary'))
+        self.assertGreaterEqual(hedged_after, 0.05)
+
+    def test_loser_is_told_to_stop(self):
+        stopped = threading.Event()
+
+        def primary(cancelled):
+            if cancelled.wait(5):
+                stopped.set()
+            return '{"a": 1}'
+
+        result, name, _ = hedged_call(('primary', primary), ('secondary', slow('{"b": 2}', 0)), is_valid, 0.05)
+        self.assertEqual(name, 'secondary')
+        self.assertTrue(stopped.wait(1))
+
+    def test_invalid_primary_starts_secondary_immediately(self):
+        result, name, hedged_after = hedged_call(
+            ('primary', slow('not json', 0)), ('secondary', slow('{"b": 2}', 0)), is_valid, 5
+        )
+        self.assertEqual(name, 'secondary')
+        self.assertLess(hedged_after, 1)
+
+    def test_both_invalid_returns_first_response(self):
+        result, name, _ = hedged_call(
+            ('primary', slow('not json', 0)), ('secondary', slow(None, 0)), is_valid, 5
+        )
+        self.assertEqual((result, name), ('not json', 'primary'))
+
+    def test_losing_provider_stream_is_closed(self):
+        closed = threading.Event()
+
+        class SlowProvider(ChunkedProvider):
+            def stream(self, prompt):
+                try:
+                    yield from super().stream(prompt)
+                finally:
+                    closed.set()
+
+        slow_provider = SlowProvider(READING, delay=0.2)
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [slow_provider, ChunkedProvider(READING)]), \
+                patch('src.routes.tattoo_designer.rank_providers', side_effect=list), \
+                patch('src.routes.tattoo_designer.TEXT_HEDGE_DEFAULT_DELAY', 0.05):
+            response, provider = generate_tattoo_reading_with_fallback('Ada', 'Heron', '10/12/1990', 35,
+                                                                      'Sagittarius', 5)
+        self.assertEqual(response, READING)
+        self.assertRegex(provider, r'^chunked-\w+\[hedge=')
+        # The slow stream has ~30 chunks to go; it is stopped at the next one instead
+        self.assertTrue(closed.wait(1))
+
+    def test_single_stream_is_read_in_the_callers_thread(self):
+        def make_stream():
+            yield threading.current_thread()
+
+        stream = HedgedStream(('primary', make_stream))
+        self.assertEqual(list(stream), [threading.current_thread()])
+        self.assertEqual(stream.winner, 'primary')
+
+    def test_hedged_streams_are_not_capped_by_a_pool(self):
+        def make_stream():
+            time.sleep(0.3)
+            yield 'chunk'
+
+        def read():
+            return list(HedgedStream(('primary', make_stream), ('secondary', make_stream), hedge_delay=5))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=48) as executor:
+            results = list(executor.map(lambda _: read(), range(48)))
+        self.assertEqual(results, [['chunk']] * 48)
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker()
+        for seconds in range(1, 101):
+            tracker.record(seconds)
+        self.assertEqual(tracker.percentile(95), 95)
+        self.assertIsNone(LatencyTracker().percentile(95))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from src.models.user import db
+from src.models.idempotency import IdempotencyRecord
+from src.routes.tattoo_designer import TattooGenerationError
+from src.services import idempotency
+from src.services.idempotency import IdempotencyConflict, Claim, Replay
+from src.tests.support import app, disable_admission
+
+class IdempotencyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.enterContext(patch.object(idempotency, 'IDEMPOTENCY_ENABLED', True))
+        self.enterContext(app.app_context())
+        self.key = idempotency.record_key('generate_tattoo', 'ip:test', uuid.uuid4().hex)
+
+    def test_second_request_replays_the_stored_response(self):
+        claim = idempotency.begin(self.key, 'body')
+        self.assertIsInstance(claim, Claim)
+        idempotency.complete(claim, 200, {'reading_id': 7})
+
+        replay = idempotency.begin(self.key, 'body')
+        self.assertIsInstance(replay, Replay)
+        self.assertEqual((replay.status_code, replay.body), (200, {'reading_id': 7}))
+
+    def test_key_is_not_reused_for_a_different_body(self):
+        idempotency.begin(self.key, 'body')
+        with self.assertRaises(IdempotencyConflict) as conflict:
+            idempotency.begin(self.key, 'other body')
+        self.assertEqual(conflict.exception.status_code, 422)
+
+    def test_abandoned_key_can_be_claimed_again(self):
+        with idempotency.holding(idempotency.begin(self.key, 'body')):
+            pass
+        self.assertIsInstance(idempotency.begin(self.key, 'body'), Claim)
+
+    def test_retry_gives_up_while_the_original_still_runs(self):
+        idempotency.begin(self.key, 'body')
+        with patch.object(idempotency, 'IDEMPOTENCY_WAIT_SECONDS', 0.1):
+            with self.assertRaises(IdempotencyConflict) as conflict:
+                idempotency.begin(self.key, 'body')
+        self.assertEqual(conflict.exception.status_code, 409)
+        self.assertEqual(conflict.exception.retry_after, idempotency.CONFLICT_RETRY_AFTER)
+
+    def test_claim_of_a_dead_worker_is_taken_over(self):
+        dead = idempotency.begin(self.key, 'body')
+        later = time.time() + idempotency.IDEMPOTENCY_LOCK_SECONDS + 1
+        with patch('src.services.idempotency.time.time', return_value=later):
+            claim = idempotency.begin(self.key, 'body')
+        self.assertIsInstance(claim, Claim)
+        self.assertNotEqual(claim.owner, dead.owner)
+
+        # The dead worker coming back can't overwrite the new claim
+        idempotency.complete(dead, 200, {'reading_id': 1})
+        self.assertEqual(db.session.get(IdempotencyRecord, self.key, populate_existing=True).status, 'in_flight')
+
+    def test_expired_keys_are_forgotten(self):
+        idempotency.complete(idempotency.begin(self.key, 'body'), 200, {'reading_id': 1})
+        later = time.time() + idempotency.IDEMPOTENCY_TTL_SECONDS + 1
+        with patch('src.services.idempotency.time.time', return_value=later):
+            self.assertIsInstance(idempotency.begin(self.key, 'other body'), Claim)
+
+        with patch.object(idempotency, '_last_purge', 0.0):
+            idempotency.purge_expired(later + idempotency.IDEMPOTENCY_TTL_SECONDS + 1)
+        db.session.commit()
+        self.assertIsNone(db.session.get(IdempotencyRecord, self.key, populate_existing=True))
+
+class IdempotencyEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.enterContext(patch.object(idempotency, 'IDEMPOTENCY_ENABLED', True))
+        self.app = app.test_client()
+        self.person = {'first_name': 'Idem', 'last_name': 'Potent', 'date_of_birth': '01/01/1990', 'age': 35}
+        self.headers = {'Idempotency-Key': uuid.uuid4().hex}
+        self.calls = 0
+        self.started = threading.Event()
+
+    def generate(self, inputs):
+        self.calls += 1
+        self.started.set()
+        time.sleep(0.3)
+        return {'reading_id': self.calls, 'first_name': inputs['first_name']}
+
+    def post(self, headers=None):
+        return self.app.post('/api/generate_tattoo', data=json.dumps(self.person), content_type='application/json',
+                             headers=self.headers if headers is None else headers)
+
+    def test_concurrent_retry_attaches_to_the_running_generation(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', side_effect=self.generate), \
+                ThreadPoolExecutor(max_workers=1) as executor:
+            original = executor.submit(self.post)
+            self.started.wait(5)
+            retry = self.post()
+            original = original.result()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(original.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(json.loads(retry.data), json.loads(original.data))
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', original.headers)
+
+    def test_failed_generation_is_not_replayed(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload',
+                   side_effect=TattooGenerationError('All AI services unavailable')):
+            self.assertEqual(self.post().status_code, 500)
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', side_effect=self.generate):
+            response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 1)
+
+    def test_requests_without_a_key_are_not_deduplicated(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', side_effect=self.generate):
+            self.post(headers={})
+            self.post(headers={})
+        self.assertEqual(self.calls, 2)
+
+    def test_key_must_not_be_too_long(self):
+        response = self.post(headers={'Idempotency-Key': 'k' * 256})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Idempotency-Key', json.loads(response.data)['error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import os
+import json
+import uuid
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+from src.services import image_index, image_store
+from src.services.image_index import PromptIndex, jaccard, shingles
+from src.routes.tattoo_designer import generate_tattoo_image_with_complete_fallback
+from src.tests.test_streaming import ChunkedProvider, parse_events
+from src.tests.support import app
+
+HERON = 'A heron standing in still water beneath a crescent moon, fine line work'
+HERON_REORDERED = 'Fine line work: a heron standing in still water beneath the crescent moon'
+HERON_LOOSE = 'Heron standing in still water under a crescent moon, dotwork style'
+LION = 'A roaring lion with a crown of stars, geometric blackwork'
+
+class ImageIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.enterContext(patch.object(image_store, 'IMAGE_STORE_DIR', self.directory))
+        self.enterContext(patch.object(image_index, 'IMAGE_REUSE_ENABLED', True))
+        self.addCleanup(shutil.rmtree, self.directory)
+        index_directory = tempfile.mkdtemp()
+        self.enterContext(patch.object(image_index, 'IMAGE_INDEX_DIR', index_directory))
+        self.addCleanup(shutil.rmtree, index_directory)
+
+    def store(self, prompt):
+        url = image_store.store_bytes(uuid.uuid4().bytes)
+        image_index.add(prompt, url)
+        return url
+
+    def test_paraphrases_score_higher_than_unrelated_prompts(self):
+        self.assertGreater(jaccard(shingles(HERON), shingles(HERON_REORDERED)), 0.85)
+        self.assertGreater(jaccard(shingles(HERON), shingles(HERON_LOOSE)), 0.4)
+        self.assertEqual(jaccard(shingles(HERON), shingles(LION)), 0.0)
+
+    def test_find_returns_closest_stored_image(self):
+        heron = self.store(HERON)
+        self.store(LION)
+        match = image_index.get_index().find(HERON_REORDERED)
+        self.assertEqual(match.url, heron)
+        self.assertGreater(match.similarity, 0.85)
+        self.assertIsNone(image_index.get_index().find('a completely different koi fish'))
+
+    def test_workers_share_the_log(self):
+        url = self.store(HERON)
+        other_worker = PromptIndex(self.directory)
+        self.assertEqual(other_worker.find(HERON).url, url)
+
+    def test_evicted_images_are_skipped(self):
+        url = self.store(HERON)
+        os.remove(image_store.url_to_path(url))
+        self.assertIsNone(image_index.get_index().find(HERON))
+
+    def test_compaction_drops_evicted_images(self):
+        kept = self.store(HERON)
+        evicted = self.store(LION)
+        os.remove(image_store.url_to_path(evicted))
+        with patch.object(image_index, 'IMAGE_INDEX_COMPACT_EVERY', 1):
+            self.store('a koi fish circling a lotus')
+
+        with open(image_index.get_index().path) as log:
+            urls = [json.loads(line)['url'] for line in log]
+        self.assertIn(kept, urls)
+        self.assertNotIn(evicted, urls)
+        self.assertEqual(image_index.get_index().find(HERON).url, kept)
+
+    def test_log_is_not_served_with_the_images(self):
+        url = self.store(HERON)
+        self.assertFalse(image_index.get_index().path.startswith(self.directory))
+        client = app.test_client()
+        self.assertEqual(client.get('/static/generated_images/.prompt-index.jsonl').status_code, 404)
+
+        # A log left in the store by an older version isn't served, and is moved out on startup
+        legacy = os.path.join(self.directory, image_index.LEGACY_INDEX_FILENAME)
+        os.replace(image_index.get_index().path, legacy)
+        self.assertEqual(client.get('/static/generated_images/.prompt-index.jsonl').status_code, 404)
+        restarted = PromptIndex(self.directory)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertEqual(restarted.find(HERON).url, url)
+
+    @patch('src.routes.tattoo_designer.guarded_call')
+    def test_near_duplicate_prompt_reuses_image(self, guarded_call):
+        url = self.store(HERON)
+        image_path, provider = generate_tattoo_image_with_complete_fallback(HERON_REORDERED, 'Ada', 'Heron')
+        self.assertEqual(image_path, url)
+        self.assertRegex(provider, r'^reuse\[0\.\d\d\]$')
+        guarded_call.assert_not_called()
+
+        stats = image_index.get_index().get_stats()
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['reuse_rate'], 1.0)
+
+    def test_rendered_images_are_indexed_and_reuse_can_be_skipped(self):
+        rendered = image_store.store_bytes(b'rendered')
+        provider = Mock()
+        provider.name = 'dalle'
+        with patch('src.routes.tattoo_designer.rank_providers', return_value=[provider]), \
+                patch('src.routes.tattoo_designer.guarded_call', return_value=rendered), \
+                patch('src.routes.tattoo_designer.image_variants.schedule_variants'):
+            generate_tattoo_image_with_complete_fallback(HERON, 'Ada', 'Heron')
+            self.assertEqual(image_index.get_index().find(HERON).url, rendered)
+
+            fresh = image_store.store_bytes(b'fresh')
+            with patch('src.routes.tattoo_designer.guarded_call', return_value=fresh):
+                image_path, label = generate_tattoo_image_with_complete_fallback(HERON, 'Ada', 'Heron', reuse=False)
+        self.assertEqual(image_path, fresh)
+        self.assertEqual(label, 'dalle')
+
+    def test_stream_sends_preview_of_similar_image(self):
+        preview = self.store(HERON)
+        reading = json.dumps({'image_prompt': HERON_LOOSE, 'symbolic_analysis': 'a', 'core_tattoo_theme': 'b',
+                              'visual_motif_description': 'c', 'placement_suggestion': 'd', 'mystical_insight': 'e'})
+        person = {'first_name': f'Preview{uuid.uuid4().hex[:8]}', 'last_name': 'Heron',
+                  'date_of_birth': '01/01/1990', 'age': 35}
+        with patch('src.services.admission.ADMISSION_ENABLED', False), \
+                patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [ChunkedProvider(reading)]), \
+                patch('src.routes.tattoo_designer.guarded_call', return_value=None):
+            response = app.test_client().post('/api/generate_tattoo/stream', data=json.dumps(person),
+                                              content_type='application/json')
+            events = parse_events(response.get_data(as_text=True))
+
+        names = [name for name, _ in events]
+        self.assertLess(names.index('preview'), names.index('image'))
+        self.assertEqual(dict(events)['preview']['image_url'], preview)
+
+    def test_stats_endpoint(self):
+        response = app.test_client().get('/api/generate_tattoo/image_index/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('reuse_rate', response.get_json())
+
+if __name__ == '__main__':
+    unittest.main()
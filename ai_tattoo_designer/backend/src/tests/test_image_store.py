@@ -0,0 +1,65 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from src.services import image_store
+
+class ImageStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = patch.object(image_store, 'IMAGE_STORE_DIR', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_identical_content_is_stored_once(self):
+        first = image_store.store_stream([b'png', b'bytes'])
+        second = image_store.store_bytes(b'pngbytes')
+        self.assertEqual(first, second)
+        self.assertEqual(len(image_store.stored_images()), 1)
+
+        path = image_store.url_to_path(first)
+        relative = os.path.relpath(path, self.directory).split(os.sep)
+        self.assertEqual(len(relative), 3)
+        self.assertTrue(relative[2].startswith(relative[0] + relative[1]))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'pngbytes')
+        self.assertFalse([name for name in os.listdir(self.directory) if name.startswith('.incoming')])
+
+    def test_failed_write_leaves_no_partial_file(self):
+        def broken_download():
+            yield b'partial'
+            raise IOError('connection reset')
+
+        with self.assertRaises(IOError):
+            image_store.store_stream(broken_download())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_garbage_collector_evicts_least_recently_used(self):
+        urls = [image_store.store_bytes(bytes([i]) * 100) for i in range(5)]
+        for age, url in enumerate(urls):
+            timestamp = 1000000 + age
+            os.utime(image_store.url_to_path(url), (timestamp, timestamp))
+        image_store.touch(urls[0])
+
+        freed = image_store.collect_garbage(max_bytes=350)
+        self.assertEqual(freed, 200)
+        self.assertFalse(image_store.exists(urls[1]))
+        self.assertFalse(image_store.exists(urls[2]))
+        for url in (urls[0], urls[3], urls[4]):
+            self.assertTrue(image_store.exists(url))
+
+    def test_legacy_flat_files_are_not_collected(self):
+        with open(os.path.join(self.directory, 'tattoo_john_doe.png'), 'wb') as f:
+            f.write(b'x' * 1000)
+        self.assertEqual(image_store.collect_garbage(max_bytes=0), 0)
+
+    def test_urls_outside_the_store_are_rejected(self):
+        self.assertIsNone(image_store.url_to_path('/static/generated_images/../../main.py'))
+        self.assertIsNone(image_store.url_to_path('/static/index.html'))
+        self.assertFalse(image_store.exists(None))
+
+if __name__ == '__main__':
+    unittest.main()
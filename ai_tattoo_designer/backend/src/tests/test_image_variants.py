@@ -0,0 +1,96 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from PIL import Image
+from src.services import image_store, image_variants
+from src.tests.support import app
+
+def png_bytes(size=512):
+    buffer = io.BytesIO()
+    Image.new('L', (size, size), color=255).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+class ImageVariantsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        directory = tempfile.mkdtemp()
+        patcher = patch.object(image_store, 'IMAGE_STORE_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, directory)
+        self.image_url = image_store.store_bytes(png_bytes())
+
+    def render(self):
+        image_variants.render_variants(image_store.url_to_path(self.image_url), avif=False)
+
+    def test_variants_and_thumbnail_are_rendered(self):
+        self.render()
+        variants = image_variants.variant_urls(self.image_url)
+        self.assertEqual(variants['png'], self.image_url)
+
+        response = self.app.get(variants['webp'])
+        self.assertEqual(response.mimetype, 'image/webp')
+        response = self.app.get(variants['thumbnail'])
+        self.assertEqual(response.mimetype, 'image/png')
+        with Image.open(io.BytesIO(response.data)) as thumbnail:
+            self.assertEqual(thumbnail.size, (image_variants.THUMBNAIL_SIZE, image_variants.THUMBNAIL_SIZE))
+
+    def test_png_request_negotiates_webp(self):
+        self.render()
+        response = self.app.get(self.image_url, headers={'Accept': 'image/avif,image/webp,*/*;q=0.8'})
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertIn('Accept', response.headers['Vary'])
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        response = self.app.get(self.image_url, headers={'Accept': '*/*'})
+        self.assertEqual(response.mimetype, 'image/png')
+
+    def test_png_is_not_cached_for_long_before_its_webp_exists(self):
+        response = self.app.get(self.image_url, headers={'Accept': 'image/webp,*/*;q=0.8'})
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertNotIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept', response.headers['Vary'])
+
+        self.render()
+        response = self.app.get(self.image_url, headers={'Accept': 'image/webp,*/*;q=0.8'})
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        # Nothing better is coming for a client that only takes PNG
+        response = self.app.get(self.image_url, headers={'Accept': 'image/png'})
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+    def test_original_is_served_until_variants_exist(self):
+        variants = image_variants.variant_urls(self.image_url)
+        for url in (variants['webp'], variants['thumbnail']):
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'image/png')
+            self.assertNotIn('immutable', response.headers['Cache-Control'])
+
+    def test_conditional_get(self):
+        response = self.app.get(self.image_url)
+        response = self.app.get(self.image_url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_image(self):
+        self.assertEqual(self.app.get('/static/generated_images/aa/bb/missing.png').status_code, 404)
+        self.assertEqual(self.app.get('/static/generated_images/../../main.py').status_code, 404)
+
+    def test_only_images_are_served(self):
+        path = image_store.url_to_path(self.image_url)
+        with open(path[:-len('.png')] + '.txt', 'w') as other:
+            other.write('not an image')
+        self.assertEqual(self.app.get(self.image_url[:-len('.png')] + '.txt').status_code, 404)
+        self.assertEqual(self.app.get(self.image_url + '.tmp').status_code, 404)
+
+        # Readings from before the content-addressed store link to flat files
+        with open(os.path.join(image_store.IMAGE_STORE_DIR, 'tattoo_ada_heron.png'), 'wb') as legacy:
+            legacy.write(png_bytes(8))
+        self.assertEqual(self.app.get('/static/generated_images/tattoo_ada_heron.png').status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import json
+from unittest.mock import patch
+from src.routes.jobs import MAX_WAIT_SECONDS
+from src.tests.support import app, disable_admission
+
+VALID_INPUT = {
+    'first_name': 'John',
+    'last_name': 'Doe',
+    'date_of_birth': '01/01/1990',
+    'age': 35
+}
+
+FAKE_PAYLOAD = {
+    'symbolic_analysis': 'analysis',
+    'core_tattoo_theme': 'theme',
+    'visual_motif_description': 'motif',
+    'placement_suggestion': 'forearm',
+    'mystical_insight': 'insight',
+    'image_prompt': 'prompt',
+    'image_url': None,
+    'ai_provider': 'text:chatgpt,image:placeholder'
+}
+
+class JobsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_create_job_returns_id_immediately(self):
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload', return_value=FAKE_PAYLOAD):
+            response = self.app.post(
+                '/api/generate_tattoo/jobs',
+                data=json.dumps(VALID_INPUT),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 202)
+            job = json.loads(response.data)
+            self.assertIn(job['status'], ('queued', 'running', 'succeeded'))
+            self.assertEqual(response.headers['Location'], f"/api/jobs/{job['id']}")
+
+            response = self.app.get(f"/api/jobs/{job['id']}/wait?timeout=5")
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertEqual(data['status'], 'succeeded')
+            self.assertEqual(data['result'], FAKE_PAYLOAD)
+
+    def test_failed_job_reports_error(self):
+        from src.routes.tattoo_designer import TattooGenerationError
+
+        with patch('src.routes.tattoo_designer.generate_tattoo_payload',
+                   side_effect=TattooGenerationError('Invalid response format from AI')):
+            response = self.app.post(
+                '/api/generate_tattoo/jobs',
+                data=json.dumps(VALID_INPUT),
+                content_type='application/json'
+            )
+            job = json.loads(response.data)
+
+            response = self.app.get(f"/api/jobs/{job['id']}/wait?timeout=5")
+            data = json.loads(response.data)
+            self.assertEqual(data['status'], 'failed')
+            self.assertEqual(data['error'], 'Invalid response format from AI')
+
+    def test_create_job_validates_input(self):
+        response = self.app.post(
+            '/api/generate_tattoo/jobs',
+            data=json.dumps({'first_name': 'John', 'last_name': 'Doe', 'age': 35}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], 'Missing input data')
+
+    @patch('src.routes.jobs.wait_for_job', return_value=None)
+    def test_wait_timeout_must_be_finite(self, wait_for_job):
+        for value in ('nan', 'inf', '-inf'):
+            self.app.get(f'/api/jobs/somejob/wait?timeout={value}')
+        self.assertEqual([call.args[1] for call in wait_for_job.call_args_list], [MAX_WAIT_SECONDS] * 3)
+        self.app.get('/api/jobs/somejob/wait?timeout=-5')
+        self.assertEqual(wait_for_job.call_args.args[1], 0)
+
+    def test_unknown_job(self):
+        response = self.app.get('/api/jobs/doesnotexist')
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import json
+import uuid
+from unittest.mock import patch
+from src.services.json_repair import repair_json_object, validate_fields
+from src.providers.base import TextProvider
+from src.tests.support import app, disable_admission
+
+FIELDS = ('image_prompt', 'symbolic_analysis', 'core_tattoo_theme', 'visual_motif_description',
+          'placement_suggestion', 'mystical_insight')
+
+class FollowupProvider(TextProvider):
+
+    def __init__(self, reply):
+        self.name = f'followup-{uuid.uuid4().hex[:6]}'
+        self.reply = reply
+        self.prompts = []
+
+    def is_configured(self):
+        return True
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        return self.reply
+
+class RepairTestCase(unittest.TestCase):
+
+    def test_fences_and_trailing_commas(self):
+        text = 'Here is your reading:\n```json\n{"a": "x", "b": ["y",],}\n```\nEnjoy!'
+        self.assertEqual(repair_json_object(text), {'a': 'x', 'b': ['y']})
+
+    def test_truncated_reply_drops_the_half_written_field(self):
+        self.assertEqual(repair_json_object('{"a": "x", "b": "half a sent'), {'a': 'x'})
+        self.assertEqual(repair_json_object('{"a": "x", "b": {"c": 1'), {'a': 'x', 'b': {'c': 1}})
+
+    def test_unrecoverable_text_raises(self):
+        with self.assertRaises(ValueError):
+            repair_json_object('I cannot help with that.')
+
+    def test_validation_reports_missing_and_empty_fields(self):
+        clean, missing = validate_fields({'a': ' x ', 'b': '', 'c': 7, 'd': ['no']}, ('a', 'b', 'c', 'd', 'e'))
+        self.assertEqual(clean, {'a': 'x', 'c': '7'})
+        self.assertEqual(missing, ['b', 'd', 'e'])
+
+class ReaskTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+        self.person = {'first_name': f'Repair{uuid.uuid4().hex[:8]}', 'last_name': 'Doe',
+                       'date_of_birth': '01/01/1990', 'age': 35}
+
+    def test_only_missing_fields_are_asked_for_again(self):
+        partial = {field: field.upper() for field in FIELDS[:-1]}
+        reply = '```json\n' + json.dumps(partial)[:-1] + ',\n}\n```'
+        provider = FollowupProvider('{"mystical_insight": "the moth finds the flame"}')
+
+        with patch('src.routes.tattoo_designer.PIPELINE_OVERLAP_ENABLED', False), \
+             patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [provider]), \
+             patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback',
+                   return_value=(reply, provider.name)), \
+             patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback',
+                   return_value=(None, 'placeholder')):
+            response = self.app.post('/api/generate_tattoo', data=json.dumps(self.person),
+                                     content_type='application/json')
+
+        body = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['symbolic_analysis'], 'SYMBOLIC_ANALYSIS')
+        self.assertEqual(body['mystical_insight'], 'the moth finds the flame')
+        self.assertEqual(len(provider.prompts), 1)
+        self.assertIn('only these fields: mystical_insight', provider.prompts[0])
+
+    def test_reading_still_incomplete_after_reask_fails(self):
+        provider = FollowupProvider('still nothing useful')
+        with patch('src.routes.tattoo_designer.PIPELINE_OVERLAP_ENABLED', False), \
+             patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [provider]), \
+             patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback',
+                   return_value=('{"image_prompt": "x"}', provider.name)):
+            response = self.app.post('/api/generate_tattoo', data=json.dumps(self.person),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+
+    def test_truncated_stream_is_completed_by_reask(self):
+        partial = json.dumps({field: field.upper() for field in FIELDS})
+        provider = FollowupProvider('{"mystical_insight": "the moth finds the flame"}')
+        # The stream dies halfway through the last field
+        provider.stream = lambda prompt: iter([partial[:-10]])
+
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [provider]), \
+             patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback',
+                   return_value=(None, 'placeholder')):
+            response = self.app.post('/api/generate_tattoo/stream', data=json.dumps(self.person),
+                                     content_type='application/json')
+            events = response.get_data(as_text=True)
+
+        self.assertIn('"name": "mystical_insight", "value": "the moth finds the flame"', events)
+        self.assertIn('event: image', events)
+
+if __name__ == '__main__':
+    unittest.main()
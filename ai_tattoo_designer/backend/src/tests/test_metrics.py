@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+import unittest
+import uuid
+from unittest.mock import patch
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+from src.services import metrics
+from src.tests.support import app, disable_admission
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+READING = json.dumps({
+    'image_prompt': 'a heron', 'symbolic_analysis': 'a', 'core_tattoo_theme': 'b',
+    'visual_motif_description': 'c', 'placement_suggestion': 'd', 'mystical_insight': 'e'
+})
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+
+    def test_pipeline_stages_and_fallbacks_are_exposed(self):
+        person = {'first_name': f'Metrics{uuid.uuid4().hex[:8]}', 'last_name': 'Doe',
+                  'date_of_birth': '01/01/1990', 'age': 35}
+        with patch('src.routes.tattoo_designer.PIPELINE_OVERLAP_ENABLED', False), \
+             patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback', return_value=(READING, 'chatgpt')), \
+             patch('src.routes.tattoo_designer.IMAGE_PROVIDERS', []):
+            self.app.post('/api/generate_tattoo', data=json.dumps(person), content_type='application/json')
+
+        response = self.app.get('/metrics')
+        body = response.get_data(as_text=True)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        for stage in ('validation', 'prompt_build', 'json_parse', 'text', 'image', 'total'):
+            self.assertIn(f'tattoo_stage_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('tattoo_fallbacks_total{kind="image",reason="placeholder"}', body)
+        self.assertIn('tattoo_pipelines_in_flight 0.0', body)
+
+    def test_token_cost_uses_configured_prices(self):
+        before = metrics.ESTIMATED_COST.labels('chatgpt')._value.get()
+        metrics.record_tokens('chatgpt', 1000, 2000)
+        prompt_rate, completion_rate = metrics.TOKEN_PRICES['chatgpt']
+        self.assertAlmostEqual(metrics.ESTIMATED_COST.labels('chatgpt')._value.get() - before,
+                               prompt_rate + 2 * completion_rate)
+
+    def test_multiprocess_mode_merges_workers(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        worker = ("from src.services import metrics\n"
+                  "metrics.record_provider_call('text', 'chatgpt', 0.2, False)\n")
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', worker], cwd=BACKEND_DIR, env=env, check=True)
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=metrics_dir)
+        body = generate_latest(registry).decode()
+        self.assertIn('tattoo_provider_errors_total{kind="text",provider="chatgpt"} 2.0', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from unittest.mock import patch
+from src.services import prompts
+from src.routes.tattoo_designer import build_enhanced_prompt
+
+class PromptsTestCase(unittest.TestCase):
+
+    def test_only_given_personalization_is_rendered(self):
+        prompt = build_enhanced_prompt('Jane', 'Doe', '01/01/1990', 35, 'Capricorn', 2, spirit_animal='Owl')
+        self.assertIn('- First Name: Jane', prompt)
+        self.assertIn('- Spirit Animal: Owl', prompt)
+        self.assertNotIn('Birthplace', prompt)
+        self.assertNotIn('Jane', prompts.SYSTEM_PROMPT)
+
+    def test_oversized_personal_story_is_truncated_to_the_budget(self):
+        story = 'I crossed the sea ' * 2000
+        with patch.object(prompts, 'PROMPT_TOKEN_BUDGET', 300):
+            prompt = build_enhanced_prompt('Jane', 'Doe', '01/01/1990', 35, 'Capricorn', 2,
+                                           personal_story=story, cultural_affiliation='Celtic')
+        self.assertLessEqual(prompts.count_tokens(prompt), 300)
+        self.assertIn('…', prompt)
+        # Lines after the story keep their place
+        self.assertTrue(prompt.endswith('- Cultural/Spiritual Heritage: Celtic'))
+
+    def test_short_personal_story_is_untouched(self):
+        prompt = build_enhanced_prompt('Jane', 'Doe', '01/01/1990', 35, 'Capricorn', 2, personal_story='A short story')
+        self.assertIn('- Personal Journey: A short story', prompt)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import json
+import uuid
+import asyncio
+from unittest.mock import patch
+from src.providers import health, rate_limit
+from src.providers.health import ProviderHealth, get_health, rank_providers, guarded_call, aguarded_call, CLOSED, OPEN, HALF_OPEN
+from src.tests.support import app
+
+class FakeProvider:
+
+    def __init__(self, name):
+        self.name = f'{name}-{uuid.uuid4().hex[:6]}'
+
+class ProviderHealthTestCase(unittest.TestCase):
+
+    def test_consecutive_failures_open_the_breaker(self):
+        provider_health = ProviderHealth('flaky')
+        for _ in range(health.BREAKER_CONSECUTIVE_FAILURES):
+            self.assertTrue(provider_health.acquire())
+            provider_health.record_failure(1.0)
+        self.assertEqual(provider_health.state, OPEN)
+        self.assertFalse(provider_health.available())
+        self.assertFalse(provider_health.acquire())
+
+    def test_half_open_probe_closes_on_success(self):
+        provider_health = ProviderHealth('recovering')
+        for _ in range(health.BREAKER_CONSECUTIVE_FAILURES):
+            provider_health.record_failure(1.0)
+
+        with patch.object(health, 'BREAKER_OPEN_SECONDS', 0):
+            self.assertTrue(provider_health.available())
+            self.assertTrue(provider_health.acquire())
+            self.assertEqual(provider_health.state, HALF_OPEN)
+            # Only BREAKER_HALF_OPEN_PROBES probes are let through at once
+            self.assertFalse(provider_health.acquire())
+            provider_health.record_success(0.5)
+        self.assertEqual(provider_health.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        provider_health = ProviderHealth('still-down')
+        for _ in range(health.BREAKER_CONSECUTIVE_FAILURES):
+            provider_health.record_failure(1.0)
+        with patch.object(health, 'BREAKER_OPEN_SECONDS', 0):
+            provider_health.acquire()
+            provider_health.record_failure(1.0)
+        self.assertEqual(provider_health.state, OPEN)
+
+    def test_probe_cancelled_while_rate_limited_gives_its_slot_back(self):
+        provider = FakeProvider('probing')
+        provider_health = get_health(provider.name)
+        for _ in range(health.BREAKER_CONSECUTIVE_FAILURES):
+            provider_health.record_failure(1.0)
+
+        async def acomplete():
+            return 'reply'
+
+        async def lose_hedge():
+            # Another request just took the token, so this call waits for the next one
+            rate_limit.get_bucket(provider.name).reserve()
+            call = asyncio.ensure_future(aguarded_call(provider, acomplete))
+            await asyncio.sleep(0.01)
+            call.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await call
+
+        with patch.object(health, 'BREAKER_OPEN_SECONDS', 0), \
+                patch.dict(rate_limit.PROVIDER_RATE_LIMITS, {provider.name: 0.5}):
+            asyncio.run(lose_hedge())
+            asyncio.run(lose_hedge())
+            self.assertTrue(provider_health.available())
+
+    def test_ranking_prefers_healthy_providers_and_skips_open_breakers(self):
+        slow, fast, down = FakeProvider('slow'), FakeProvider('fast'), FakeProvider('down')
+        for _ in range(5):
+            get_health(slow.name).record_success(8.0)
+            get_health(fast.name).record_success(1.0)
+        for _ in range(health.BREAKER_CONSECUTIVE_FAILURES):
+            get_health(down.name).record_failure(30.0)
+
+        self.assertEqual(rank_providers([down, slow, fast]), [fast, slow])
+
+    def test_guarded_call_counts_none_as_failure(self):
+        provider = FakeProvider('none')
+        self.assertIsNone(guarded_call(provider, lambda: None))
+        self.assertEqual(guarded_call(provider, lambda: 'ok'), 'ok')
+        snapshot = get_health(provider.name).snapshot()
+        self.assertEqual((snapshot['total_calls'], snapshot['total_failures']), (2, 1))
+
+    def test_admin_endpoint_lists_breakers(self):
+        response = app.test_client().get('/api/admin/providers')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([p['name'] for p in data['text']['providers']], ['chatgpt', 'openrouter'])
+        self.assertIn('state', data['image']['providers'][0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from src.providers import http
+from src.providers.registry import TEXT_PROVIDERS, IMAGE_PROVIDERS
+from src.providers.base import TextProvider, ImageProvider
+
+def fake_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+class ProviderHttpTestCase(unittest.TestCase):
+
+    def test_sessions_are_pooled_per_host(self):
+        first = http.get_session('https://api.example.com/v1/chat')
+        second = http.get_session('https://api.example.com/v1/images')
+        other = http.get_session('https://images.example.com/file.png')
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    @patch('src.providers.http.time.sleep')
+    def test_retries_server_errors_then_succeeds(self, sleep):
+        session = MagicMock()
+        session.request.side_effect = [fake_response(503), fake_response(429, {'Retry-After': '1'}), fake_response(200)]
+        with patch('src.providers.http.get_session', return_value=session):
+            response = http.request('POST', 'https://api.example.com/v1/chat')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.request.call_count, 3)
+        self.assertEqual(sleep.call_args_list[1][0][0], 1.0)
+        _, kwargs = session.request.call_args
+        self.assertEqual(kwargs['timeout'], (http.PROVIDER_CONNECT_TIMEOUT, http.PROVIDER_READ_TIMEOUT))
+
+    @patch('src.providers.http.time.sleep')
+    def test_client_errors_are_not_retried(self, sleep):
+        session = MagicMock()
+        session.request.return_value = fake_response(400)
+        with patch('src.providers.http.get_session', return_value=session):
+            response = http.request('POST', 'https://api.example.com/v1/chat')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(session.request.call_count, 1)
+        sleep.assert_not_called()
+
+    @patch('src.providers.http.time.sleep')
+    def test_retry_budget_is_bounded(self, sleep):
+        session = MagicMock()
+        session.request.return_value = fake_response(502)
+        with patch('src.providers.http.get_session', return_value=session):
+            response = http.request('GET', 'https://api.example.com/image.png', max_retries=2)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(session.request.call_count, 3)
+
+    def test_backoff_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(http.backoff_delay(attempt), http.PROVIDER_BACKOFF_MAX)
+
+    def test_registered_providers_implement_interface(self):
+        for provider in TEXT_PROVIDERS:
+            self.assertIsInstance(provider, TextProvider)
+        for provider in IMAGE_PROVIDERS:
+            self.assertIsInstance(provider, ImageProvider)
+        self.assertEqual([p.name for p in TEXT_PROVIDERS], ['chatgpt', 'openrouter'])
+        self.assertEqual([p.name for p in IMAGE_PROVIDERS], ['dalle', 'stability'])
+
+if __name__ == '__main__':
+    unittest.main()
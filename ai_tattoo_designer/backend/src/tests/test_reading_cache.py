@@ -0,0 +1,125 @@
+import unittest
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from src.models.user import db
+from src.models.reading import Reading
+from src.models.cache_entry import CacheEntry
+from src.services import image_store
+from src.services.reading_cache import LRUCache, make_cache_key, reading_cache
+from src.tests.support import app, disable_admission
+
+READING = json.dumps({
+    'symbolic_analysis': 'analysis',
+    'core_tattoo_theme': 'theme',
+    'visual_motif_description': 'motif',
+    'placement_suggestion': 'forearm',
+    'mystical_insight': 'insight',
+    'image_prompt': 'a raven over the moon'
+})
+
+@patch('src.routes.tattoo_designer.PIPELINE_OVERLAP_ENABLED', False)
+class ReadingCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+        self.app.testing = True
+        directory = tempfile.mkdtemp()
+        patcher = patch.object(image_store, 'IMAGE_STORE_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, directory)
+        self.image_url = image_store.store_bytes(b'raven')
+        self.person = {
+            'first_name': f'Ada{uuid.uuid4().hex[:8]}',
+            'last_name': 'Lovelace',
+            'date_of_birth': '10/12/1815',
+            'age': 36
+        }
+
+    def post(self, body):
+        return self.app.post('/api/generate_tattoo', data=json.dumps(body), content_type='application/json')
+
+    @patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback')
+    @patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback', return_value=(READING, 'chatgpt'))
+    def test_resubmission_is_served_from_cache(self, reading_mock, image_mock):
+        image_mock.return_value = (self.image_url, 'dalle')
+        first = json.loads(self.post(self.person).data)
+        self.assertEqual(first['cache_status'], 'miss')
+
+        # Same person with different casing and whitespace hits the same entry
+        resubmitted = dict(self.person, first_name=f"  {self.person['first_name'].upper()} ")
+        second = json.loads(self.post(resubmitted).data)
+        self.assertEqual(second['cache_status'], 'memory')
+        self.assertEqual(second['image_url'], self.image_url)
+        self.assertEqual(reading_mock.call_count, 1)
+        self.assertEqual(image_mock.call_count, 1)
+        # A hit refers to the reading saved on the miss instead of saving a copy
+        self.assertEqual(second['reading_id'], first['reading_id'])
+        with app.app_context():
+            input_hash = db.session.get(Reading, first['reading_id']).input_hash
+            self.assertEqual(Reading.query.filter_by(input_hash=input_hash).count(), 1)
+
+        # The shared tier answers after the in-process tier is dropped
+        reading_cache.memory.clear()
+        third = json.loads(self.post(self.person).data)
+        self.assertEqual(third['cache_status'], 'database')
+        self.assertEqual(reading_mock.call_count, 1)
+        self.assertEqual(image_mock.call_count, 1)
+
+        # An image evicted by the store quota is rendered again, the reading is still reused
+        image_store.collect_garbage(max_bytes=0)
+        fourth = json.loads(self.post(self.person).data)
+        self.assertEqual(fourth['cache_status'], 'memory')
+        self.assertEqual(reading_mock.call_count, 1)
+        self.assertEqual(image_mock.call_count, 2)
+
+    @patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback', return_value=(None, 'placeholder'))
+    @patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback', return_value=(READING, 'chatgpt'))
+    def test_fresh_flag_bypasses_cache(self, reading_mock, image_mock):
+        self.post(self.person)
+        response = json.loads(self.post(dict(self.person, fresh=True)).data)
+        self.assertEqual(response['cache_status'], 'bypass')
+        self.assertEqual(reading_mock.call_count, 2)
+
+    def test_expired_rows_are_purged_on_store(self):
+        with app.app_context():
+            past = datetime.utcnow() - timedelta(seconds=1)
+            db.session.add(CacheEntry(key=uuid.uuid4().hex, value='{}', created_at=past, expires_at=past))
+            db.session.commit()
+            with patch.object(reading_cache, '_last_purge', 0.0):
+                reading_cache.set(uuid.uuid4().hex, {'reading': {}})
+            self.assertEqual(CacheEntry.query.filter(CacheEntry.expires_at <= datetime.utcnow()).count(), 0)
+
+    def test_key_depends_on_template_version(self):
+        self.assertNotEqual(make_cache_key(self.person, '1'), make_cache_key(self.person, '2'))
+        self.assertEqual(
+            make_cache_key(self.person, '1'),
+            make_cache_key(dict(self.person, date_of_birth='10/12/1815', spirit_animal=''), '1')
+        )
+
+    def test_lru_evicts_oldest_and_expires(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.set('d', 4, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('d'))
+
+    def test_stats_endpoint(self):
+        response = self.app.get('/api/generate_tattoo/cache/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', json.loads(response.data))
+
+if __name__ == '__main__':
+    unittest.main()
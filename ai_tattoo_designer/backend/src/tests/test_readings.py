@@ -0,0 +1,90 @@
+import unittest
+import json
+from unittest.mock import patch
+from src.models.user import User, db
+from src.models.reading import Reading
+from src.tests.support import app, disable_admission
+
+class ReadingsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+        with app.app_context():
+            user = User(username='reader', email='reader@example.com')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with app.app_context():
+            Reading.query.filter_by(user_id=self.user_id).delete()
+            User.query.filter_by(id=self.user_id).delete()
+            db.session.commit()
+
+    def add_readings(self, count):
+        with app.app_context():
+            for i in range(count):
+                db.session.add(Reading(user_id=self.user_id, input_hash='h' * 64, mystical_insight=str(i)))
+            db.session.commit()
+
+    def test_history_pages_follow_the_cursor(self):
+        self.add_readings(5)
+        seen = []
+        cursor = None
+        while True:
+            url = f'/api/users/{self.user_id}/readings?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            body = json.loads(self.app.get(url).data)
+            seen.extend(reading['mystical_insight'] for reading in body['readings'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['4', '3', '2', '1', '0'])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.app.get(f'/api/users/{self.user_id}/readings?cursor=garbage')
+        self.assertEqual(response.status_code, 400)
+
+    def generate(self, user_id):
+        payload = {'first_name': 'Ada', 'last_name': 'Reader', 'date_of_birth': '01/01/1990', 'age': 35,
+                   'user_id': user_id, 'fresh': True}
+        reading = {'image_prompt': 'a moth', 'symbolic_analysis': 'a', 'core_tattoo_theme': 'b',
+                   'visual_motif_description': 'c', 'placement_suggestion': 'd', 'mystical_insight': 'e'}
+        with patch('src.routes.tattoo_designer.PIPELINE_OVERLAP_ENABLED', False), \
+             patch('src.routes.tattoo_designer.generate_tattoo_reading_with_fallback',
+                   return_value=(json.dumps(reading), 'ChatGPT')), \
+             patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback',
+                   return_value=('/static/generated_images/x.png', 'DALL-E')):
+            return self.app.post('/api/generate_tattoo', data=json.dumps(payload), content_type='application/json')
+
+    def test_generated_reading_is_saved_for_its_user(self):
+        response = self.generate(self.user_id)
+        reading_id = json.loads(response.data)['reading_id']
+        saved = json.loads(self.app.get(f'/api/readings/{reading_id}').data)
+        self.assertEqual(saved['user_id'], self.user_id)
+        self.assertEqual(saved['mystical_insight'], 'e')
+        self.assertEqual(saved['image_url'], '/static/generated_images/x.png')
+
+    def test_reading_for_an_unknown_user_is_saved_without_one(self):
+        response = self.generate(self.user_id + 100000)
+        self.assertEqual(response.status_code, 200)
+        reading_id = json.loads(response.data)['reading_id']
+        self.assertIsNotNone(reading_id)
+        self.assertIsNone(json.loads(self.app.get(f'/api/readings/{reading_id}').data)['user_id'])
+
+    def test_deleting_a_user_keeps_their_readings(self):
+        self.add_readings(2)
+        with app.app_context():
+            reading_ids = [reading.id for reading in Reading.query.filter_by(user_id=self.user_id)]
+
+        self.assertEqual(self.app.delete(f'/api/users/{self.user_id}').status_code, 204)
+        for reading_id in reading_ids:
+            response = self.app.get(f'/api/readings/{reading_id}')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(json.loads(response.data)['user_id'])
+        with app.app_context():
+            Reading.query.filter(Reading.id.in_(reading_ids)).delete()
+            db.session.commit()
+
+if __name__ == '__main__':
+    unittest.main()
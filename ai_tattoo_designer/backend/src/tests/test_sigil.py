@@ -0,0 +1,69 @@
+import unittest
+import time
+import shutil
+import tempfile
+from unittest.mock import patch
+from src.services import image_store, sigil
+from src.routes.tattoo_designer import (generate_tattoo_image_with_complete_fallback, generate_placeholder_image,
+                                        sigil_traits)
+
+PERSON = {'first_name': 'Ada', 'last_name': 'Heron', 'date_of_birth': '10/12/1990', 'age': 35,
+          'favorite_element': 'the ocean', 'spirit_animal': 'heron'}
+
+class SigilTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.enterContext(patch.object(image_store, 'IMAGE_STORE_DIR', self.directory))
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_traits_come_from_the_reading_inputs(self):
+        traits = sigil_traits(PERSON)
+        self.assertEqual(traits['zodiac_sign'], 'Sagittarius')
+        self.assertEqual(traits['element'], 'water')
+        self.assertEqual(traits['name'], 'heron')
+        # No favourite element: the sign's own
+        self.assertEqual(sigil_traits(dict(PERSON, favorite_element=''))['element'], 'fire')
+
+    def test_same_person_same_sigil(self):
+        first = sigil.store_sigil(**sigil_traits(PERSON))
+        second = sigil.store_sigil(**sigil_traits(PERSON))
+        other = sigil.store_sigil(**sigil_traits(dict(PERSON, spirit_animal='wolf')))
+        # Content-addressed store: identical bytes, identical URL
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_svg_preview(self):
+        url = sigil.store_sigil(**sigil_traits(PERSON), fmt='svg')
+        self.assertTrue(url.endswith('.svg'))
+        with open(image_store.url_to_path(url)) as svg:
+            self.assertIn('<polygon', svg.read())
+
+    @unittest.skipIf(sigil.Image is None, 'Pillow is not installed')
+    def test_png_renders_quickly(self):
+        sigil.store_sigil(**sigil_traits(PERSON))
+        started = time.monotonic()
+        url = sigil.store_sigil(**sigil_traits(dict(PERSON, spirit_animal='a copper fox')))
+        self.assertLess(time.monotonic() - started, 0.1)
+        with open(image_store.url_to_path(url), 'rb') as png:
+            self.assertEqual(png.read(8), b'\x89PNG\r\n\x1a\n')
+
+    @patch('src.routes.tattoo_designer.image_variants.schedule_variants')
+    @patch('src.routes.tattoo_designer.guarded_call', return_value=None)
+    def test_sigil_is_the_image_of_last_resort(self, guarded_call, schedule_variants):
+        with patch('src.services.image_index.IMAGE_REUSE_ENABLED', False):
+            image_path, provider = generate_tattoo_image_with_complete_fallback(
+                'a heron in still water', 'Ada', 'Heron', traits=sigil_traits(PERSON))
+        self.assertEqual(provider, 'placeholder')
+        self.assertTrue(image_store.exists(image_path))
+        schedule_variants.assert_called_once_with(image_path)
+
+    @patch('src.routes.tattoo_designer.image_variants.schedule_variants')
+    def test_placeholder_without_traits_draws_the_name(self, schedule_variants):
+        image_path = generate_placeholder_image('Ada', 'Heron')
+        self.assertTrue(image_store.exists(image_path))
+        self.assertEqual(image_path, generate_placeholder_image('Ada', 'Heron'))
+        self.assertNotEqual(image_path, generate_placeholder_image('Ada', 'Lovelace'))
+
+if __name__ == '__main__':
+    unittest.main()
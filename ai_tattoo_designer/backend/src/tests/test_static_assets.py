@@ -0,0 +1,80 @@
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+from unittest.mock import patch
+from src.services.asset_manifest import AssetManifest
+from src.tests.support import app
+
+BUNDLE = b'console.log("tattoo oracle");\n' * 200
+INDEX = b'<!doctype html><html><body><div id="root"></div></body></html>'
+
+class StaticAssetsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(os.path.join(self.directory, 'assets'))
+        with open(os.path.join(self.directory, 'assets', 'index-SOw6PHEY.js'), 'wb') as f:
+            f.write(BUNDLE)
+        with open(os.path.join(self.directory, 'index.html'), 'wb') as f:
+            f.write(INDEX)
+
+        self.manifest = AssetManifest(self.directory).build()
+        patcher = patch.dict(app.extensions, {'asset_manifest': self.manifest})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = app.test_client()
+
+    def test_manifest_describes_assets(self):
+        bundle = self.manifest.get('assets/index-SOw6PHEY.js')
+        self.assertTrue(bundle.fingerprinted)
+        self.assertEqual(bundle.size, len(BUNDLE))
+        self.assertEqual(bundle.mimetype, 'text/javascript')
+        self.assertIn('gzip', bundle.encodings)
+        self.assertFalse(self.manifest.get('index.html').fingerprinted)
+        # Too small to be worth compressing
+        self.assertEqual(self.manifest.get('index.html').encodings, {})
+
+    def test_hyphenated_names_are_not_fingerprinted(self):
+        for relative_path in ('apple-touch-icon.png', 'assets/touch-icon-original.png', 'logo-SOw6PHEY.png'):
+            path = os.path.join(self.directory, relative_path)
+            with open(path, 'wb') as f:
+                f.write(b'icon')
+        manifest = AssetManifest(self.directory, precompress=False).build()
+        for relative_path in ('apple-touch-icon.png', 'assets/touch-icon-original.png', 'logo-SOw6PHEY.png'):
+            self.assertFalse(manifest.get(relative_path).fingerprinted, relative_path)
+
+        with patch.dict(app.extensions, {'asset_manifest': manifest}):
+            response = self.app.get('/apple-touch-icon.png')
+        self.assertEqual(response.data, b'icon')
+        self.assertNotIn('immutable', response.headers['Cache-Control'])
+
+    def test_fingerprinted_bundle_is_precompressed_and_immutable(self):
+        response = self.app.get('/assets/index-SOw6PHEY.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), BUNDLE)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+        response = self.app.get('/assets/index-SOw6PHEY.js', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, BUNDLE)
+
+    def test_conditional_get_returns_304(self):
+        response = self.app.get('/assets/index-SOw6PHEY.js', headers={'Accept-Encoding': 'gzip'})
+        response = self.app.get('/assets/index-SOw6PHEY.js', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+        })
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_paths_fall_back_to_revalidated_index(self):
+        for path in ('/', '/designs/123'):
+            response = self.app.get(path)
+            self.assertEqual(response.data, INDEX)
+            self.assertIn('no-cache', response.headers['Cache-Control'])
+
+if __name__ == '__main__':
+    unittest.main()
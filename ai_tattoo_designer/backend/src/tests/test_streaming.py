@@ -0,0 +1,133 @@
+import unittest
+import json
+import time
+import uuid
+from unittest.mock import ANY, patch
+from src.providers.base import TextProvider, ProviderError
+from src.services.json_stream import IncrementalObjectParser
+from src.tests.support import app, disable_admission
+
+READING = json.dumps({
+    'image_prompt': 'a raven over the moon',
+    'symbolic_analysis': 'analysis, with "quotes" and {braces}',
+    'core_tattoo_theme': 'theme',
+    'visual_motif_description': 'motif',
+    'placement_suggestion': 'forearm',
+    'mystical_insight': 'insight'
+})
+
+class ChunkedProvider(TextProvider):
+
+    def __init__(self, text, fail=False, delay=0):
+        self.name = f'chunked-{uuid.uuid4().hex[:6]}'
+        self.text = text
+        self.fail = fail
+        self.delay = delay
+
+    def is_configured(self):
+        return True
+
+    def stream(self, prompt):
+        if self.fail:
+            raise ProviderError('down')
+        for start in range(0, len(self.text), 7):
+            time.sleep(self.delay)
+            yield self.text[start:start + 7]
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+class IncrementalObjectParserTestCase(unittest.TestCase):
+
+    def test_fields_complete_as_chunks_arrive(self):
+        parser = IncrementalObjectParser()
+        self.assertEqual(parser.feed('```json\n{"a": "one", "b'), [('a', 'one')])
+        self.assertEqual(parser.feed('": [1, {"c": "}"}]'), [])
+        self.assertEqual(parser.feed(', "d": 4}\n```'), [('b', [1, {'c': '}'}]), ('d', 4)])
+        self.assertTrue(parser.done)
+
+    def test_escaped_quotes_do_not_end_strings(self):
+        parser = IncrementalObjectParser()
+        fields = parser.feed('{"a": "say \\"hi\\", then go"}')
+        self.assertEqual(fields, [('a', 'say "hi", then go')])
+
+class StreamEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        disable_admission(self)
+        self.app = app.test_client()
+        self.person = {
+            'first_name': f'Stream{uuid.uuid4().hex[:8]}',
+            'last_name': 'Doe',
+            'date_of_birth': '01/01/1990',
+            'age': 35
+        }
+
+    def post(self):
+        return self.app.post('/api/generate_tattoo/stream', data=json.dumps(self.person), content_type='application/json')
+
+    @patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback',
+           return_value=('/static/generated_images/raven.png', 'dalle'))
+    def test_fields_then_image_event(self, image_mock):
+        providers = [ChunkedProvider(READING, fail=True), ChunkedProvider(READING)]
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', providers):
+            response = self.post()
+            events = parse_events(response.get_data(as_text=True))
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        self.assertEqual([e for e, _ in events], ['preview'] + ['field'] * 6 + ['image'])
+        self.assertEqual(events[0][1]['source'], 'sigil')
+        self.assertEqual(events[1][1], {'name': 'image_prompt', 'value': 'a raven over the moon'})
+        self.assertEqual(events[2][1]['value'], 'analysis, with "quotes" and {braces}')
+        self.assertEqual(events[-1][1]['image_url'], '/static/generated_images/raven.png')
+        # The primary failed before its first chunk, so the hedge fired straight away
+        self.assertRegex(events[-1][1]['ai_provider'], rf'^text:{providers[1].name}\[hedge=0\.\d\ds\],image:dalle$')
+        image_mock.assert_called_once_with('a raven over the moon', self.person['first_name'], 'Doe', True, ANY, ANY)
+
+    def test_image_stage_overlaps_narrative(self):
+        def slow_image(image_prompt, first_name, last_name, reuse, traits, deadline):
+            time.sleep(0.3)
+            return '/static/generated_images/raven.png', 'dalle'
+
+        # ~30 chunks at 10ms each: the narrative keeps streaming for ~0.3s after image_prompt
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [ChunkedProvider(READING, delay=0.01)]), \
+                patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback', side_effect=slow_image):
+            response = self.app.post('/api/generate_tattoo', data=json.dumps(self.person), content_type='application/json')
+
+        timings = json.loads(response.data)['timings']
+        self.assertLess(timings['image_started_at'], timings['text_seconds'])
+        self.assertLess(timings['total_seconds'], timings['text_seconds'] + timings['image_seconds'])
+        self.assertGreater(timings['overlap_saved_seconds'], 0.1)
+
+    def test_bad_streamed_field_is_asked_for_again(self):
+        class BlankPromptProvider(ChunkedProvider):
+            def complete(self, prompt):
+                return json.dumps({'image_prompt': 'a heron in moonlight'})
+
+        provider = BlankPromptProvider(json.dumps(dict(json.loads(READING), image_prompt='')))
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [provider]), \
+                patch('src.routes.tattoo_designer.generate_tattoo_image_with_complete_fallback',
+                      return_value=('/static/generated_images/heron.png', 'dalle')) as image_mock:
+            events = parse_events(self.post().get_data(as_text=True))
+
+        prompts = [data['value'] for event, data in events if event == 'field' and data['name'] == 'image_prompt']
+        self.assertEqual(prompts, ['a heron in moonlight'])
+        self.assertEqual(image_mock.call_args.args[0], 'a heron in moonlight')
+
+    def test_error_event_when_all_providers_fail(self):
+        with patch('src.routes.tattoo_designer.TEXT_PROVIDERS', [ChunkedProvider(READING, fail=True)]):
+            events = parse_events(self.post().get_data(as_text=True))
+        self.assertEqual(events[-1][0], 'error')
+
+    def test_validation_errors_are_plain_json(self):
+        self.person['age'] = -1
+        response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], 'Age must be a positive integer')
+
+if __name__ == '__main__':
+    unittest.main()
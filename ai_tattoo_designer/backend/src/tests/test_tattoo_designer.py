@@ -1,14 +1,32 @@
 import unittest
 import json
-from src.main import app
+import tempfile
+from unittest.mock import patch
+from src.services import image_store
+from src.providers.registry import load_providers
+from benchmarks.stub_providers import StubProviders, StubConfig
+from src.tests.support import app, disable_admission
 
 class TattooDesignerTestCase(unittest.TestCase):
 
     def setUp(self):
+        disable_admission(self)
         self.app = app.test_client()
         self.app.testing = True
 
+    def use_stub_providers(self):
+        """Point ChatGPT and DALL-E at local stand-ins so no live API keys are needed"""
+        stubs = self.enterContext(StubProviders(StubConfig(text_latency=0, first_chunk_latency=0, image_latency=0)))
+        # Provider modules read their keys when imported; import them before patching
+        load_providers()
+        self.enterContext(patch('openai.api_key', 'sk-stub'))
+        self.enterContext(patch('openai.api_base', f'{stubs.base_url}/v1'))
+        self.enterContext(patch('src.providers.openrouter_provider.OPENROUTER_API_KEY', None))
+        self.enterContext(patch('src.providers.stability_provider.STABILITY_API_KEY', None))
+        self.enterContext(patch.object(image_store, 'IMAGE_STORE_DIR', self.enterContext(tempfile.TemporaryDirectory())))
+
     def test_generate_tattoo_success(self):
+        self.use_stub_providers()
         response = self.app.post(
             '/api/generate_tattoo',
             data=json.dumps({
@@ -0,0 +1,52 @@
+import unittest
+import json
+from src.models.user import User, db
+from src.tests.support import app
+
+class UsersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+
+    def tearDown(self):
+        with app.app_context():
+            User.query.filter(User.username.like('bulk-%')).delete(synchronize_session=False)
+            db.session.commit()
+
+    def bulk(self, users):
+        return self.app.post('/api/users/bulk', data=json.dumps({'users': users}), content_type='application/json')
+
+    def test_bulk_insert_reports_conflicts_per_row(self):
+        self.bulk([{'username': 'bulk-taken', 'email': 'taken@example.com'}])
+        response = self.bulk([
+            {'username': 'bulk-a', 'email': 'a@example.com'},
+            {'username': 'bulk-taken', 'email': 'other@example.com'},
+            {'username': 'bulk-b', 'email': 'a@example.com'},
+            {'username': 'bulk-c'},
+            {'username': 'bulk-d', 'email': 'd@example.com'}
+        ])
+        body = json.loads(response.data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(body['created'], 2)
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3])
+
+    def test_listing_is_paginated_by_cursor(self):
+        self.bulk([{'username': f'bulk-{i}', 'email': f'{i}@example.com'} for i in range(5)])
+        seen = []
+        url = '/api/users?limit=2'
+        while url:
+            response = self.app.get(url)
+            seen.extend(user['username'] for user in json.loads(response.data))
+            url = response.headers.get('Link', '').partition('>')[0][1:]
+        self.assertEqual([name for name in seen if name.startswith('bulk-')], [f'bulk-{i}' for i in range(5)])
+
+    def test_export_streams_ndjson(self):
+        self.bulk([{'username': f'bulk-{i}', 'email': f'{i}@example.com'} for i in range(3)])
+        response = self.app.get('/api/users/export')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(sum(row['username'].startswith('bulk-') for row in rows), 3)
+        self.assertEqual(set(rows[0]), {'id', 'username', 'email'})
+
+if __name__ == '__main__':
+    unittest.main()